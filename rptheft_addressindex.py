@@ -0,0 +1,163 @@
+"""
+What the script does: Inverted index from Ethereum addresses to the slots where they appear, with the MEV reward of each slot.
+Slot classification (rptheft_data2_slotclassification.py) indexes every address found in the fee recipient columns (relay_fee_recipient, mevmonitor_fee_recipient,
+beaconcha_fee_recipient, last_tx_recipient) and in distributor_address, normalized to lowercase. One index part is written per processed partition
+(PROCESSED_PATH/.rptheft_address_index/), sorted by address in small row groups, so a lookup only reads the row groups that can hold the address.
+Investigating an address (the rETH contract, the smoothing pool contract, a suspicious fee recipient) then takes a fraction of a second instead of a text scan of every slot.
+
+Usage: python rptheft_addressindex.py ADDRESS [--columns relay_fee_recipient,last_tx_recipient] [--list] [--slot-range START:END]
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from tabulate import tabulate
+from rptheft_slotstore import read_store_file, gwei_to_eth, sidecar_path
+from rptheft_manifest import atomic_output
+from rptheft_slotrange import processed_files_in_range, SLOT_RANGE_HELP, set_slot_range, slot_range_setting
+from rptheft_perf import stage, add_bytes_read, add_file_read, run_report
+
+INDEX_FOLDER_NAME = ".rptheft_address_index"
+
+# Indexed columns; a slot's `sources` value has bit i set when the address appears in ADDRESS_COLUMNS[i]
+ADDRESS_COLUMNS = ['relay_fee_recipient', 'mevmonitor_fee_recipient', 'beaconcha_fee_recipient', 'last_tx_recipient', 'distributor_address']
+RECIPIENT_COLUMNS = ADDRESS_COLUMNS[:4]
+
+MEV_REWARD_COLUMNS = ['mev_reward_gwei', 'beaconcha_mev_reward_gwei', 'mevmonitor_mev_reward_gwei']
+
+# Rows per row group: a lookup reads one or two row groups per index part
+INDEX_ROW_GROUP_SIZE = 16384
+
+INDEX_SCHEMA = pa.schema([
+    ('address', pa.string()),
+    ('slot', pa.int32()),
+    ('sources', pa.int8()),
+    ('mev_reward_total_gwei', pa.int64()),
+])
+
+def normalize_address(address):
+    return address.strip().lower()
+
+def column_bits(columns):
+    return sum(1 << ADDRESS_COLUMNS.index(col) for col in columns)
+
+# === BUILDING ===
+
+# Index a block of processed slot rows: one row per (address, slot) with the columns it appears in and the slot's exact MEV reward total (3 sources, gwei)
+def build_address_index(df):
+    # Projected or legacy frames may hold none of the address columns: nothing to index
+    if not any(col in df.columns for col in ADDRESS_COLUMNS):
+        return INDEX_SCHEMA.empty_table().to_pandas()
+    slots = pd.to_numeric(df['slot'], errors='coerce').astype('int64')
+    mev_reward_total = sum(pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64') for col in MEV_REWARD_COLUMNS)
+
+    entries = []
+    for bit, col in enumerate(ADDRESS_COLUMNS):
+        if col not in df.columns:
+            continue
+        # Recipient columns can hold several ";"-separated addresses
+        addresses = df[col].astype('string').str.lower().str.split(";").explode().str.strip()
+        addresses = addresses[addresses.notna() & (addresses != "")]
+        entries.append(pd.DataFrame({
+            'address': addresses.to_numpy(dtype=object),
+            'row': addresses.index.to_numpy(),
+            'sources': np.int8(1 << bit),
+        }))
+    # An address listed twice in a column, or in several columns, gives one row with every column's bit set
+    entries = pd.concat(entries, ignore_index=True).drop_duplicates()
+    index = entries.groupby(['address', 'row'], sort=False)['sources'].sum().reset_index()
+    index['slot'] = slots.loc[index['row']].to_numpy()
+    index['mev_reward_total_gwei'] = mev_reward_total.loc[index['row']].to_numpy()
+    return index[INDEX_SCHEMA.names]
+
+# Index part of a processed partition
+def index_path(processed_file_path):
+    return sidecar_path(processed_file_path, INDEX_FOLDER_NAME, "addresses")
+
+# Write the index part of a partition (sorted by address, then slot)
+def write_address_index(frames, processed_file_path):
+    if frames:
+        index = pd.concat(frames, ignore_index=True).sort_values(['address', 'slot'], kind='stable')
+        table = pa.Table.from_pandas(index, schema=INDEX_SCHEMA, preserve_index=False)
+    else:
+        table = INDEX_SCHEMA.empty_table()
+
+    path = index_path(processed_file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_output(path) as tmp_path:
+        pq.write_table(table, tmp_path, row_group_size=INDEX_ROW_GROUP_SIZE)
+    return path
+
+# Index parts of a processed folder (of the partitions holding slots of slot_range), in slot order.
+# Missing parts, or parts older than their partition, are rebuilt from the partition.
+def index_parts(folder_path, slot_range=None):
+    paths = []
+    for processed_file, _, _ in processed_files_in_range(folder_path, slot_range):
+        path = index_path(processed_file)
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(processed_file):
+            add_file_read(processed_file)
+            columns = ['slot'] + ADDRESS_COLUMNS + [col[:-len("_gwei")] for col in MEV_REWARD_COLUMNS]
+            write_address_index([build_address_index(read_store_file(processed_file, columns))], processed_file)
+        paths.append(path)
+    return paths
+
+# === LOOKUPS ===
+
+# Slots where an address appears (in any of `columns`, among the slots of slot_range): slot, sources (column bits) and mev_reward_total_gwei, in slot order
+def lookup_address(folder_path, address, columns=None, slot_range=None):
+    address = normalize_address(address)
+    filters = [('address', '=', address)]
+    if slot_range is not None:
+        start, end = slot_range
+        filters += ([] if start is None else [('slot', '>=', start)]) + ([] if end is None else [('slot', '<', end)])
+    with stage("lookup_address") as record:
+        tables = []
+        for path in index_parts(folder_path, slot_range):
+            # Row group statistics skip every row group whose address range can't hold the address
+            table = pq.read_table(path, filters=filters, columns=['slot', 'sources', 'mev_reward_total_gwei'])
+            add_bytes_read(table.nbytes)
+            tables.append(table)
+        slots = pa.concat_tables(tables).to_pandas() if tables else pd.DataFrame(columns=['slot', 'sources', 'mev_reward_total_gwei'])
+        if columns is not None:
+            slots = slots[(slots['sources'] & column_bits(columns)) != 0]
+        record["rows"] = len(slots)
+    return slots.reset_index(drop=True)
+
+# Slot count and total MEV reward (ETH, average of the 3 sources) of the slots where an address appears in `columns`
+def address_summary(folder_path, address, columns=RECIPIENT_COLUMNS, slot_range=None):
+    slots = lookup_address(folder_path, address, columns, slot_range)
+    return len(slots), gwei_to_eth(slots['mev_reward_total_gwei'].sum(), 3)
+
+# === CLI ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up the slots where an address appears.")
+    parser.add_argument("address")
+    parser.add_argument("--columns", default=",".join(ADDRESS_COLUMNS), help="Comma-separated address columns to match")
+    parser.add_argument("--list", action="store_true", help="List every matching slot")
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP)
+    args = parser.parse_args()
+
+    if args.slot_range:
+        set_slot_range(args.slot_range)
+    load_dotenv(dotenv_path='local_paths.env')
+    columns = [col.strip() for col in args.columns.split(",")]
+    slots = lookup_address(os.getenv("PROCESSED_PATH"), args.address, columns, slot_range_setting())
+
+    rows = [[col, f"{int(((slots['sources'] & column_bits([col])) != 0).sum()):,}"] for col in columns]
+    print(f"\n🔍 **Address {normalize_address(args.address)}:**\n")
+    print(tabulate(rows, headers=["Column", "Slots"], tablefmt="github"))
+    print(f"\n🔸 Slots: {len(slots):,}")
+    print(f"🔸 Total MEV Reward: {gwei_to_eth(slots['mev_reward_total_gwei'].sum(), 3):.4f} ETH")
+    if args.list:
+        slots['mev_reward'] = gwei_to_eth(slots['mev_reward_total_gwei'], 3)
+        slots['columns'] = [", ".join(col for col in columns if bits & column_bits([col])) for bits in slots['sources']]
+        print(tabulate(slots[['slot', 'columns', 'mev_reward']], headers='keys', tablefmt='github', showindex=False, floatfmt=".4f"))
+
+if __name__ == "__main__":
+    with run_report("rptheft_addressindex"):
+        main()
@@ -0,0 +1,270 @@
+"""
+What the script does: End-to-end benchmark of the slot data pipeline on synthetic data (see rptheft_synthdata.py).
+It generates synthetic .csv.gz slot files in a work folder, runs every stage as its own process (extract, classify, completeness check and each analysis report) and times it.
+Per-step timings of every stage are in its run report in <workdir>/perf_reports (see rptheft_perf.py).
+Two checks make sure a faster pipeline still produces the same results:
+- Reference check: the processed store is compared with the original row-wise classification (relay names, vanilla blocks, theft flags, ETH amounts and the surrounding max bid),
+  kept below as reference implementations, on the first --reference-rows slots.
+- Baseline check: the console output of the completeness check and of every report is saved with --save-baseline and compared with --compare-baseline,
+  e.g. before and after a change, on the same --slots and --seed.
+
+Usage: python rptheft_benchmark.py [--slots 100000] [--seed 1] [--workdir FOLDER] [--env CLASSIFY_WORKERS=4] [--save-baseline FILE | --compare-baseline FILE]
+"""
+
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from rptheft_synthdata import generate_slot_files, SP_ADDRESS
+from rptheft_slotstore import WEI_COLUMNS, GWEI_COLUMNS, GWEI_PER_ETH, list_processed_files, read_store_file
+
+REPO_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Pipeline stages in run order: (name, script)
+STAGES = [
+    ("extract", "rptheft_data1_ziptocsv.py"),
+    ("classify", "rptheft_data2_slotclassification.py"),
+    ("check", "rptheft_data3_datacompletenesscheck.py"),
+    ("loss_alldata", "rptheft_loss_alldata.py"),
+    ("theft_timeseries", "rptheft_theft_timeseries.py"),
+    ("maxbids_comptable", "rptheft_maxbids_comptable.py"),
+    ("maxbids_cumdistr", "rptheft_maxbids_cumdistr.py"),
+]
+
+# Stages whose console output is a result (compared against the baseline)
+RESULT_STAGES = ["check", "loss_alldata", "theft_timeseries", "maxbids_comptable", "maxbids_cumdistr"]
+
+RELAY_COLUMNS = ['max_bid_relay', 'mev_reward_relay', 'beaconcha_mev_reward_relay', 'mevmonitor_max_bid_relay', 'mevmonitor_mev_reward_relay']
+RECIPIENT_COLUMNS = ['relay_fee_recipient', 'mevmonitor_fee_recipient', 'beaconcha_fee_recipient', 'last_tx_recipient']
+
+# === REFERENCE IMPLEMENTATIONS (original row-wise classification) ===
+
+REFERENCE_RELAY_MAP = {
+    "Flashbots": "flashbots-relay",
+    "bloXroute Max Profit": "bloxroute-max-profit-relay",
+    "bloXroute Regulated": "bloxroute-regulated-relay",
+    "Blocknative": "mainnet-relay.securerpc.com",
+    "Eden Network": "relay.edennetwork.io",
+    "Ultra Sound": "ultrasound-relay",
+    "Aestus": "aestus-relay",
+    "Titan Global": "agnostic-relay",
+    "Titan Regional": "agnostic-relay",
+    "bloxroute.max-profit.blxrbdn.com": "bloxroute-max-profit-relay",
+    "boost-relay.flashbots.net": "flashbots-relay",
+    "relay.ultrasound.money": "ultrasound-relay",
+    "bloxroute.regulated.blxrbdn.com": "bloxroute-regulated-relay",
+    "aestus.live": "aestus-relay",
+    "mainnet-relay.securerpc.com": "mainnet-relay.securerpc.com",
+    "relay.edennetwork.io": "relay.edennetwork.io",
+    "agnostic-relay.net": "agnostic-relay"
+}
+
+def reference_normalize_address(addr):
+    return addr.lower() if pd.notna(addr) else ""
+
+def reference_extract_normalized_addresses(column_value):
+    if pd.notna(column_value):
+        return [reference_normalize_address(addr) for addr in column_value.split(";")]
+    return []
+
+def reference_convert_wei_to_eth(df, columns, decimals=8):
+    for col in columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            df[col] = df[col].apply(lambda x: round(x / 10**18, decimals) if pd.notnull(x) else x)
+    return df
+
+def reference_standardize_relay_names(df, relay_columns):
+    for col in relay_columns:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: ";".join([REFERENCE_RELAY_MAP.get(r.strip(), r.strip()) for r in x.split(";")]) if pd.notna(x) else x)
+    return df
+
+def reference_identify_vanilla_blocks(df):
+    df['vanilla_block'] = df.apply(
+        lambda row: all(pd.isna(row[col]) for col in [
+            'mev_reward', 'mev_reward_relay', 'relay_fee_recipient',
+            'beaconcha_mev_reward', 'beaconcha_mev_reward_relay',
+            'beaconcha_fee_recipient', 'mevmonitor_mev_reward',
+            'mevmonitor_mev_reward_relay'
+        ]), axis=1
+    )
+    return df
+
+def reference_calculate_surrounding_mev(df, index):
+    max_bid_values = df.loc[max(0, index-2):min(len(df)-1, index+2), ['max_bid', 'mevmonitor_max_bid']].mean().mean()
+    return round(max_bid_values, 8) if pd.notna(max_bid_values) else 0
+
+def reference_identify_mev_theft(df):
+    def check_theft(row):
+        recipients = [addr for col in RECIPIENT_COLUMNS for addr in reference_extract_normalized_addresses(row.get(col, ""))]
+        distributor = reference_normalize_address(row['distributor_address'])
+        in_smoothing_pool = str(row['in_smoothing_pool']).strip().lower() == "true"
+        sp_theft = reg_theft = False
+        if in_smoothing_pool:
+            sp_theft = all(SP_ADDRESS not in recipient for recipient in recipients)
+        elif distributor:
+            reg_theft = all(distributor not in recipient for recipient in recipients)
+        return pd.Series({'sp_high-confidence_theft': sp_theft, 'reg_high-confidence_theft': reg_theft})
+
+    return df.join(df.apply(check_theft, axis=1))
+
+# Classify raw slot rows with the reference implementations
+def reference_classify(df):
+    df = reference_convert_wei_to_eth(df, WEI_COLUMNS)
+    df = reference_standardize_relay_names(df, RELAY_COLUMNS)
+    df = reference_identify_vanilla_blocks(df)
+    df = reference_identify_mev_theft(df)
+    df['surrounding_avg_max_bid'] = [reference_calculate_surrounding_mev(df, index) for index in range(len(df))]
+    return df
+
+# === BENCHMARK ===
+
+# Compare the first `rows` processed slots with the reference classification of the same raw rows; returns a list of [check, mismatches]
+def run_reference_check(raw_folder, processed_folder, rows):
+    raw_files = sorted(glob.glob(os.path.join(raw_folder, "*.csv")))
+    raw_frames, raw_rows = [], 0
+    for path in raw_files:
+        # Two extra rows, so the surrounding window of the last compared slot is complete
+        raw_frames.append(pd.read_csv(path, nrows=rows + 2 - raw_rows))
+        raw_rows += len(raw_frames[-1])
+        if raw_rows >= rows + 2:
+            break
+    reference = reference_classify(pd.concat(raw_frames, ignore_index=True)).head(rows)
+
+    processed = pd.concat([read_store_file(path) for path in list_processed_files(processed_folder)], ignore_index=True)
+    processed = processed.set_index('slot').loc[reference['slot'].to_numpy()].reset_index()
+
+    results = []
+    for col in RELAY_COLUMNS:
+        expected = reference[col].fillna("<NA>").astype(str).to_numpy()
+        actual = processed[col].astype('string').fillna("<NA>").to_numpy()
+        results.append([col, int((expected != actual).sum())])
+    for col in ['vanilla_block', 'sp_high-confidence_theft', 'reg_high-confidence_theft']:
+        results.append([col, int((reference[col].astype(bool).to_numpy() != processed[col].astype(bool).to_numpy()).sum())])
+    for col, gwei_col in zip(WEI_COLUMNS, GWEI_COLUMNS):
+        # The reference rounds ETH to 8 decimals; the store keeps exact gwei
+        expected = reference[col].to_numpy(dtype='float64')
+        actual = processed[gwei_col].astype('float64').to_numpy() / GWEI_PER_ETH
+        mismatch = (np.isnan(expected) != np.isnan(actual)) | (np.abs(np.nan_to_num(expected) - np.nan_to_num(actual)) > 1.5e-8)
+        results.append([col, int(mismatch.sum())])
+    surrounding = np.abs(reference['surrounding_avg_max_bid'].to_numpy(dtype='float64') - processed['surrounding_avg_max_bid'].to_numpy(dtype='float64'))
+    results.append(['surrounding_avg_max_bid', int((surrounding > 1.5e-8).sum())])
+    return results
+
+# Run one pipeline stage as its own process in the work folder; returns (seconds, exit code, console output, log with timings)
+def run_stage(script, workdir, env):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.join(REPO_FOLDER, script)],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    return time.perf_counter() - started, completed.returncode, completed.stdout, completed.stdout + completed.stderr
+
+# Peak RSS in MB of the latest run of a script (including worker processes), from its run report (see rptheft_perf.py)
+def stage_peak_rss(perf_folder, script):
+    reports = glob.glob(os.path.join(perf_folder, f"{os.path.splitext(script)[0]}_*.json"))
+    if not reports:
+        return None
+    with open(max(reports, key=os.path.getmtime)) as f:
+        stages = json.load(f)["stages"]
+    return max(max(s["peak_rss_mb"], s["peak_rss_children_mb"]) for s in stages)
+
+# Prepare the work folder: synthetic archives are generated once and reused, earlier outputs are removed so every run starts cold
+def prepare_workdir(workdir, slots, seed):
+    raw_folder = os.path.join(workdir, "raw")
+    processed_folder = os.path.join(workdir, "processed")
+    if not glob.glob(os.path.join(raw_folder, "*.csv.gz")):
+        print(f"Generating {slots:,} synthetic slots in {raw_folder}...")
+        generate_slot_files(raw_folder, slots, seed=seed)
+    for path in glob.glob(os.path.join(raw_folder, "*.csv")) + glob.glob(os.path.join(raw_folder, ".rptheft_*")):
+        os.remove(path)
+    shutil.rmtree(processed_folder, ignore_errors=True)
+    os.makedirs(processed_folder)
+    with open(os.path.join(workdir, "local_paths.env"), 'w') as f:
+        f.write(f"SOURCE_PATH={raw_folder}\nPROCESSED_PATH={processed_folder}\n")
+    return raw_folder, processed_folder
+
+# Number of slots in the synthetic archives, from their rt2_slot-A-to-B file names
+def count_slots(raw_folder):
+    slots = 0
+    for path in glob.glob(os.path.join(raw_folder, "*.csv.gz")):
+        first_slot, last_slot = re.search(r"-(\d+)-to-(\d+)\.csv\.gz$", path).groups()
+        slots += int(last_slot) - int(first_slot) + 1
+    return slots
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the slot data pipeline end to end on synthetic data.")
+    parser.add_argument("--slots", type=int, default=100000, help="Number of synthetic slots")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="Work folder (kept between runs, so the synthetic data is generated once); a temporary folder by default")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Pipeline setting passed to every stage, e.g. CLASSIFY_WORKERS=4")
+    parser.add_argument("--stages", help="Comma-separated stages to run (default: all)")
+    parser.add_argument("--reference-rows", type=int, default=20000, help="Slots compared with the reference classification (0 disables the check)")
+    parser.add_argument("--save-baseline", help="Save the report outputs to this JSON file")
+    parser.add_argument("--compare-baseline", help="Compare the report outputs with a JSON file saved by --save-baseline")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="rptheft_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    raw_folder, processed_folder = prepare_workdir(workdir, args.slots, args.seed)
+    slots = count_slots(raw_folder)
+
+    # Settings from --env override local_paths.env (dotenv keeps variables that are already set)
+    perf_folder = os.path.join(workdir, "perf_reports")
+    env = dict(os.environ, SOURCE_PATH=raw_folder, PROCESSED_PATH=processed_folder, PLOT_OUTPUT="file",
+               PLOT_DIR=os.path.join(workdir, "plots"), PERF_REPORT_DIR=perf_folder)
+    env.update(setting.split("=", 1) for setting in args.env)
+
+    selected = args.stages.split(",") if args.stages else [name for name, _ in STAGES]
+    timings, outputs = [], {}
+    for name, script in STAGES:
+        if name not in selected:
+            continue
+        print(f"⏱️ Running {name}...")
+        seconds, exit_code, output, log = run_stage(script, workdir, env)
+        outputs[name] = output.replace(workdir, "<WORKDIR>")
+        with open(os.path.join(workdir, f"{name}.log"), 'w') as f:
+            f.write(log)
+        peak_rss_mb = stage_peak_rss(perf_folder, script)
+        timings.append([
+            name, f"{seconds:.2f}", f"{slots / seconds:,.0f}", f"{peak_rss_mb:,.1f}" if peak_rss_mb is not None else "",
+            "✅" if exit_code == 0 else f"❗️ exit {exit_code}"
+        ])
+
+    print(f"\n📄 **Stage Timings ({slots:,} slots, logs in {workdir}):**\n")
+    print(tabulate(timings, headers=["Stage", "Seconds", "Slots/s", "Peak RSS MB", "Status"], tablefmt="github"))
+
+    if args.reference_rows and "classify" in selected:
+        print(f"\n🔍 **Reference Check (first {args.reference_rows:,} slots vs. row-wise classification):**\n")
+        results = run_reference_check(raw_folder, processed_folder, args.reference_rows)
+        print(tabulate([[col, f"{count:,}", "✅" if count == 0 else "❗️"] for col, count in results], headers=["Column", "Mismatches", "Status"], tablefmt="github"))
+
+    report_outputs = {name: outputs[name] for name in RESULT_STAGES if name in outputs}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({"slots": slots, "seed": args.seed, "outputs": report_outputs}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+    if args.compare_baseline:
+        with open(args.compare_baseline) as f:
+            baseline = json.load(f)
+        if baseline["slots"] != slots or baseline["seed"] != args.seed:
+            print(f"\n⚠️ Baseline was recorded on {baseline['slots']:,} slots with seed {baseline['seed']}")
+        rows = []
+        for name, output in report_outputs.items():
+            expected = baseline["outputs"].get(name)
+            rows.append([name, "not in baseline" if expected is None else ("✅ identical" if expected == output else "❗️ differs")])
+        print("\n📌 **Baseline Comparison:**\n")
+        print(tabulate(rows, headers=["Stage", "Output"], tablefmt="github"))
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,134 @@
 """
 What the script does: CSV data extraction from the .gz.csv compressed folders produced by @ramana as a result of the data mining effort, which were downloaded locally for processing.
+Extraction is incremental: a manifest in the source folder records every extracted archive, so re-runs only extract new or changed archives and retry interrupted ones.
+With --slot-range START:END (or SLOT_RANGE, see rptheft_slotrange.py), only the archives whose slot range overlaps it are extracted.
+Every extracted CSV and its archive get a stats sidecar (row count, slot range, missing values, duplicates, checksum; see rptheft_filestats.py),
+taken from the decompressed blocks as they are written, so neither extraction nor the completeness check reads the CSV again.
+Decompression is CPU-bound: with EXTRACT_WORKERS > 1 archives are extracted by a pool of worker processes, in large blocks (EXTRACT_BLOCK_MB),
+with python-isal's igzip instead of the gzip module when it is installed. Each archive is verified while it is decompressed (gzip CRC-32 and length
+of every member, no data missing at the end) and its CSV is written to a temporary file renamed into place once complete, so a corrupt or
+truncated archive never leaves a CSV behind; the other archives are still extracted, then the run fails listing the corrupt ones.
 """
 
 import os
+import io
 import gzip
-import shutil
+import zlib
+import hashlib
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from rptheft_manifest import load_manifest, save_manifest, is_up_to_date, record_entry, atomic_output, file_fingerprint
+from rptheft_filestats import stream_file_stats, write_file_stats
+from rptheft_slotrange import raw_files_in_range, slot_range_setting, slot_range_argument, format_slot_range
+from rptheft_perf import stage, add_file_read, take_stages, merge_stages, run_report
+
+# python-isal's igzip is a faster drop-in gzip reader with the same CRC and length checks; the gzip module is used without it
+try:
+    from isal import igzip as gzip_reader, isal_zlib
+    CORRUPT_ARCHIVE_ERRORS = (EOFError, OSError, zlib.error, isal_zlib.error)
+except ImportError:
+    gzip_reader = gzip
+    CORRUPT_ARCHIVE_ERRORS = (EOFError, OSError, zlib.error)
 
 # Load environment variables
 load_dotenv(dotenv_path='local_paths.env')
 parent_folder = os.getenv("SOURCE_PATH")
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "1"))
+EXTRACT_BLOCK_BYTES = int(os.getenv("EXTRACT_BLOCK_MB", "16")) * 1024 * 1024
+
+# Bump when the extraction output changes, so existing CSVs are extracted again
+EXTRACT_VERSION = "1"
+MANIFEST_NAME = ".rptheft_extract_manifest.json"
+
+# Decompress one archive into its CSV and take the CSV's stats in the same pass; returns the archive's fingerprint and the stats.
+# The gzip reader checks the CRC-32 and length of every member and raises on a truncated archive; the CSV is only published once it is complete.
+def extract_archive(gz_path, csv_path):
+    with stage("extract") as record, atomic_output(csv_path) as tmp_path:
+        add_file_read(gz_path)
+        # The CSV is hashed while it is written, for its stats sidecar
+        digest = hashlib.sha256()
+        with gzip_reader.open(gz_path, 'rb') as f_in:
+            with open(tmp_path, 'wb', buffering=EXTRACT_BLOCK_BYTES) as f_out:
+                stats = stream_file_stats(written_blocks(f_in, f_out, digest))
+                written = f_out.tell()
+        if os.path.getsize(tmp_path) != written:
+            raise OSError(f"{os.path.basename(csv_path)}: wrote {os.path.getsize(tmp_path):,} of {written:,} bytes")
+        record["rows"] = stats["rows"]
+    write_file_stats(csv_path, stats, sha256=digest.hexdigest())
+    # The archive is fingerprinted here too, so its hash is taken in parallel
+    return file_fingerprint(gz_path), stats
+
+# Decompressed blocks of an archive, each written to the CSV and hashed before it is passed on
+def written_blocks(f_in, f_out, digest):
+    for block in iter(lambda: f_in.read(EXTRACT_BLOCK_BYTES), b""):
+        f_out.write(block)
+        digest.update(block)
+        yield block
+
+# Run extract_archive, returning (fingerprint, stats, None), or (None, None, error message) for a corrupt archive
+def extract_archive_checked(gz_path, csv_path):
+    try:
+        return *extract_archive(gz_path, csv_path), None
+    except CORRUPT_ARCHIVE_ERRORS as e:
+        return None, None, f"{type(e).__name__}: {e}"
 
-def extract_gz_files(folder_path):
+# Run extract_archive_checked in a worker process, capturing its log so parallel archives don't interleave output
+def extract_archive_captured(gz_path, csv_path):
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = extract_archive_checked(gz_path, csv_path)
+    return *result, log.getvalue(), take_stages()
+
+# Yield (fingerprint, stats, error) for every archive in order, sequentially or from a pool of worker processes
+def run_extraction(gz_paths, csv_paths, workers):
+    if workers > 1:
+        print(f"Extracting {len(gz_paths)} archives with {workers} worker processes...\n")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for fingerprint, stats, error, log, stages in executor.map(extract_archive_captured, gz_paths, csv_paths):
+                print(log, end="")
+                merge_stages(stages)
+                yield fingerprint, stats, error
+    else:
+        for gz_path, csv_path in zip(gz_paths, csv_paths):
+            yield extract_archive_checked(gz_path, csv_path)
+
+# Extract the new or changed archives of a folder; returns the names of the corrupt archives (nothing is extracted from them)
+def extract_gz_files(folder_path, slot_range=None, workers=1):
+    manifest_path = os.path.join(folder_path, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
     extracted_count = 0
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.csv.gz'):
-            gz_path = os.path.join(folder_path, filename)
-            csv_filename = filename.replace('.csv.gz', '.csv')
-            csv_path = os.path.join(folder_path, csv_filename)
-            # Skip if already extracted
-            if os.path.exists(csv_path):
-                continue
-            with gzip.open(gz_path, 'rb') as f_in:
-                with open(csv_path, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            extracted_count += 1
-            print(f"✅ Extracted: {filename} → {csv_filename}")
-    print(f"\n🎯 Extraction complete. {extracted_count} CSV files extracted to: {folder_path}")
+    archives = sorted(f for f in os.listdir(folder_path) if f.endswith('.csv.gz'))
+    selected = raw_files_in_range(archives, slot_range)
+    if slot_range is not None:
+        print(f"🎯 Slot range {format_slot_range(slot_range)}: {len(selected)} of {len(archives)} archives")
+    # Skip archives already extracted from the same contents (a CSV without manifest entry may be a partial write)
+    pending = [filename for filename in selected if not is_up_to_date(manifest, os.path.join(folder_path, filename), EXTRACT_VERSION)]
+    skipped_count = len(selected) - len(pending)
+
+    gz_paths = [os.path.join(folder_path, filename) for filename in pending]
+    csv_paths = [gz_path.replace('.csv.gz', '.csv') for gz_path in gz_paths]
+    corrupt = []
+    for filename, gz_path, csv_path, (fingerprint, stats, error) in zip(pending, gz_paths, csv_paths, run_extraction(gz_paths, csv_paths, workers)):
+        if error is not None:
+            print(f"❗️ Corrupt archive {filename}, not extracted: {error}")
+            corrupt.append(filename)
+            continue
+        record_entry(manifest, gz_path, [csv_path], EXTRACT_VERSION, input_fingerprint=fingerprint)
+        write_file_stats(gz_path, stats, sha256=fingerprint["sha256"])
+        save_manifest(manifest, manifest_path)
+        extracted_count += 1
+        print(f"✅ Extracted: {filename} → {os.path.basename(csv_path)}")
+    save_manifest(manifest, manifest_path)
+    print(f"\n🎯 Extraction complete. {extracted_count} CSV files extracted to: {folder_path} ({skipped_count} already up to date)")
+    return corrupt
+
+def main():
+    corrupt = extract_gz_files(parent_folder, slot_range_setting(), EXTRACT_WORKERS)
+    if corrupt:
+        raise RuntimeError(f"{len(corrupt)} corrupt archives were not extracted: {', '.join(corrupt)}")
 
 if __name__ == "__main__":
-    extract_gz_files(parent_folder)
+    slot_range_argument()
+    with run_report("rptheft_data1_ziptocsv"):
+        main()
@@ -2,26 +2,48 @@
 Script Goal: Clean, standardize, and enrich Ethereum slot-level CSV data as part of the Rocketpool MEV theft analysis project. It processes raw slot data files and produces cleaned, standardized CSV files that can be used for further analysis and visualization. Script: YYY
 
 **What the Script Does**
-- Reads raw CSV files from the SOURCE_PATH directory.
+- Reads raw CSV files from the SOURCE_PATH directory (or, with STREAM_FROM_GZ=true, streams the .csv.gz archives in row chunks without extracting them).
 - Curates, classifies, and expands the slot information available in our datasources (see definitions in the section below).
-- Exports processed data to the PROCESSED_PATH folder as new CSV files.
+- Exports processed data to the PROCESSED_PATH folder as typed Parquet partitions, one per source slot range (see rptheft_slotstore.py).
+- Runs incrementally: a manifest in PROCESSED_PATH records every processed input, so re-runs only process new or changed slot files (see rptheft_manifest.py).
+- Aggregates every file into a per-node-operator rollup part (vanilla blocks, bid gaps and theft per node), used for the node rankings (see rptheft_rollup.py).
+- Aggregates every file into a time-bucketed rollup cube part (slots, vanilla blocks, bid gaps and theft per UTC day, Rocket Pool and smoothing pool cohort and relay), used for trends over time (see rptheft_timecube.py).
+- Keeps a zone map of the partitions (row count and min/max slot per partition and row group), so readers given a --slot-range only open the partitions and row groups of the range (see rptheft_slotrange.py).
+- With --slot-range START:END (or SLOT_RANGE), only the slot files overlapping the range are processed.
+- Indexes every fee recipient and distributor address with the slots where it appears, for fast address lookups (see rptheft_addressindex.py).
+- Writes a stats sidecar for every slot file it reads (row count, slot range, missing values, duplicates, checksum and flagged slot counts), used by the completeness check (see rptheft_filestats.py).
 
 **Definitions Created in the Data Classification and Curation Process**
 The dataset used in this analysis underwent a structured preparation and classification process to enable reliable downstream analysis. Specifically, the following data curation steps were applied:
 - **Normalization of Ethereum Addresses**: All Ethereum addresses were standardized to lowercase to ensure consistency and avoid mismatches.
 - **Relay Name Standardization**: Relay names were cleaned and mapped to standardized identifiers to consolidate different naming conventions used across our data sources.
-- **Conversion of Values to ETH**: Key numerical fields, including transaction values, MEV rewards, and bids, originally recorded in wei units, were converted to ETH and rounded to eight decimal places.
+- **Conversion of Values to gwei**: Key numerical fields, including transaction values, MEV rewards, and bids, originally recorded in wei units, were parsed exactly into integer gwei columns (<column>_gwei). Totals are summed in integer gwei and converted to ETH only for display.
 - **Identification of Vanilla Blocks**: A classification column vanilla_block was added to flag slots without any recorded MEV rewards or fee recipients across our data sources.
 - **MEV Theft Detection**: Two additional columns were created to flag slots that potentially exhibit MEV theft behavior:
   - sp_high-confidence_theft marks slots where the block proposer was part of the Rocketpool Smoothing Pool but no portion of the MEV reward was distributed to the smoothing pool contract address.
   - reg_high-confidence_theft marks slots outside the smoothing pool where the distributor address differs from all recorded MEV recipients across our data sources.
 - Slot-level MEV Averaging: For contextual analysis, the average MEV bid for each slot was calculated based on two separate data sources (max_bid and mevmonitor_max_bid).
+- **Surrounding MEV**: The column surrounding_avg_max_bid holds the average max bid (both sources) of a centered window of slots around each slot (2 slots on each side by default, see SURROUNDING_SLOTS), continuing across file boundaries. It serves as a counterfactual for the MEV a vanilla block could have earned.
 - All processed files were saved in a structured output folder and used as the standardized input for subsequent analyses (see sections below).
 """
 
 import os
+import io
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
+from tabulate import tabulate
+from rptheft_slotstore import WEI_COLUMNS, GWEI_PER_ETH, parse_wei_to_gwei, processed_file_writer, drop_invalid_slots
+from rptheft_manifest import load_manifest, save_manifest, is_up_to_date, record_entry
+from rptheft_filestats import block_stats, combine_block_stats, write_file_stats, load_file_stats
+from rptheft_rollup import build_rollup, combine_rollups, write_rollup
+from rptheft_timecube import build_time_cube, combine_time_cubes, write_time_cube
+from rptheft_addressindex import build_address_index, write_address_index
+from rptheft_slotrange import raw_files_in_range, load_zone_maps, slot_range_setting, slot_range_argument, format_slot_range
+from rptheft_perf import stage, add_file_read, timed_chunks, take_stages, merge_stages, run_report
 
 # Load environment variables
 load_dotenv(dotenv_path='local_paths.env')
@@ -39,23 +61,80 @@ print(f"Output folder path: {output_folder_path}")
 os.makedirs(output_folder_path, exist_ok=True)
 
 sp_address = "0xd4e96ef8eee8678dbff4d535e033ed1a4f7605b7".lower()
+recipient_columns = ['relay_fee_recipient', 'mevmonitor_fee_recipient', 'beaconcha_fee_recipient', 'last_tx_recipient']
 
-# Normalize Ethereum addresses
-def normalize_address(addr):
-    return addr.lower() if pd.notna(addr) else ""
+# Print every flagged slot (not only the summary) when LOG_THEFT_SLOTS=true
+log_theft_slots = os.getenv("LOG_THEFT_SLOTS", "false").strip().lower() == "true"
 
-# Flatten and normalize multiple addresses separated by ";"
-def extract_normalized_addresses(column_value):
-    if pd.notna(column_value):
-        return [normalize_address(addr) for addr in column_value.split(";")]
-    return []
+# Number of worker processes for the classification stage (1 = process files one after another)
+classify_workers = int(os.getenv("CLASSIFY_WORKERS", "1"))
 
-# Convert specific columns from Wei to ETH and round to 8 decimals
-def convert_wei_to_eth(df, columns, decimals=8):
+# Reprocess every file, ignoring the manifest, when FORCE_REPROCESS=true
+force_reprocess = os.getenv("FORCE_REPROCESS", "false").strip().lower() == "true"
+
+# Classify the .csv.gz archives directly in bounded-size row chunks (no extracted CSVs needed) when STREAM_FROM_GZ=true
+stream_from_gz = os.getenv("STREAM_FROM_GZ", "false").strip().lower() == "true"
+chunk_rows = int(os.getenv("CHUNK_ROWS", "100000"))
+
+# Number of slots on each side of a slot averaged into surrounding_avg_max_bid (default 2: a centered window of 5 slots)
+surrounding_slots = int(os.getenv("SURROUNDING_SLOTS", "2"))
+surrounding_columns = ['max_bid', 'mevmonitor_max_bid']
+
+# Bump whenever the classification logic or the store schema changes, so existing outputs are rebuilt
+PIPELINE_VERSION = "7"
+MANIFEST_NAME = ".rptheft_classify_manifest.json"
+
+# Normalize a column of Ethereum addresses (empty string for missing values)
+def normalize_address_column(series):
+    return series.fillna("").astype(str).str.lower()
+
+# Join the normalized ";"-separated recipient columns of every slot into one ";"-separated string.
+# An address (which never contains ";") is a substring of the joined string exactly when it is a substring of one of the recipients.
+def combine_normalized_recipients(df, columns):
+    combined = pd.Series("", index=df.index, dtype=object)
+    for col in columns:
+        values = normalize_address_column(df[col]) if col in df.columns else ""
+        combined = combined + ";" + values
+    return combined
+
+# Whether the distributor address of every slot is (a substring of) one of its ";"-separated recipient addresses, as a boolean array.
+# Only slots with a single distributor address can match. Their recipient columns are compared with the distributor as a whole;
+# values holding several addresses are split into long form (one entry per slot and address) first.
+# Only the rare recipients longer than the distributor, which could contain it, are tested one by one.
+def distributor_in_recipients(df, columns, distributor):
+    found = np.zeros(len(df), dtype=bool)
+    distributor = distributor.set_axis(np.arange(len(df)))
+    distributor = distributor[distributor != ""]
+    distributor = distributor[~distributor.str.contains(";", regex=False)]
+    positions = distributor.index.to_numpy(dtype=np.int64)
+    slot_distributor = distributor.to_numpy(dtype=object)
+    distributor_length = distributor.str.len().to_numpy()
+    matched = np.zeros(len(positions), dtype=bool)
+    for col in columns:
+        if col not in df.columns or len(positions) == 0:
+            continue
+        # Addresses indexed by their slot's place among the slots with a distributor
+        addresses = normalize_address_column(df[col].iloc[positions]).set_axis(np.arange(len(positions)))
+        matched |= addresses.to_numpy(dtype=object) == slot_distributor
+        addresses = addresses[~matched]
+        several = addresses.str.contains(";", regex=False).to_numpy()
+        addresses = pd.concat([addresses[~several], addresses[several].str.split(";").explode()])
+        places = addresses.index.to_numpy(dtype=np.int64)
+        recipient = addresses.to_numpy(dtype=object)
+        matched[places[recipient == slot_distributor[places]]] = True
+        longer = (addresses.str.len().to_numpy() > distributor_length[places]) & ~matched[places]
+        for place, r in zip(places[longer], recipient[longer]):
+            if slot_distributor[place] in r:
+                matched[place] = True
+    found[positions] = matched
+    return found
+
+# Convert specific columns from wei strings to exact integer gwei (<column>_gwei replaces <column>)
+def convert_wei_to_gwei(df, columns):
     for col in columns:
         if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            df[col] = df[col].apply(lambda x: round(x / 10**18, decimals) if pd.notnull(x) else x)
+            df.insert(df.columns.get_loc(col), f"{col}_gwei", parse_wei_to_gwei(df[col]))
+            df = df.drop(columns=[col])
     return df
 
 # Standardize relay names
@@ -80,104 +159,323 @@ def standardize_relay_names(df, relay_columns):
         "agnostic-relay.net": "agnostic-relay"
     }
 
+    # A handful of distinct relay strings repeat over millions of cells: each distinct value is mapped once, then spread back by its code
     for col in relay_columns:
         if col in df.columns:
-            df[col] = df[col].apply(lambda x: ";".join([relay_map.get(r.strip(), r.strip()) for r in x.split(";")]) if pd.notna(x) else x)
+            codes, relays = pd.factorize(df[col])
+            if len(relays) == 0:
+                continue
+            standardized = np.array([";".join([relay_map.get(r.strip(), r.strip()) for r in relay.split(";")]) for relay in relays], dtype=object)
+            df[col] = df[col].mask(codes >= 0, pd.Series(standardized[codes], index=df.index))
     return df
 
-# Function to identify vanilla blocks
+# Function to identify vanilla blocks: no MEV reward, reward relay or relay fee recipient in any data source
 def identify_vanilla_blocks(df):
-    df['vanilla_block'] = df.apply(
-        lambda row: "TRUE" if all(pd.isna(row[col]) for col in [
-            'mev_reward', 'mev_reward_relay', 'relay_fee_recipient', 
-            'beaconcha_mev_reward', 'beaconcha_mev_reward_relay', 
-            'beaconcha_fee_recipient', 'mevmonitor_mev_reward', 
-            'mevmonitor_mev_reward_relay'
-        ]) else "", axis=1
-    )
+    df['vanilla_block'] = df[[
+        'mev_reward_gwei', 'mev_reward_relay', 'relay_fee_recipient',
+        'beaconcha_mev_reward_gwei', 'beaconcha_mev_reward_relay',
+        'beaconcha_fee_recipient', 'mevmonitor_mev_reward_gwei',
+        'mevmonitor_mev_reward_relay'
+    ]].isna().all(axis=1).astype(bool)
     return df
 
-# Function to calculate the average MEV for 2 blocks before and after
-def calculate_surrounding_mev(df, index):
-    max_bid_values = df.loc[max(0, index-2):min(len(df)-1, index+2), ['max_bid', 'mevmonitor_max_bid']].mean().mean()
-    return round(max_bid_values, 8) if pd.notna(max_bid_values) else 0
+# Raw bid rows (slot and the max bid sources) of a block of raw slot rows, converted to gwei
+def surrounding_bid_rows(raw_rows):
+    bids = pd.DataFrame({'slot': pd.to_numeric(raw_rows['slot'], errors='coerce')}, index=raw_rows.index)
+    for col in surrounding_columns:
+        bids[f"{col}_gwei"] = parse_wei_to_gwei(raw_rows[col])
+    return bids
+
+# Function to calculate the average max bid of the slots before and after every slot (centered window of 2 * half_window + 1 slots, in slot order).
+# Each max bid source is averaged over the window, then the source averages are averaged; slots without any bid in their window get 0.
+# previous_rows / next_rows are the raw rows just before and after df (tail of the previous chunk or file, head of the next one),
+# so windows continue across chunk and file boundaries.
+def calculate_surrounding_mev(df, half_window=2, previous_rows=None, next_rows=None):
+    bid_columns = [f"{col}_gwei" for col in surrounding_columns]
+    previous_bids = surrounding_bid_rows(previous_rows) if previous_rows is not None else None
+    next_bids = surrounding_bid_rows(next_rows) if next_rows is not None else None
+    offset = len(previous_bids) if previous_bids is not None else 0
+
+    stitched = pd.concat([previous_bids, df[['slot'] + bid_columns], next_bids], ignore_index=True)
+    stitched['slot'] = pd.to_numeric(stitched['slot'], errors='coerce')
+    ordered = stitched.sort_values('slot', kind='stable')
+    window_means = ordered[bid_columns].astype('float64').rolling(2 * half_window + 1, center=True, min_periods=1).mean()
+    surrounding = window_means.mean(axis=1).sort_index().iloc[offset:offset + len(df)]
+
+    df['surrounding_avg_max_bid'] = (surrounding / GWEI_PER_ETH).round(8).fillna(0).to_numpy()
+    return df
 
 # Function to identify MEV theft
-def identify_mev_theft(df):
-    df['sp_high-confidence_theft'] = ""
-    df['reg_high-confidence_theft'] = ""
-
-    def check_theft_logging(row):
-        recipient_columns = ['relay_fee_recipient', 'mevmonitor_fee_recipient', 'beaconcha_fee_recipient', 'last_tx_recipient']
-        recipients = [addr for col in recipient_columns for addr in extract_normalized_addresses(row.get(col, ""))]
-        distributor = normalize_address(row['distributor_address'])
-        in_smoothing_pool = str(row['in_smoothing_pool']).strip().lower() == "true"
-
-        #print(f"Slot: {row['slot']}")
-        #print(f"In Smoothing Pool: {in_smoothing_pool}")
-        #print(f"Distributor Address: {distributor if distributor else 'Empty'}")
-        #print(f"Recipients: {recipients}")
-
-        # Check smoothing pool theft
-        if in_smoothing_pool:
-            if all(sp_address not in recipient for recipient in recipients):
-                row['sp_high-confidence_theft'] = "TRUE"
-                print(f"Slot: {row['slot']}"+" - Smoothing Pool Theft: High Confidence")
-        elif distributor:
-            if all(distributor not in recipient for recipient in recipients):
-                row['reg_high-confidence_theft'] = "TRUE"
-                print(f"Slot: {row['slot']}"+" - Regular Theft: High Confidence")
-
-        #print(f"Smoothing Pool Theft: {row['sp_high-confidence_theft']}")
-        #print(f"Regular Theft: {row['reg_high-confidence_theft']}")
-        #print("----")
-        
-        return row
-
-    df = df.apply(check_theft_logging, axis=1)
+def identify_mev_theft(df, log_slots=False):
+    recipients = combine_normalized_recipients(df, recipient_columns)
+    distributor = normalize_address_column(df['distributor_address'])
+    in_smoothing_pool = df['in_smoothing_pool'].astype(str).str.strip().str.lower() == "true"
+
+    # Smoothing pool theft: no recipient contains the smoothing pool address
+    sp_theft = in_smoothing_pool & ~recipients.str.contains(sp_address, regex=False)
+
+    # Regular theft: outside the smoothing pool, no recipient contains the distributor address
+    distributor_missing = pd.Series(~distributor_in_recipients(df, recipient_columns, distributor), index=df.index)
+    reg_theft = ~in_smoothing_pool & (distributor != "") & distributor_missing
+
+    df['sp_high-confidence_theft'] = sp_theft
+    df['reg_high-confidence_theft'] = reg_theft
+
+    if log_slots:
+        for slot, is_sp in zip(df.loc[sp_theft | reg_theft, 'slot'], sp_theft[sp_theft | reg_theft]):
+            label = "Smoothing Pool Theft" if is_sp else "Regular Theft"
+            print(f"Slot: {slot} - {label}: High Confidence")
+    return df
+
+# Classify a block of raw slot rows. Every step only looks at the row itself, so a file can be classified in chunks.
+def classify_slots(df):
+    # Process data (e.g., convert, standardize, identify vanilla blocks, identify theft, calculate missed MEV)
+    # Convert from wei to exact gwei for specified columns
+    with stage("convert_wei_to_gwei", rows=len(df)):
+        df = convert_wei_to_gwei(df, WEI_COLUMNS)
+
+    # Standardize relay names
+    relay_columns = [
+        'max_bid_relay', 'mev_reward_relay',
+        'beaconcha_mev_reward_relay', 'mevmonitor_max_bid_relay',
+        'mevmonitor_mev_reward_relay'
+    ]
+    with stage("standardize_relay_names", rows=len(df)):
+        df = standardize_relay_names(df, relay_columns)
+
+    # Identify vanilla blocks
+    with stage("identify_vanilla_blocks", rows=len(df)):
+        df = identify_vanilla_blocks(df)
+
+    # Identify MEV theft
+    with stage("identify_mev_theft", rows=len(df)):
+        df = identify_mev_theft(df, log_slots=log_theft_slots)
     return df
 
-# Process CSV files in the input folder and save to output folder
-def process_csv_files(input_folder, output_folder):
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".csv"):
-            input_file_path = os.path.join(input_folder, filename)
-            print(f"Processing {filename}...")
-
-            # Read CSV file into DataFrame
-            df = pd.read_csv(input_file_path)
-
-            # Process data (e.g., convert, standardize, identify vanilla blocks, identify theft, calculate missed MEV)
-            # Convert from wei to ETH for specified columns
-            wei_columns = [
-                'last_tx_value', 'priority_fees', 'eth_collat_ratio',
-                'max_bid', 'mev_reward', 'beaconcha_mev_reward',
-                'mevmonitor_max_bid', 'mevmonitor_mev_reward'
-            ]
-            df = convert_wei_to_eth(df, wei_columns, decimals=8)
-
-            # Standardize relay names
-            relay_columns = [
-                'max_bid_relay', 'mev_reward_relay',
-                'beaconcha_mev_reward_relay', 'mevmonitor_max_bid_relay',
-                'mevmonitor_mev_reward_relay'
-            ]
-            df = standardize_relay_names(df, relay_columns)
-
-            # Identify vanilla blocks
-            df = identify_vanilla_blocks(df)
-
-            # Identify MEV theft
-            df = identify_mev_theft(df)
-
-            # Save the processed DataFrame to a new CSV file in the output folder
-            output_file_path = os.path.join(output_folder, f"processed_{filename}")
-            df.to_csv(output_file_path, index=False)
-            print(f"Processed data saved to {output_file_path}\n")
+# Read the raw bid rows at the start (or end) of a neighbouring slot file, to continue rolling windows across files.
+# The tail of a compressed file is taken from its stats sidecar (see rptheft_filestats.py), written by the pass that last read it
+# (extraction, the classification of that file or the completeness check); without a current sidecar the file is scanned in chunks.
+# The tail of a plain CSV is read from the last bytes of the file.
+def read_neighbour_rows(input_file_path, rows, from_end=False):
+    if input_file_path is None or rows == 0:
+        return None
+    read_options = {"usecols": ['slot'] + surrounding_columns, "dtype": str}
+    if not from_end:
+        return pd.read_csv(input_file_path, nrows=rows, **read_options)
+    if input_file_path.endswith(".gz"):
+        tail = sidecar_tail_rows(input_file_path, rows)
+        if tail is not None:
+            return tail
+    else:
+        with open(input_file_path, 'rb') as f:
+            header = f.readline()
+            end = f.seek(0, os.SEEK_END)
+            block_size = 64 * 1024
+            while True:
+                start = max(len(header), end - block_size)
+                f.seek(start)
+                lines = [line for line in f.read(end - start).splitlines() if line.strip()]
+                if start > len(header):
+                    lines = lines[1:]  # the first line may be cut off
+                if len(lines) >= rows or start == len(header):
+                    break
+                block_size *= 4
+        tail_csv = header + b"".join(line + b"\n" for line in lines[-rows:])
+        return pd.read_csv(io.BytesIO(tail_csv), **read_options)
+    print(f"⚠️ No current stats sidecar for {os.path.basename(input_file_path)}: scanning it for its last rows")
+    tail = None
+    for chunk in pd.read_csv(input_file_path, chunksize=max(rows, 100000), **read_options):
+        tail = pd.concat([tail, chunk]).tail(rows)
+    return tail
+
+# Last raw bid rows of a file from its stats sidecar, or None when the sidecar is not current or holds fewer rows than needed
+def sidecar_tail_rows(input_file_path, rows):
+    stats, integrity = load_file_stats(input_file_path)
+    if integrity != "current" or stats.get("tail_rows") is None:
+        return None
+    tail = pd.DataFrame(stats["tail_rows"], dtype=object)[['slot'] + surrounding_columns]
+    if len(tail) < min(rows, stats["rows"]):
+        return None
+    return tail.tail(rows).reset_index(drop=True)
+
+# Yield every chunk of raw rows with the raw rows just before and after it (up to `rows` on each side).
+# The first chunk continues from previous_rows and the last one from next_rows; chunks need at least `rows` rows, except the last.
+def with_neighbour_rows(chunks, rows, previous_rows=None, next_rows=None):
+    halo_columns = ['slot'] + surrounding_columns
+    chunks = iter(chunks)
+    current = next(chunks, None)
+    while current is not None:
+        following = next(chunks, None)
+        if following is None:
+            after = next_rows
+        else:
+            after = following[halo_columns].head(rows)
+            if len(after) < rows:
+                # The following chunk is the last one and shorter than the window
+                after = pd.concat([after, next_rows]).head(rows)
+        before_next = pd.concat([previous_rows, current[halo_columns]]).tail(rows)
+        yield current, previous_rows, after
+        previous_rows = before_next
+        current = following
+
+# Take the stats of every raw chunk, then drop its rows without a valid slot number (counted in summary["Invalid Slots"]):
+# the non-numeric slot entries the completeness check reports cannot be stored
+def valid_slot_chunks(chunks, file_stats, summary):
+    for df in chunks:
+        with stage("file_stats", rows=len(df)):
+            file_stats.append(block_stats(df))
+        df, dropped = drop_invalid_slots(df)
+        summary["Invalid Slots"] += dropped
+        yield df
+
+# Process one raw .csv or .csv.gz file and save it to the output folder; returns the per-file summary.
+# With chunk_rows the file is streamed (gzip is decompressed on the fly) and written chunk by chunk,
+# so peak memory depends on the chunk size instead of the file size.
+# previous_file / next_file are the neighbouring raw files in slot order, used for the surrounding max bid windows at the file edges.
+def process_csv_file(input_file_path, output_folder, chunk_rows=None, previous_file=None, next_file=None):
+    filename = os.path.basename(input_file_path)
+    print(f"Processing {filename}...")
+
+    summary = {"File": filename, "Rows": 0, "Vanilla Blocks": 0, "SP Theft": 0, "Regular Theft": 0, "Invalid Slots": 0}
+
+    with stage("classify_file") as file_record:
+        # Read CSV file into DataFrame (wei amounts as text so they can be parsed exactly)
+        read_options = {"dtype": {col: str for col in WEI_COLUMNS}}
+        add_file_read(input_file_path)
+        if chunk_rows:
+            chunks = timed_chunks("read_csv", pd.read_csv(input_file_path, chunksize=max(chunk_rows, surrounding_slots), **read_options))
+        else:
+            with stage("read_csv") as record:
+                chunks = [pd.read_csv(input_file_path, **read_options)]
+                record["rows"] = len(chunks[0])
+        with stage("read_neighbour_rows"):
+            previous_rows = read_neighbour_rows(previous_file, surrounding_slots, from_end=True)
+            next_rows = read_neighbour_rows(next_file, surrounding_slots)
+
+        # Save the processed data as a Parquet partition in the output folder
+        rollups, time_cubes, address_indexes, file_stats = [], [], [], []
+        with processed_file_writer(output_folder, filename) as (output_file_path, write_chunk):
+            for df, before, after in with_neighbour_rows(valid_slot_chunks(chunks, file_stats, summary), surrounding_slots, previous_rows, next_rows):
+                df = classify_slots(df)
+                with stage("calculate_surrounding_mev", rows=len(df)):
+                    df = calculate_surrounding_mev(df, surrounding_slots, before, after)
+                with stage("write_parquet", rows=len(df)):
+                    write_chunk(df)
+                with stage("build_rollup", rows=len(df)):
+                    rollups.append(build_rollup(df))
+                with stage("build_time_cube", rows=len(df)):
+                    time_cubes.append(build_time_cube(df))
+                with stage("build_address_index", rows=len(df)):
+                    address_indexes.append(build_address_index(df))
+
+                file_record["rows"] += df.shape[0]
+                summary["Rows"] += df.shape[0]
+                summary["Vanilla Blocks"] += int(df['vanilla_block'].sum())
+                summary["SP Theft"] += int(df['sp_high-confidence_theft'].sum())
+                summary["Regular Theft"] += int(df['reg_high-confidence_theft'].sum())
+
+        # Written after the partition, so they are never older than the partition they summarize
+        with stage("write_rollup"):
+            summary["Rollup"] = write_rollup(combine_rollups(rollups), output_file_path)
+        with stage("write_time_cube"):
+            summary["Time Cube"] = write_time_cube(combine_time_cubes(time_cubes), output_file_path)
+        with stage("write_address_index"):
+            summary["Address Index"] = write_address_index(address_indexes, output_file_path)
+        # Written once the file is recorded in the manifest, which hashes it
+        summary["File Stats"] = combine_block_stats(file_stats)
+
+    if summary["Invalid Slots"]:
+        print(f"⚠️ {summary['Invalid Slots']:,} rows without a valid slot number were left out (see the completeness check)")
+    print(f"🔎 High-confidence theft flagged: {summary['SP Theft']:,} smoothing pool slots, {summary['Regular Theft']:,} regular slots")
+    print(f"Processed data saved to {output_file_path}\n")
+    summary["Output"] = output_file_path
+    return summary
+
+# Run process_csv_file in a worker process, capturing its log so parallel files don't interleave output
+def process_csv_file_captured(input_file_path, output_folder, chunk_rows=None, previous_file=None, next_file=None):
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        summary = process_csv_file(input_file_path, output_folder, chunk_rows, previous_file, next_file)
+    return summary, log.getvalue(), take_stages()
+
+# Print the aggregated per-file summary of a classification run
+def print_processing_summary(summaries):
+    totals = {key: sum(summary[key] for summary in summaries) for key in ["Rows", "Vanilla Blocks", "SP Theft", "Regular Theft"]}
+    rows = [[s["File"], f"{s['Rows']:,}", f"{s['Vanilla Blocks']:,}", f"{s['SP Theft']:,}", f"{s['Regular Theft']:,}"] for s in summaries]
+    rows.append(["Total", f"{totals['Rows']:,}", f"{totals['Vanilla Blocks']:,}", f"{totals['SP Theft']:,}", f"{totals['Regular Theft']:,}"])
+
+    print("\n📄 **Slot Classification Summary:**\n")
+    print(tabulate(rows, headers=["File", "Rows", "Vanilla Blocks", "SP Theft", "Regular Theft"], tablefmt="github"))
+
+# Yield the summary of every processed file in input order, sequentially or from a pool of worker processes.
+# neighbours holds the (previous, next) raw file of every input file.
+def run_processing(input_files, neighbours, output_folder, workers, chunk_rows=None):
+    previous_files = [previous_file for previous_file, _ in neighbours]
+    next_files = [next_file for _, next_file in neighbours]
+    if workers > 1:
+        print(f"Processing {len(input_files)} files with {workers} worker processes...\n")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for summary, log, stages in executor.map(process_csv_file_captured, input_files, repeat(output_folder), repeat(chunk_rows), previous_files, next_files):
+                print(log, end="")
+                merge_stages(stages)
+                yield summary
+    else:
+        for input_file_path, previous_file, next_file in zip(input_files, previous_files, next_files):
+            yield process_csv_file(input_file_path, output_folder, chunk_rows, previous_file, next_file)
+
+# Manifest context of a file: its neighbouring files and the surrounding window they were used with
+def file_context(previous_file, next_file):
+    return {
+        "previous": os.path.basename(previous_file) if previous_file else None,
+        "next": os.path.basename(next_file) if next_file else None,
+        "surrounding_slots": surrounding_slots,
+    }
+
+# Process CSV files in the input folder and save to output folder.
+# Files already processed by this PIPELINE_VERSION are skipped; each finished file is recorded in the manifest right away,
+# so an interrupted run resumes with the remaining files.
+# With workers > 1 files are processed concurrently; logs and summaries are still reported in file name order.
+# With stream_gz the .csv.gz archives are processed directly in chunks of chunk_rows, without extracting them first.
+# With a slot_range (start, end), only the files whose slot range overlaps it are processed and summarized.
+def process_csv_files(input_folder, output_folder, workers=1, force=False, stream_gz=False, chunk_rows=None, slot_range=None):
+    input_suffix = ".csv.gz" if stream_gz else ".csv"
+    input_files = [os.path.join(input_folder, f) for f in sorted(os.listdir(input_folder)) if f.endswith(input_suffix)]
+    selected_files = raw_files_in_range(input_files, slot_range)
+    if slot_range is not None:
+        print(f"🎯 Slot range {format_slot_range(slot_range)}: {len(selected_files)} of {len(input_files)} slot files")
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    # Files are neighbours in slot order; a file is reprocessed when its neighbours change, as its edge windows depend on them
+    neighbours = {path: (input_files[i - 1] if i > 0 else None, input_files[i + 1] if i + 1 < len(input_files) else None) for i, path in enumerate(input_files)}
+    contexts = {path: file_context(*neighbours[path]) for path in input_files}
+
+    pending_files = [path for path in selected_files if force or not is_up_to_date(manifest, path, PIPELINE_VERSION, contexts[path])]
+    print(f"⏭️ {len(selected_files) - len(pending_files)} files unchanged since the last run, {len(pending_files)} to process\n")
+
+    pending_neighbours = [neighbours[path] for path in pending_files]
+    for input_file_path, summary in zip(pending_files, run_processing(pending_files, pending_neighbours, output_folder, workers, chunk_rows)):
+        file_stats = summary.pop("File Stats")
+        record_entry(manifest, input_file_path, [summary["Output"], summary["Rollup"], summary["Time Cube"], summary["Address Index"]], PIPELINE_VERSION, summary, contexts[input_file_path])
+        save_manifest(manifest, manifest_path)
+        flagged = {"vanilla_block": summary["Vanilla Blocks"], "sp_high-confidence_theft": summary["SP Theft"], "reg_high-confidence_theft": summary["Regular Theft"]}
+        write_file_stats(input_file_path, file_stats, sha256=manifest["entries"][os.path.basename(input_file_path)]["input"]["sha256"], flagged=flagged)
+    save_manifest(manifest, manifest_path)
+    with stage("update_zone_maps"):
+        load_zone_maps(output_folder)
+
+    summaries = [manifest["entries"][os.path.basename(path)]["summary"] for path in selected_files]
+    print_processing_summary(summaries)
+    return summaries
 
 # Main function
 def main():
-    process_csv_files(input_folder_path, output_folder_path)
+    process_csv_files(
+        input_folder_path, output_folder_path, workers=classify_workers, force=force_reprocess,
+        stream_gz=stream_from_gz, chunk_rows=chunk_rows if stream_from_gz else None, slot_range=slot_range_setting()
+    )
 
 if __name__ == "__main__":
-    main()
+    slot_range_argument()
+    with run_report("rptheft_data2_slotclassification"):
+        main()
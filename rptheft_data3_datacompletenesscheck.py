@@ -1,124 +1,205 @@
 """
-What the script does: Slot Dataset Integrity & Quality Checks. 
-It validates the completeness and data quality of the Ethereum slot-level dataset used in the Rocketpool MEV theft analysis project. 
+What the script does: Slot Dataset Integrity & Quality Checks.
+It validates the completeness and data quality of the Ethereum slot-level dataset used in the Rocketpool MEV theft analysis project.
 It performs structural and continuity checks on all raw .csv files to ensure slot coverage, data quality, and integrity across millions of slot entries.
+The check is a metadata-only scan: extraction and slot classification leave a stats sidecar next to every raw file (row count, slot ranges, duplicates,
+non-numeric slots, size and checksum; see rptheft_filestats.py), and the files themselves are not read. A file without a sidecar, or changed since its sidecar
+was taken (e.g. truncated), is read once and gets a new sidecar (in parallel with CHECK_WORKERS > 1). Coverage is tracked in a per-slot count array over the expected range,
+and missing or duplicate slots are reported as compressed ranges.
+With --slot-range START:END (or SLOT_RANGE, see rptheft_slotrange.py), only the files overlapping the range are checked and the range replaces EXPECTED_SLOT_RANGE;
+an open end of the range keeps the corresponding end of EXPECTED_SLOT_RANGE.
+Every slot file is checked once: an archive whose extracted CSV is next to it (as extraction leaves them) is left out, so its slots are not counted twice.
 """
 
 import os
-import pandas as pd
 import numpy as np
-import gzip
+from concurrent.futures import ProcessPoolExecutor
 from tabulate import tabulate
+from rptheft_slotrange import raw_files_in_range, slot_range_setting, slot_range_argument, format_slot_range
+from rptheft_filestats import read_file_stats, write_file_stats, load_file_stats, compress_ranges, expand_ranges
+from rptheft_perf import stage, add_file_read, run_report
 
 # === CONFIGURATION ===
 from dotenv import load_dotenv
 load_dotenv(dotenv_path='local_paths.env')
 DATA_FOLDER = os.getenv("SOURCE_PATH")
+# First and last expected slot (both included)
 EXPECTED_SLOT_RANGE = (5203000, 9899999)
-MIN_EXPECTED_FILE_SIZE_MB = 40  # adjust if needed
+CHECK_WORKERS = int(os.getenv("CHECK_WORKERS", "1"))
 
 # === CORE FUNCTIONS ===
 
-def read_csv_file(filepath):
-    try:
-        if filepath.endswith(".gz"):
-            with gzip.open(filepath, 'rt') as f:
-                df = pd.read_csv(f)
-        else:
-            df = pd.read_csv(filepath)
-        return df
-    except Exception as e:
-        print(f"❗️ Could not read {os.path.basename(filepath)}: {e}")
-        return None
-
 def check_file_size(filepath):
     size_mb = os.path.getsize(filepath) / (1024 * 1024)
     return size_mb
 
-def validate_slot_column(df, filename):
-    non_numeric = df[~df['slot'].apply(lambda x: str(x).isdigit())]
-    if not non_numeric.empty:
-        print(f"⚠️ File {filename} has non-numeric slot entries: {non_numeric['slot'].tolist()[:5]} ...")
-    return len(non_numeric)
+def format_ranges(ranges):
+    return [[f"{start}" if start == end else f"{start} - {end}", f"{end - start + 1:,}"] for start, end in ranges]
+
+INTEGRITY_LABELS = {
+    "current": "✅ Matches stats",
+    "missing": "🆕 Stats taken",
+    "changed": "⚠️ Changed since stats",
+}
+
+# Check one data file from its stats sidecar (the file is only read if the sidecar is missing or stale);
+# returns its report row, stats (or None if the file is broken) and whether the file was read
+def check_file(filepath):
+    filename = os.path.basename(filepath)
+    file_size = check_file_size(filepath)
+
+    stats, integrity = load_file_stats(filepath)
+    if stats is None:
+        if integrity == "changed":
+            print(f"⚠️ File {filename} changed since its stats were taken (size or checksum differs), e.g. truncated or rewritten")
+        try:
+            # Every column is read as text so malformed entries can be reported; .gz files are decompressed on the fly
+            stats = read_file_stats(filepath)
+        except Exception as e:
+            print(f"❗️ Could not read {filename}: {e}")
+            return filename, None, None, True
+        write_file_stats(filepath, stats)
+
+    # Row format check
+    if stats["malformed_rows"]:
+        print(f"⚠️ File {filename} has {stats['malformed_rows']:,} rows with a wrong number of fields (e.g. a truncated last row)")
+
+    # Slot format check
+    if stats["non_numeric_slots"]:
+        print(f"⚠️ File {filename} has non-numeric slot entries: {stats['non_numeric_samples']} ...")
+
+    # Slot range in file
+    min_slot = "N/A" if stats["min_slot"] is None else stats["min_slot"]
+    max_slot = "N/A" if stats["max_slot"] is None else stats["max_slot"]
+
+    report_row = [
+        filename,
+        f"{stats['rows']:,}",
+        f"{file_size:.2f} MB",
+        INTEGRITY_LABELS[integrity],
+        min_slot,
+        max_slot,
+        stats["non_numeric_slots"]
+    ]
+    return filename, report_row, stats, integrity != "current"
+
+# Cut (first, last) slot ranges to the slots start..end (end exclusive, None for an open end)
+def clip_ranges(ranges, start, end):
+    low = -np.inf if start is None else start
+    high = np.inf if end is None else end - 1
+    return [(max(first, low), min(last, high)) for first, last in ranges if first <= high and last >= low]
+
+# Parts of (first, last) slot ranges outside first_slot..last_slot
+def outside_ranges(ranges, first_slot, last_slot):
+    below = [(first, min(last, first_slot - 1)) for first, last in ranges if first < first_slot]
+    above = [(max(first, last_slot + 1), last) for first, last in ranges if last > last_slot]
+    return below + above
+
+# First and last expected slot (both included) of a check over slot_range (start, end), end exclusive
+def expected_slots(slot_range):
+    first_slot, last_slot = EXPECTED_SLOT_RANGE
+    if slot_range is None:
+        return first_slot, last_slot
+    start, end = slot_range
+    return (first_slot if start is None else start), (last_slot if end is None else end - 1)
+
+# Raw slot files of a folder, one per slot file: a .csv.gz archive is left out when its extracted .csv is present.
+# Returns the files and the number of archives left out.
+def slot_files(folder):
+    names = [f for f in os.listdir(folder) if f.endswith((".csv", ".csv.gz"))]
+    extracted = {f for f in names if f.endswith(".csv")}
+    archives = {f for f in names if f.endswith(".csv.gz") and f[:-len(".gz")] in extracted}
+    return [os.path.join(folder, f) for f in names if f not in archives], len(archives)
 
 def main():
-    all_files = [os.path.join(DATA_FOLDER, f) for f in os.listdir(DATA_FOLDER) if f.endswith((".csv", ".csv.gz"))]
+    slot_range = slot_range_setting()
+    all_files, extracted_archives = slot_files(DATA_FOLDER)
+    if extracted_archives:
+        print(f"📦 {extracted_archives} archives left out: their extracted CSVs are checked instead")
+    if slot_range is not None:
+        found = len(all_files)
+        all_files = raw_files_in_range(all_files, slot_range)
+        print(f"🎯 Slot range {format_slot_range(slot_range)}: {len(all_files)} of {found} data files")
     if not all_files:
         print("❗️ No CSV or CSV.GZ files found.")
         return
 
     print(f"🔍 Found {len(all_files)} data files. Starting checks...\n")
 
-    global_slot_set = set()
-    duplicate_slots = []
+    # Number of times each expected slot was seen (0 = missing, > 1 = duplicate)
+    first_slot, last_slot = expected_slots(slot_range)
+    slot_counts = np.zeros(last_slot - first_slot + 1, dtype=np.int32)
+    out_of_range_slots = []
     broken_files = []
     report_rows = []
 
-    for file in sorted(all_files):
-        filename = os.path.basename(file)
-        file_size = check_file_size(file)
-
-        # File size check
-        size_anomaly = file_size < MIN_EXPECTED_FILE_SIZE_MB
-
-        # Try reading
-        df = read_csv_file(file)
-        if df is None or "slot" not in df.columns:
-            broken_files.append(filename)
-            continue
-
-        row_count = df.shape[0]
-
-        # Slot format check
-        non_numeric_count = validate_slot_column(df, filename)
-
-        # Slot range in file
-        min_slot = int(df['slot'].min()) if not df['slot'].isnull().all() else "N/A"
-        max_slot = int(df['slot'].max()) if not df['slot'].isnull().all() else "N/A"
-
-        # Duplicates check
-        slot_counts = df['slot'].value_counts()
-        duplicates = slot_counts[slot_counts > 1].index.tolist()
-        duplicate_slots.extend(duplicates)
-
-        # Global slot range accumulation
-        global_slot_set.update(df['slot'].tolist())
-
-        report_rows.append([
-            filename,
-            f"{row_count:,}",
-            f"{file_size:.2f} MB",
-            "⚠️ Yes" if size_anomaly else "✅ No",
-            min_slot,
-            max_slot,
-            non_numeric_count
-        ])
+    with stage("check_files") as record:
+        if CHECK_WORKERS > 1:
+            with ProcessPoolExecutor(max_workers=CHECK_WORKERS) as executor:
+                results = list(executor.map(check_file, sorted(all_files)))
+        else:
+            results = map(check_file, sorted(all_files))
+
+        for filepath, (filename, report_row, stats, file_read) in zip(sorted(all_files), results):
+            if file_read:
+                add_file_read(filepath)
+            if report_row is None:
+                broken_files.append(filename)
+                continue
+            report_rows.append(report_row)
+            record["rows"] += stats["valid_slots"]
+            # Every distinct slot of the file counts once, slots repeated within the file once more
+            for ranges in (stats["slot_ranges"], stats["duplicate_ranges"]):
+                if slot_range is not None:
+                    # Files at the edges of the slot range also hold slots outside it
+                    ranges = clip_ranges(ranges, *slot_range)
+                for start, end in ranges:
+                    # Ranges entirely outside the expected slots only count as out of range (a negative slice bound would wrap around)
+                    if end >= first_slot and start <= last_slot:
+                        slot_counts[max(start, first_slot) - first_slot:min(end, last_slot) - first_slot + 1] += 1
+                    out_of_range_slots.append(expand_ranges(outside_ranges([(start, end)], first_slot, last_slot)))
 
     # === Summary Section ===
 
     print("\n📄 **Per File Report:**\n")
-    headers = ["File", "Row Count", "Size", "Size Anomaly", "Min Slot", "Max Slot", "Non-Numeric Slots"]
+    headers = ["File", "Row Count", "Size", "Integrity", "Min Slot", "Max Slot", "Non-Numeric Slots"]
     print(tabulate(report_rows, headers=headers, tablefmt="github"))
 
     # Global Slot Range Check
-    expected_slots = set(range(EXPECTED_SLOT_RANGE[0], EXPECTED_SLOT_RANGE[1] + 1))
-    missing_slots = sorted(list(expected_slots - global_slot_set))
+    out_of_range = np.concatenate(out_of_range_slots) if out_of_range_slots else np.array([], dtype=np.int64)
+    out_of_range_unique, out_of_range_counts = np.unique(out_of_range, return_counts=True)
+    missing_ranges = compress_ranges(np.flatnonzero(slot_counts == 0) + first_slot)
+    duplicate_ranges = compress_ranges(np.sort(np.concatenate([
+        np.flatnonzero(slot_counts > 1) + first_slot,
+        out_of_range_unique[out_of_range_counts > 1]
+    ])))
+    missing_count = int((slot_counts == 0).sum())
+    duplicate_count = int((slot_counts > 1).sum() + (out_of_range_counts > 1).sum())
+    unique_count = int((slot_counts > 0).sum()) + len(out_of_range_unique)
 
     print("\n📌 **Summary Report:**\n")
     print(f"🔸 Total Files Checked: {len(all_files)}")
     print(f"🔸 Broken / unreadable files: {len(broken_files)}")
-    print(f"🔸 Total unique slots: {len(global_slot_set):,}")
-    print(f"🔸 Expected slots: {EXPECTED_SLOT_RANGE[0]} to {EXPECTED_SLOT_RANGE[1]} ({len(expected_slots):,} slots)")
-    print(f"🔸 Missing slots: {len(missing_slots):,}")
-    print(f"🔸 Duplicate slots across files: {len(duplicate_slots):,}\n")
-
-    if missing_slots:
-        print(f"⚠️ Missing slot range examples: {missing_slots[:5]} ... {missing_slots[-5:]}")
-    if duplicate_slots:
-        print(f"⚠️ Duplicate slot examples: {duplicate_slots[:5]}")
+    print(f"🔸 Total unique slots: {unique_count:,}")
+    print(f"🔸 Expected slots: {first_slot} to {last_slot} ({len(slot_counts):,} slots)")
+    print(f"🔸 Missing slots: {missing_count:,}")
+    print(f"🔸 Duplicate slots within or across files: {duplicate_count:,}")
+    print(f"🔸 Slots outside the expected range: {len(out_of_range_unique):,}\n")
+
+    if missing_ranges:
+        print(f"⚠️ Missing slot ranges ({len(missing_ranges):,}):")
+        print(tabulate(format_ranges(missing_ranges), headers=["Slots", "Count"], tablefmt="github"))
+    if duplicate_ranges:
+        print(f"\n⚠️ Duplicate slot ranges ({len(duplicate_ranges):,}):")
+        print(tabulate(format_ranges(duplicate_ranges), headers=["Slots", "Count"], tablefmt="github"))
+    if len(out_of_range_unique):
+        print(f"\n⚠️ Slot ranges outside the expected range:")
+        print(tabulate(format_ranges(compress_ranges(out_of_range_unique)), headers=["Slots", "Count"], tablefmt="github"))
 
     if broken_files:
         print(f"❗️ Broken files: {broken_files}")
 
 if __name__ == "__main__":
-    main()
+    slot_range_argument()
+    with run_report("rptheft_data3_datacompletenesscheck"):
+        main()
@@ -0,0 +1,187 @@
+"""
+What the script does: Shared loader for the processed slot dataset, used by all analysis scripts.
+Each script declares the columns (and dtypes) it needs; only those columns are read from the processed store.
+The combined frame is kept as an uncompressed Arrow IPC snapshot per column set, read back memory-mapped, so a second run (or the next script needing the same columns) skips parsing the processed files entirely.
+Numeric columns of a frame read from a snapshot share its memory-mapped pages and are read-only; copy a column before writing into it.
+A snapshot is rebuilt automatically whenever a processed file is added, removed or rewritten. Only the most recently used snapshots are kept; clear_cache() drops all of them.
+For datasets larger than memory, iter_processed_slots streams the same columns chunk by chunk (see rptheft_reportengine.py).
+Both read only the slots of a slot range when one is given (see rptheft_slotrange.py): partitions outside it are skipped and the others are cut to it.
+A snapshot always holds all slots; a slot range is cut from it when it is current, and read from the partitions (without writing a snapshot) otherwise.
+"""
+
+import os
+import json
+import contextlib
+import hashlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rptheft_slotstore import list_processed_files, read_store_file, iter_store_file, concat_store_frames, finalize_processed_frame, store_columns, with_slot_column, in_slot_range, STORE_SUFFIX, WEI_COLUMNS
+from rptheft_manifest import atomic_output
+from rptheft_slotrange import processed_files_in_range, format_slot_range
+from rptheft_perf import stage, add_file_read, add_bytes_read, timed_chunks
+
+CACHE_FOLDER_NAME = ".rptheft_cache"
+
+# Bump when the snapshot layout changes, so existing snapshots are rebuilt
+LOADER_VERSION = "2"
+
+# Snapshots kept in the cache folder; the least recently used ones beyond this are removed
+MAX_SNAPSHOTS = 8
+
+# Use the snapshot cache unless LOADER_CACHE=false
+cache_enabled = os.getenv("LOADER_CACHE", "true").strip().lower() != "false"
+
+def cache_folder(folder_path):
+    return os.path.join(folder_path, CACHE_FOLDER_NAME)
+
+# Identify a snapshot by the column set it holds
+def snapshot_path(folder_path, columns):
+    name = "all" if columns is None else hashlib.sha256(json.dumps(sorted(columns)).encode()).hexdigest()[:16]
+    return os.path.join(cache_folder(folder_path), f"slots_{name}.arrow")
+
+# Fingerprint of the processed files a snapshot was built from (names, sizes and modification times)
+def dataset_key(all_files, columns):
+    stats = [(os.path.basename(f), os.path.getsize(f), os.stat(f).st_mtime_ns) for f in all_files]
+    payload = {"version": LOADER_VERSION, "files": stats, "columns": columns}
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+
+# Read a current snapshot, cut to slot_range, with only the requested columns.
+# The table is converted column by column, releasing each one once converted; numeric columns stay views of the mapped file.
+def read_snapshot(path, key, requested, slot_range=None):
+    # Reports running side by side may prune the snapshot at any time: a snapshot gone meanwhile is rebuilt
+    try:
+        with open(f"{path}.key") as f:
+            if f.read().strip() != key:
+                return None
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+            add_bytes_read(source.size())
+    except FileNotFoundError:
+        return None
+    if slot_range is not None:
+        table = table.filter(pa.array(in_slot_range(table.column('slot').to_pandas(), slot_range)))
+    if requested is not None and 'slot' not in requested:
+        table = table.drop_columns(['slot'])
+    # Mark the snapshot as recently used
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(path)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+def write_snapshot(df, path, key):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with atomic_output(path) as tmp_path:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    with atomic_output(f"{path}.key") as tmp_path:
+        with open(tmp_path, 'w') as f:
+            f.write(key)
+    prune_cache(os.path.dirname(path))
+
+# Keep the MAX_SNAPSHOTS most recently used snapshots of a cache folder (with their keys).
+# Other reports may prune the same folder at the same time, so files can disappear at any point.
+def prune_cache(folder):
+    snapshots = []
+    for name in os.listdir(folder):
+        if name.endswith(".arrow"):
+            with contextlib.suppress(FileNotFoundError):
+                snapshots.append((os.path.getmtime(os.path.join(folder, name)), os.path.join(folder, name)))
+    snapshots.sort(reverse=True)
+    for _, path in snapshots[MAX_SNAPSHOTS:]:
+        for stale in (path, f"{path}.key"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(stale)
+
+# Remove all cached snapshots of a processed folder
+def clear_cache(folder_path):
+    folder = cache_folder(folder_path)
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(folder, name))
+
+# Load the processed slot dataset, reading only `columns` (a list, or a dict of column -> dtype to cast to).
+# ETH amount columns (e.g. max_bid) come with their exact <column>_gwei counterpart. slot_range (start, end) loads only the slots in the range.
+def load_processed_slots(folder_path, columns=None, use_cache=None, slot_range=None):
+    all_files = list_processed_files(folder_path)
+    if not all_files:
+        raise FileNotFoundError(f"No processed files found in {folder_path}")
+    selected = range_files(folder_path, all_files, slot_range)
+
+    dtypes = columns if isinstance(columns, dict) else {}
+    requested = store_columns(list(columns)) if columns is not None else None
+    use_cache = cache_enabled if use_cache is None else use_cache
+
+    with stage("load_processed_slots") as record:
+        df = None
+        if use_cache:
+            # The snapshot of a column set holds the slot numbers as well, to cut slot ranges from it
+            path = snapshot_path(folder_path, with_slot_column(requested))
+            key = dataset_key(all_files, with_slot_column(requested))
+            df = read_snapshot(path, key, requested, slot_range)
+            if df is not None:
+                print(f"⚡ Loaded {df.shape[0]:,} rows from cached snapshot {os.path.basename(path)}")
+        if df is None:
+            # Counts whole partition sizes, although only the requested columns are read
+            for file, _, _ in selected:
+                add_file_read(file)
+            if use_cache and slot_range is None:
+                df = concat_store_frames(read_store_file(file, with_slot_column(requested)) for file, _, _ in selected)
+                write_snapshot(df, path, key)
+                if requested is not None and 'slot' not in requested:
+                    df = df.drop(columns=['slot'])
+            else:
+                df = concat_store_frames(read_store_file(file, requested, None if whole else slot_range, row_groups)
+                                         for file, row_groups, whole in selected)
+            print(f"📦 Loaded {df.shape[0]:,} rows from {len(selected)} processed files")
+
+        df = finalize_frame(df, dtypes)
+        record["rows"] = df.shape[0]
+    return df
+
+# Processed partitions of a slot range (see processed_files_in_range), reporting the selection when a range is given
+def range_files(folder_path, all_files, slot_range):
+    selected = processed_files_in_range(folder_path, slot_range)
+    if slot_range is not None:
+        if not selected:
+            raise ValueError(f"No processed slots in slot range {format_slot_range(slot_range)}")
+        print(f"🎯 Slot range {format_slot_range(slot_range)}: reading {len(selected)} of {len(all_files)} processed files")
+    return selected
+
+# Columns of the frames loaded for `columns`: the store columns read, and the ETH amount of every <column>_gwei among them
+def loaded_columns(columns):
+    requested = store_columns(list(columns))
+    return requested + [col for col in WEI_COLUMNS if f"{col}_gwei" in requested]
+
+# Add the ETH amounts and cast the requested dtypes
+def finalize_frame(df, dtypes):
+    df = finalize_processed_frame(df)
+    for col, dtype in dtypes.items():
+        if dtype is not None:
+            df[col] = df[col].astype(dtype)
+    return df
+
+# Stream the processed slot dataset in chunks of about chunk_rows rows, with the same columns and dtypes as load_processed_slots.
+# Only one chunk (and one Parquet row group) is held in memory at a time; the snapshot cache is not used.
+def iter_processed_slots(folder_path, columns=None, chunk_rows=100000, slot_range=None):
+    all_files = list_processed_files(folder_path)
+    if not all_files:
+        raise FileNotFoundError(f"No processed files found in {folder_path}")
+    selected = range_files(folder_path, all_files, slot_range)
+
+    dtypes = columns if isinstance(columns, dict) else {}
+    requested = store_columns(list(columns)) if columns is not None else None
+    if slot_range is None:
+        total_rows = sum(pq.ParquetFile(file).metadata.num_rows for file in all_files if file.endswith(STORE_SUFFIX))
+        print(f"📦 Streaming {total_rows:,} rows from {len(all_files)} processed files in chunks of {chunk_rows:,} rows")
+    else:
+        print(f"📦 Streaming {len(selected)} processed files in chunks of {chunk_rows:,} rows")
+
+    for file, row_groups, whole in selected:
+        with stage("load_processed_slots") as record:
+            add_file_read(file)
+            record["calls"] = 0
+        chunks = iter_store_file(file, requested, chunk_rows, None if whole else slot_range, row_groups)
+        for df in timed_chunks("load_processed_slots", chunks):
+            yield finalize_frame(df, dtypes)
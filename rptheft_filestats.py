@@ -0,0 +1,252 @@
+"""
+What the script does: Per-file statistics sidecars of the raw slot files, so the completeness check never has to read the files themselves.
+Extraction (rptheft_data1_ziptocsv.py) and slot classification (rptheft_data2_slotclassification.py) write a small JSON sidecar for every raw .csv / .csv.gz file
+they read (SOURCE_PATH/.rptheft_file_stats/<file name>.json), as a by-product of the pass they already make:
+the file's size, modification time and SHA-256 hash, the row count, the missing values of every column, the min/max slot, the valid slots as compressed ranges,
+the slots repeated within the file, the non-numeric slot entries, the last raw bid rows and, from classification, the flagged vanilla block and theft counts.
+The last raw bid rows let classification continue the surrounding max bid windows of the next file without reading this one again.
+A sidecar belongs to the exact file it was taken from: a file whose size or hash no longer matches (e.g. truncated or rewritten) has stale stats and is read again.
+"""
+
+import os
+import gzip
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+from rptheft_manifest import atomic_output, file_sha256
+
+FILE_STATS_FOLDER_NAME = ".rptheft_file_stats"
+
+# Bump when the sidecar layout changes, so sidecars are taken again
+FILE_STATS_VERSION = "2"
+
+# Text read as a missing value, as pandas.read_csv does by default
+NULL_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Non-numeric slot entries kept as examples
+NON_NUMERIC_SAMPLES = 5
+
+# Bytes per block when a file is read for its stats
+STATS_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Raw bid rows kept from the end of every file (as text), enough for surrounding max bid windows of up to TAIL_ROWS slots on each side
+TAIL_COLUMNS = ['slot', 'max_bid', 'mevmonitor_max_bid']
+TAIL_ROWS = 16
+
+# === SLOTS ===
+
+# Split slot entries into valid slot numbers and non-numeric entries (slots already parsed as numbers are valid unless missing)
+def validate_slot_column(slots):
+    if pd.api.types.is_numeric_dtype(slots):
+        is_numeric = slots.notna() & (slots >= 0) & (slots % 1 == 0)
+        return slots[is_numeric].astype('int64').to_numpy(), slots[~is_numeric]
+    slots = slots.astype('string')
+    is_numeric = slots.str.strip().str.fullmatch(r"\d+").fillna(False).astype(bool)
+    valid_slots = slots[is_numeric].astype('int64').to_numpy()
+    non_numeric = slots[~is_numeric]
+    return valid_slots, non_numeric
+
+# Compress a sorted array of slot numbers into (first, last) ranges of consecutive slots
+def compress_ranges(sorted_slots):
+    if len(sorted_slots) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(sorted_slots) != 1)
+    starts = sorted_slots[np.r_[0, breaks + 1]]
+    ends = sorted_slots[np.r_[breaks, len(sorted_slots) - 1]]
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def expand_ranges(ranges):
+    if not ranges:
+        return np.array([], dtype=np.int64)
+    return np.concatenate([np.arange(first, last + 1, dtype=np.int64) for first, last in ranges])
+
+# === BUILDING ===
+
+# Partial stats of a block of raw rows (as read, before classification): rows, missing values per column, valid slots and non-numeric slot entries
+def block_stats(df):
+    return partial_stats(*validate_slot_column(df['slot']), len(df), df.isna().sum().items(), tail_rows(df))
+
+# Same from an Arrow record batch; the slot column is only converted to pandas when it holds anything but plain slot numbers
+def arrow_block_stats(batch):
+    null_counts = zip(batch.schema.names, (column.null_count for column in batch.columns))
+    tail = batch.slice(max(batch.num_rows - TAIL_ROWS, 0)).select(TAIL_COLUMNS).to_pydict() if set(TAIL_COLUMNS) <= set(batch.schema.names) else None
+    slots = batch.column('slot')
+    if slots.null_count == 0 and pc.all(pc.utf8_is_decimal(slots)).as_py():
+        try:
+            return partial_stats(pc.cast(slots, pa.int64()).to_numpy(), pd.Series([], dtype='string'), batch.num_rows, null_counts, tail)
+        except pa.ArrowInvalid:
+            # Non-ASCII digits: validated as text below
+            pass
+    return partial_stats(*validate_slot_column(slots.to_pandas()), batch.num_rows, null_counts, tail)
+
+def partial_stats(valid_slots, non_numeric, rows, null_counts, tail=None):
+    return {
+        "rows": rows,
+        "null_counts": {col: int(n) for col, n in null_counts},
+        "slots": valid_slots,
+        "non_numeric_slots": len(non_numeric),
+        "non_numeric_samples": [None if pd.isna(value) else str(value) for value in non_numeric.head(NON_NUMERIC_SAMPLES)],
+        "tail_rows": tail,
+    }
+
+# Last TAIL_ROWS rows of the tail columns of a block of raw rows, as text ({column: values}, None for missing values)
+def tail_rows(df):
+    if not set(TAIL_COLUMNS) <= set(df.columns):
+        return None
+    tail = df[TAIL_COLUMNS].tail(TAIL_ROWS)
+    return {col: [None if pd.isna(value) else str(value) for value in tail[col]] for col in TAIL_COLUMNS}
+
+# Combine the partial stats of the blocks of a file into its stats (without the file fingerprint).
+# Slots are kept as compressed ranges of the distinct slots, plus the ranges of the slots seen more than once.
+def combine_block_stats(blocks):
+    null_counts = {}
+    for block in blocks:
+        for col, n in block["null_counts"].items():
+            null_counts[col] = null_counts.get(col, 0) + n
+    slots = np.concatenate([block["slots"] for block in blocks]) if blocks else np.array([], dtype=np.int64)
+    tails = [block["tail_rows"] for block in blocks if block.get("tail_rows") is not None]
+    unique_slots, counts = np.unique(slots, return_counts=True)
+    duplicates = unique_slots[counts > 1]
+    return {
+        "rows": sum(block["rows"] for block in blocks),
+        "null_counts": null_counts,
+        "valid_slots": len(slots),
+        "min_slot": int(unique_slots[0]) if len(unique_slots) else None,
+        "max_slot": int(unique_slots[-1]) if len(unique_slots) else None,
+        "slot_ranges": compress_ranges(unique_slots),
+        "duplicate_slots": len(duplicates),
+        "duplicate_rows": len(slots) - len(unique_slots),
+        "duplicate_ranges": compress_ranges(duplicates),
+        "non_numeric_slots": sum(block["non_numeric_slots"] for block in blocks),
+        "non_numeric_samples": [value for block in blocks for value in block["non_numeric_samples"]][:NON_NUMERIC_SAMPLES],
+        "malformed_rows": sum(block.get("malformed_rows", 0) for block in blocks),
+        "tail_rows": {col: [value for tail in tails for value in tail[col]][-TAIL_ROWS:] for col in TAIL_COLUMNS} if tails else None,
+    }
+
+# Stats of a raw file, read in blocks with every column as text (.gz files are decompressed on the fly).
+# Rows with a wrong number of fields (e.g. the last row of a truncated file) are counted as malformed rows, with their slot field.
+def read_file_stats(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt') as f:
+        columns = f.readline().rstrip("\r\n").split(",")
+    malformed = []
+    blocks = [arrow_block_stats(batch) for batch in pacsv.open_csv(path, **csv_options(columns, malformed))]
+    return combine_block_stats(blocks + malformed_stats(columns, malformed))
+
+# Same from the bytes of a raw CSV fed block by block as they are produced (e.g. while an archive is decompressed), so the file is not read again.
+# Blocks may end anywhere: the whole rows of a block are parsed in place, and a row cut at its end is completed with the next block.
+def stream_file_stats(byte_blocks):
+    columns, rest = None, b""
+    malformed, blocks = [], []
+    for byte_block in byte_blocks:
+        start = 0
+        if columns is None:
+            byte_block, rest = rest + byte_block, b""
+            if b"\n" not in byte_block:
+                rest = byte_block
+                continue
+            start = byte_block.index(b"\n") + 1
+            columns = byte_block[:start].decode().rstrip("\r\n").split(",")
+        end = byte_block.rfind(b"\n", start) + 1
+        if not end:
+            rest += byte_block[start:]
+            continue
+        if rest:
+            first = byte_block.index(b"\n", start) + 1
+            blocks += text_block_stats(rest + byte_block[start:first], columns, malformed)
+            start = first
+        blocks += text_block_stats(memoryview(byte_block)[start:end], columns, malformed)
+        rest = byte_block[end:]
+    if columns is None:
+        columns, rest = rest.decode().rstrip("\r\n").split(",") if rest else None, b""
+    if rest:
+        blocks += text_block_stats(rest, columns, malformed)
+    return combine_block_stats(blocks + (malformed_stats(columns, malformed) if columns else []))
+
+# Partial stats of whole rows of raw CSV text without its header line
+def text_block_stats(text, columns, malformed):
+    if not len(text):
+        return []
+    reader = pacsv.open_csv(pa.BufferReader(pa.py_buffer(text)), **csv_options(columns, malformed, header=False))
+    return [arrow_block_stats(batch) for batch in reader]
+
+# Arrow CSV reader options of the raw files: every column as text; rows with a wrong number of fields are collected in `malformed` and skipped.
+# Without header, the text starts with the first row and the columns are named after `columns`.
+def csv_options(columns, malformed, header=True):
+    def keep_malformed(row):
+        malformed.append(row.text)
+        return 'skip'
+    return {
+        "read_options": pacsv.ReadOptions(block_size=STATS_BLOCK_BYTES, column_names=None if header else columns),
+        "parse_options": pacsv.ParseOptions(invalid_row_handler=keep_malformed),
+        "convert_options": pacsv.ConvertOptions(column_types={col: pa.string() for col in columns}, null_values=NULL_VALUES, strings_can_be_null=True),
+    }
+
+# Partial stats of the malformed rows of a file (a list with one block, or none), from their slot field
+def malformed_stats(columns, malformed):
+    if not malformed:
+        return []
+    slot_index = columns.index('slot')
+    fields = [text.split(",") for text in malformed]
+    slots = pd.Series([row[slot_index] if len(row) > slot_index else None for row in fields], dtype='string')
+    return [dict(block_stats(pd.DataFrame({'slot': slots.replace("", None)})), malformed_rows=len(malformed))]
+
+# === SIDECARS ===
+
+def file_stats_path(raw_file_path):
+    folder, name = os.path.split(raw_file_path)
+    return os.path.join(folder, FILE_STATS_FOLDER_NAME, f"{name}.json")
+
+# Read a sidecar; None when it is missing or unreadable (e.g. cut short), so the stats are taken again
+def read_sidecar(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_sidecar(sidecar, path):
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f, indent=2, sort_keys=True)
+
+# Save the stats of a raw file with its fingerprint; sha256 is taken from the caller when it already hashed the file.
+# flagged holds the flagged slot counts of classification ({flag column: count}).
+def write_file_stats(raw_file_path, stats, sha256=None, flagged=None):
+    stat = os.stat(raw_file_path)
+    sidecar = dict(stats, version=FILE_STATS_VERSION, file=os.path.basename(raw_file_path), size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                   sha256=sha256 or file_sha256(raw_file_path))
+    if flagged is not None:
+        sidecar["flagged"] = flagged
+    else:
+        # Stats taken again without classification keep the flagged counts of the same file contents
+        previous = read_sidecar(file_stats_path(raw_file_path))
+        if previous is not None and previous.get("sha256") == sidecar["sha256"] and "flagged" in previous:
+            sidecar["flagged"] = previous["flagged"]
+    path = file_stats_path(raw_file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_sidecar(sidecar, path)
+    return path
+
+# Stats sidecar of a raw file and its state: "current" (taken from this exact file), "changed" (the file changed since, e.g. truncated) or "missing".
+# Only the file's metadata is read, unless it was touched without a size change, in which case its hash is compared.
+def load_file_stats(raw_file_path):
+    path = file_stats_path(raw_file_path)
+    sidecar = read_sidecar(path)
+    if sidecar is None or sidecar.get("version") != FILE_STATS_VERSION:
+        return None, "missing"
+    stat = os.stat(raw_file_path)
+    if stat.st_size != sidecar["size"]:
+        return None, "changed"
+    if stat.st_mtime_ns != sidecar["mtime_ns"]:
+        if file_sha256(raw_file_path) != sidecar["sha256"]:
+            return None, "changed"
+        sidecar["mtime_ns"] = stat.st_mtime_ns
+        save_sidecar(sidecar, path)
+    return sidecar, "current"
@@ -9,10 +9,14 @@ Plots a scatter chart with all vanilla blocks, split by smoothing pool vs non-sm
 """
 
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 from tabulate import tabulate
+from rptheft_slotstore import gwei_to_eth, is_true, is_false
+from rptheft_reportengine import derive_report_columns, select_tables, compute_partials, compute_tables, render_tables, no_slot_rows
+from rptheft_rollup import load_node_rollup, node_totals
+from rptheft_plotting import plots_enabled, pyplot, finish_plot, scatter_series
+from rptheft_slotrange import slot_range_setting, slot_range_argument
+from rptheft_perf import run_report
 import warnings
 
 # === CONFIG ===
@@ -21,53 +25,64 @@ load_dotenv(dotenv_path='local_paths.env')
 folder_path = os.getenv("PROCESSED_PATH")
 print(f"Loaded folder path: {folder_path}")
 
+# Columns read from the processed store (amounts come with their exact <column>_gwei counterpart)
+REQUIRED_COLUMNS = {
+    'slot': 'int32',
+    'proposer_index': 'Int32',
+    'is_rocketpool': 'boolean',
+    'in_smoothing_pool': 'boolean',
+    'vanilla_block': 'bool',
+    'mev_reward': 'float64',
+    'beaconcha_mev_reward': 'float64',
+    'mevmonitor_mev_reward': 'float64',
+    'max_bid': 'float64',
+    'mevmonitor_max_bid': 'float64',
+}
+
+# Columns derived once per frame (see rptheft_reportengine.py): exact per-slot totals, the plotted average max bid and the shared slot filters
+DERIVED_COLUMNS = ['mev_reward_total_gwei', 'max_bid_total_gwei', 'average_max_bid', 'has_max_bid', 'rp_with_max_bid', 'non_rp_with_max_bid']
+
 # === FUNCTIONS ===
 
-def combine_processed_files(folder_path):
-    all_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.startswith("processed_")]
-    if not all_files:
-        raise FileNotFoundError(f"No files found in {folder_path}")
-    return pd.concat((pd.read_csv(file) for file in all_files), ignore_index=True)
-
-def preprocess_columns(df):
-    for col in ['mev_reward', 'beaconcha_mev_reward', 'mevmonitor_mev_reward', 'max_bid', 'mevmonitor_max_bid']:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-    df['is_rocketpool'] = df['is_rocketpool'].astype(str).str.lower()
-    df['vanilla_block'] = df['vanilla_block'].astype(str).str.upper()
-    return df
-
-def calculate_metrics(df):
-    df['average_mev_reward'] = df[['mev_reward', 'beaconcha_mev_reward', 'mevmonitor_mev_reward']].mean(axis=1)
-    df['average_max_bid'] = df[['max_bid', 'mevmonitor_max_bid']].mean(axis=1)
-    return df
-
-def vanilla_block_summary(df):
-    # Filter only RP slots with at least one max bid
-    rp_slots = df[(df['is_rocketpool'] == "true") & (df[['max_bid', 'mevmonitor_max_bid']].sum(axis=1) > 0)]
-    total_rp_slots = rp_slots.shape[0]
+# Counts and exact gwei totals of the RP slots with at least one max bid and of their vanilla blocks
+def vanilla_block_counts(df):
+    # RP slots with at least one max bid (a shared filter, see DERIVED_COLUMNS)
+    rp_slots = df['rp_with_max_bid']
 
     # Vanilla blocks strict logic
-    vanilla_blocks = rp_slots[rp_slots['vanilla_block'] == "TRUE"]
-    total_vanilla = vanilla_blocks.shape[0]
-
-    sp_vanilla = vanilla_blocks[rp_slots['in_smoothing_pool'] == True]
-    non_sp_vanilla = vanilla_blocks[rp_slots['in_smoothing_pool'] == False]
-
-    sp_loss = sp_vanilla['average_max_bid'].sum()
-    non_sp_loss = non_sp_vanilla['average_max_bid'].sum()
-
-    sp_pct = (sp_vanilla.shape[0] / total_rp_slots) * 100
-    non_sp_pct = (non_sp_vanilla.shape[0] / total_rp_slots) * 100
-
-    total_rewards = rp_slots['average_mev_reward'].sum()
-    total_max = rp_slots['average_max_bid'].sum()
-    missed_opportunity = total_max - total_rewards
+    vanilla_blocks = rp_slots & df['vanilla_block']
+    sp_vanilla = vanilla_blocks & is_true(df['in_smoothing_pool'])
+    non_sp_vanilla = vanilla_blocks & is_false(df['in_smoothing_pool'])
+
+    return {
+        "rp_slots": int(rp_slots.sum()),
+        "vanilla": int(vanilla_blocks.sum()),
+        "sp_vanilla": int(sp_vanilla.sum()),
+        "non_sp_vanilla": int(non_sp_vanilla.sum()),
+        "sp_loss_gwei": int(df.loc[sp_vanilla, 'max_bid_total_gwei'].sum()),
+        "non_sp_loss_gwei": int(df.loc[non_sp_vanilla, 'max_bid_total_gwei'].sum()),
+        "rewards_gwei": int(df.loc[rp_slots, 'mev_reward_total_gwei'].sum()),
+        "max_bid_gwei": int(df.loc[rp_slots, 'max_bid_total_gwei'].sum()),
+    }
+
+def vanilla_block_summary(counts):
+    total_rp_slots = counts["rp_slots"]
+    sp_loss = gwei_to_eth(counts["sp_loss_gwei"], 2)
+    non_sp_loss = gwei_to_eth(counts["non_sp_loss_gwei"], 2)
+
+    sp_pct = (counts["sp_vanilla"] / total_rp_slots) * 100
+    non_sp_pct = (counts["non_sp_vanilla"] / total_rp_slots) * 100
+
+    # Exact gwei totals; the reward gap uses the common denominator of the 3-source and 2-source averages
+    total_rewards = gwei_to_eth(counts["rewards_gwei"], 3)
+    total_max = gwei_to_eth(counts["max_bid_gwei"], 2)
+    missed_opportunity = gwei_to_eth(3 * counts["max_bid_gwei"] - 2 * counts["rewards_gwei"], 6)
 
     print("\n📄 **Vanilla Block Summary (Strict Logic, Max Bid Slots Only):**\n")
     print(f"Total RP Slots with max bid: {total_rp_slots:,}")
-    print(f"Number of RP Vanilla Blocks: {total_vanilla:,}")
-    print(f" - In Smoothing Pool: {sp_vanilla.shape[0]:,}")
-    print(f" - Not in Smoothing Pool: {non_sp_vanilla.shape[0]:,}")
+    print(f"Number of RP Vanilla Blocks: {counts['vanilla']:,}")
+    print(f" - In Smoothing Pool: {counts['sp_vanilla']:,}")
+    print(f" - Not in Smoothing Pool: {counts['non_sp_vanilla']:,}")
     print(f"Total ETH neglect in smoothing pool: {sp_loss:.4f} ETH")
     print(f"Total ETH neglect outside smoothing pool: {non_sp_loss:.4f} ETH")
     print(f"% of MEV-neglect slots within smoothing pool: {sp_pct:.2f}%")
@@ -76,26 +91,34 @@ def vanilla_block_summary(df):
     print(f"Total ETH rewards offered to RP validators: {total_max:.4f} ETH")
     print(f"Total missed opportunity (MEV reward gap): {missed_opportunity:.4f} ETH")
 
-    return vanilla_blocks
+# RP vanilla blocks among the slots with at least one max bid (the vanilla blocks counted by vanilla_block_counts)
+def select_vanilla_blocks(df):
+    return df[df['rp_with_max_bid'] & df['vanilla_block']]
 
-def additional_summary(df, vanilla_blocks):
-    rp_total = df[(df['is_rocketpool'] == "true") & (df[['max_bid', 'mevmonitor_max_bid']].sum(axis=1) > 0)]
-    rp_vanilla = vanilla_blocks
-    rp_pct = (rp_vanilla.shape[0] / rp_total.shape[0]) * 100
+# Vanilla block counts of RP and non-RP slots with at least one max bid
+def vanilla_share_counts(df):
+    rp_total, non_rp = df['rp_with_max_bid'], df['non_rp_with_max_bid']
+    return {
+        "rp_slots": int(rp_total.sum()),
+        "rp_vanilla": int((rp_total & df['vanilla_block']).sum()),
+        "non_rp_slots": int(non_rp.sum()),
+        "non_rp_vanilla": int((non_rp & df['vanilla_block']).sum()),
+    }
 
-    non_rp = df[(df['is_rocketpool'] == "false") & (df['proposer_index'].notnull()) & (df[['max_bid', 'mevmonitor_max_bid']].sum(axis=1) > 0)]
-    non_rp_vanilla = non_rp[non_rp['vanilla_block'] == "TRUE"]
-    non_rp_pct = (non_rp_vanilla.shape[0] / non_rp.shape[0]) * 100
+def additional_summary(counts):
+    rp_pct = (counts["rp_vanilla"] / counts["rp_slots"]) * 100
+    non_rp_pct = (counts["non_rp_vanilla"] / counts["non_rp_slots"]) * 100
 
     print("\n📄 **Vanilla Block % Summary (Max Bid Slots Only):**\n")
-    print(f"Rocketpool Vanilla Block %: {rp_pct:.2f}% ({rp_vanilla.shape[0]} out of {rp_total.shape[0]} slots)")
-    print(f"Non-Rocketpool Vanilla Block %: {non_rp_pct:.2f}% ({non_rp_vanilla.shape[0]} out of {non_rp.shape[0]} slots)")
+    print(f"Rocketpool Vanilla Block %: {rp_pct:.2f}% ({counts['rp_vanilla']} out of {counts['rp_slots']} slots)")
+    print(f"Non-Rocketpool Vanilla Block %: {non_rp_pct:.2f}% ({counts['non_rp_vanilla']} out of {counts['non_rp_slots']} slots)")
 
-def top_vanilla_loss(df, vanilla_blocks):
-    node_summary = vanilla_blocks.groupby('node_address').agg(
-        vanilla_block_count=('slot', 'count'),
-        eth_mev_loss=('average_max_bid', 'sum')
+# Node rankings are read from the per-node rollup written during slot classification (see rptheft_rollup.py)
+def top_vanilla_loss(rollup):
+    node_summary = node_totals(rollup, "vanilla").rename(
+        columns={'events': 'vanilla_block_count', 'total_gwei': 'eth_mev_loss'}
     ).sort_values(by='eth_mev_loss', ascending=False).head(20)
+    node_summary['eth_mev_loss'] = gwei_to_eth(node_summary['eth_mev_loss'], 2)
 
     total_loss = node_summary['eth_mev_loss'].sum()
     node_summary['% of total loss'] = (node_summary['eth_mev_loss'] / total_loss * 100).map(lambda x: f"{x:.2f}%")
@@ -104,16 +127,12 @@ def top_vanilla_loss(df, vanilla_blocks):
     print("\n📄 **Top 20 Node Operators (Vanilla Block Losses):**\n")
     print(tabulate(node_summary, headers='keys', tablefmt='github'))
 
-def top_bid_gap_loss(df):
-    rp = df[(df['is_rocketpool'] == "true") & (df[['max_bid', 'mevmonitor_max_bid']].sum(axis=1) > 0)]
-    bid_gap = rp[rp['average_mev_reward'] > 0].copy()
-    bid_gap['gap'] = bid_gap['average_max_bid'] - bid_gap['average_mev_reward']
-    bid_gap = bid_gap[bid_gap['gap'] > 0]
-
-    node_summary = bid_gap.groupby('node_address').agg(
-        blocks_with_gap=('slot', 'count'),
-        eth_gap_to_maxbid=('gap', 'sum')
+def top_bid_gap_loss(rollup):
+    # Bid gap: average_max_bid - average_mev_reward, scaled by 6 to stay in exact integer gwei
+    node_summary = node_totals(rollup, "bid_gap").rename(
+        columns={'events': 'blocks_with_gap', 'total_gwei': 'eth_gap_to_maxbid'}
     ).sort_values(by='eth_gap_to_maxbid', ascending=False).head(20)
+    node_summary['eth_gap_to_maxbid'] = gwei_to_eth(node_summary['eth_gap_to_maxbid'], 6)
 
     total_loss = node_summary['eth_gap_to_maxbid'].sum()
     node_summary['% of total loss'] = (node_summary['eth_gap_to_maxbid'] / total_loss * 100).map(lambda x: f"{x:.2f}%")
@@ -122,17 +141,26 @@ def top_bid_gap_loss(df):
     print("\n📄 **Top 20 Node Operators (Bid Gap Losses):**\n")
     print(tabulate(node_summary, headers='keys', tablefmt='github'))
 
+# Vanilla blocks drawn in the scatter plot (nothing when plots are disabled)
+def vanilla_plot_rows(df):
+    if not plots_enabled():
+        return None
+    return select_vanilla_blocks(df)[['slot', 'in_smoothing_pool', 'average_max_bid']]
+
 def plot_vanilla_blocks(vanilla_blocks):
+    if not plots_enabled() or vanilla_blocks is None:
+        return
     print("\n📊 Generating Vanilla Block Scatter Plot...")
+    plt = pyplot()
 
-    smoothing_pool = vanilla_blocks[vanilla_blocks['in_smoothing_pool'] == True]
-    non_smoothing_pool = vanilla_blocks[vanilla_blocks['in_smoothing_pool'] == False]
+    smoothing_pool = vanilla_blocks[is_true(vanilla_blocks['in_smoothing_pool'])]
+    non_smoothing_pool = vanilla_blocks[is_false(vanilla_blocks['in_smoothing_pool'])]
 
     plt.figure(figsize=(16, 6))
-    plt.scatter(non_smoothing_pool['slot'], non_smoothing_pool['average_max_bid'],
-                label="In Smoothing Pool: False", color='blue', alpha=0.7, s=10)
-    plt.scatter(smoothing_pool['slot'], smoothing_pool['average_max_bid'],
-                label="In Smoothing Pool: True", color='orange', alpha=0.7, s=10)
+    scatter_series(plt, non_smoothing_pool['slot'], non_smoothing_pool['average_max_bid'], log_y=True,
+                   label="In Smoothing Pool: False", color='blue', alpha=0.7, s=10)
+    scatter_series(plt, smoothing_pool['slot'], smoothing_pool['average_max_bid'], log_y=True,
+                   label="In Smoothing Pool: True", color='orange', alpha=0.7, s=10)
 
     plt.title("Neglected MEV Reward per Slot by Smoothing Pool Status (Slots with Max Bid)")
     plt.xlabel("Slot")
@@ -141,20 +169,37 @@ def plot_vanilla_blocks(vanilla_blocks):
     plt.grid(alpha=0.3)
     plt.legend()
     plt.tight_layout()
-    plt.show()
+    finish_plot(plt, "vanilla_blocks")
 
 # === MAIN ===
 
-def main():
-    df = combine_processed_files(folder_path)
-    df = preprocess_columns(df)
-    df = calculate_metrics(df)
+# Report tables in output order: (name, compute, render). compute(df) returns the partial result of a block of prepared slot rows,
+# render(result) prints the table from the combined result (see rptheft_reportengine.py).
+# Each table can be run and cached on its own by the pipeline driver (rptheft_pipeline.py).
+REPORTS = [
+    ("vanilla_block_summary", vanilla_block_counts, vanilla_block_summary),
+    ("additional_summary", vanilla_share_counts, additional_summary),
+    ("top_vanilla_loss", no_slot_rows, lambda result: top_vanilla_loss(load_node_rollup(folder_path, slot_range_setting()))),
+    ("top_bid_gap_loss", no_slot_rows, lambda result: top_bid_gap_loss(load_node_rollup(folder_path, slot_range_setting()))),
+    ("plot_vanilla_blocks", vanilla_plot_rows, plot_vanilla_blocks),
+]
+
+# Derive the columns used by the report tables; no preparation statistics
+def prepare_frame(df):
+    return derive_report_columns(df, DERIVED_COLUMNS), None
+
+# Prepare a frame of slot rows and compute the given report tables (all by default) on it
+def compute_report_frame(df, names=None):
+    return compute_partials(df, prepare_frame, select_tables(REPORTS, names))
+
+# Compute the given report tables over the processed slots, in memory or in chunks (REPORT_CHUNK_ROWS)
+def compute_report_tables(names=None):
+    return compute_tables(folder_path, REQUIRED_COLUMNS, lambda df: compute_report_frame(df, names))
 
-    vanilla_blocks = vanilla_block_summary(df)
-    additional_summary(df, vanilla_blocks)
-    top_vanilla_loss(df, vanilla_blocks)
-    top_bid_gap_loss(df)
-    plot_vanilla_blocks(vanilla_blocks)
+def main():
+    render_tables(REPORTS, compute_report_tables())
 
 if __name__ == "__main__":
-    main()
+    slot_range_argument()
+    with run_report("rptheft_loss_alldata"):
+        main()
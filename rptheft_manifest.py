@@ -0,0 +1,100 @@
+"""
+What the script does: Content manifest for incremental, resumable pipeline runs.
+For every input file a stage has finished, the manifest records the input's size, modification time and SHA-256 hash, the pipeline version that produced the outputs, and the outputs' sizes.
+Re-runs only process inputs that are new, changed, produced by an older pipeline version, or whose outputs are missing or truncated; inputs interrupted by a crash have no entry and are retried.
+Outputs are written to a temporary file and renamed into place, so a published file is always complete.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import contextlib
+
+HASH_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Compute the SHA-256 hash of a file
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Fingerprint an input file; the hash is reused from the previous fingerprint while size and mtime are unchanged
+def file_fingerprint(path, previous=None):
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        fingerprint["sha256"] = previous["sha256"]
+    else:
+        fingerprint["sha256"] = file_sha256(path)
+    return fingerprint
+
+# Permissions of a newly created file under the process umask (temporary files are created private)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+# Unique temporary file next to an output, used while the output is being written;
+# concurrent writers of the same output (e.g. pipeline stages running side by side) never share it
+def temporary_path(path):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    os.chmod(tmp_path, NEW_FILE_MODE)
+    return tmp_path
+
+# Write to a temporary file and publish it with an atomic rename once the block completes
+@contextlib.contextmanager
+def atomic_output(path):
+    tmp_path = temporary_path(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {"entries": {}}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path):
+    with atomic_output(manifest_path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+# Check whether an input was already processed by this pipeline version and its outputs are intact.
+# `context` describes anything else the outputs depend on (e.g. neighbouring files); it must match the recorded one.
+def is_up_to_date(manifest, input_path, version, context=None):
+    entry = manifest["entries"].get(os.path.basename(input_path))
+    if entry is None or entry.get("version") != version or entry.get("context") != context:
+        return False
+    for output_path, size in entry.get("outputs", {}).items():
+        if not os.path.exists(output_path) or os.path.getsize(output_path) != size:
+            return False
+    stat = os.stat(input_path)
+    if stat.st_size != entry["input"]["size"]:
+        return False
+    if stat.st_mtime_ns == entry["input"]["mtime_ns"]:
+        return True
+    # Touched but possibly unchanged: compare contents
+    if file_sha256(input_path) == entry["input"]["sha256"]:
+        entry["input"]["mtime_ns"] = stat.st_mtime_ns
+        return True
+    return False
+
+# Record a finished input together with its published outputs (and optional per-file summary and context).
+# input_fingerprint is the input's fingerprint when the caller already took it (e.g. in a worker process).
+def record_entry(manifest, input_path, output_paths, version, summary=None, context=None, input_fingerprint=None):
+    key = os.path.basename(input_path)
+    previous = manifest["entries"].get(key, {}).get("input")
+    manifest["entries"][key] = {
+        "version": version,
+        "input": input_fingerprint or file_fingerprint(input_path, previous),
+        "outputs": {path: os.path.getsize(path) for path in output_paths},
+        "summary": summary,
+        "context": context,
+    }
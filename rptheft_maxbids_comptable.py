@@ -5,10 +5,13 @@ Creates a table for different MEV reward sizes/ranges, and it summaries the Kolm
 
 import os
 import pandas as pd
-import numpy as np
-from scipy.stats import ks_2samp
 from dotenv import load_dotenv
 from tabulate import tabulate
+from rptheft_dataloader import loaded_columns
+from rptheft_reportengine import derive_report_columns, select_tables, compute_partials, compute_tables, render_tables
+from rptheft_stats import comparison_cohorts, sort_cohorts, range_slice, ks_2samp_sorted
+from rptheft_slotrange import slot_range_argument
+from rptheft_perf import run_report
 import warnings
 
 # Suppress specific warnings for cleaner logs
@@ -19,100 +22,110 @@ warnings.filterwarnings("ignore", category=pd.errors.SettingWithCopyWarning)
 load_dotenv(dotenv_path="local_paths.env")
 folder_path = os.getenv("PROCESSED_PATH")
 
-def combine_processed_files(folder_path):
-    all_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.startswith("processed_")]
-    if not all_files:
-        raise FileNotFoundError(f"No files found in the folder '{folder_path}' matching the expected pattern.")
-    return pd.concat((pd.read_csv(file) for file in all_files), ignore_index=True)
+# Columns read from the processed store
+REQUIRED_COLUMNS = {
+    'proposer_index': 'Int32',
+    'max_bid': 'float64',
+    'mevmonitor_max_bid': 'float64',
+    'is_rocketpool': 'boolean',
+}
 
-def clean_and_prepare_data(df):
-    print(f"Step 1: Full dataset created: {df.shape[0]} rows, {df.shape[1]} columns")
-
-    # Add `max_bid_eth` column before filtering
-    df['max_bid'] = pd.to_numeric(df['max_bid'], errors='coerce')
-    df['mevmonitor_max_bid'] = pd.to_numeric(df['mevmonitor_max_bid'], errors='coerce')
-    df['max_bid_eth'] = df[['max_bid', 'mevmonitor_max_bid']].mean(axis=1, skipna=True)
-
-    # Identify rows with no max bid or missed blocks
-    no_max_bid_or_missed = df[(df['proposer_index'].isna()) | (df['max_bid'].isna() & df['mevmonitor_max_bid'].isna())]
-    df_cleaned = df.drop(no_max_bid_or_missed.index)
-
-    print(f"Step 2: Dropped rows with no max bid or missed blocks: {no_max_bid_or_missed.shape[0]} rows")
+# Columns derived once per frame (see rptheft_reportengine.py): the average max bid and the slots of the comparison
+DERIVED_COLUMNS = ['max_bid_eth', 'bid_comparison']
 
-    # Standardize the `is_rocketpool` column
-    df_cleaned['is_rocketpool'] = df_cleaned['is_rocketpool'].astype(str).str.lower()
-    invalid_rp_rows = (~df_cleaned['is_rocketpool'].isin(['true', 'false'])).sum()
-    df_cleaned = df_cleaned[df_cleaned['is_rocketpool'].isin(['true', 'false'])]
-    print(f"Step 3: Dropped rows due to invalid `is_rocketpool` values: {invalid_rp_rows} rows")
-
-    print(f"Step 4: Final dataset size: {df_cleaned.shape[0]} rows, {df_cleaned.shape[1]} columns")
-    return df_cleaned
-
-def calculate_metrics(cleaned_df, ranges):
+# Select the slots of the bid comparison in a block of slot rows. The rows are marked (bid_comparison) rather than copied,
+# so the frame can be shared with other reports; returns the frame and a one-row frame of cleaning statistics.
+def clean_and_prepare_data(df):
+    # Column counts refer to this script's columns, also when the frame is shared by a report session
+    rows, columns = len(df), len(loaded_columns(REQUIRED_COLUMNS))
+    df = derive_report_columns(df, DERIVED_COLUMNS)
+
+    # Rows with no max bid or missed blocks
+    no_max_bid_or_missed = df['proposer_index'].isna() | df['max_bid_eth'].isna()
+
+    # Rows without an `is_rocketpool` value among the rest
+    invalid_rp_rows = ~no_max_bid_or_missed & df['is_rocketpool'].isna()
+
+    stats = pd.DataFrame([{
+        "rows": rows, "columns": columns,
+        "no_max_bid_or_missed": int(no_max_bid_or_missed.sum()), "invalid_rp_rows": int(invalid_rp_rows.sum()),
+        # The cleaned dataset adds max_bid_eth
+        "final_rows": int(df['bid_comparison'].sum()), "final_columns": columns + 1,
+    }])
+    return df, stats
+
+# Print the cleaning steps from the statistics of all blocks
+def print_prepare_summary(stats):
+    totals = stats.sum()
+    print(f"Step 1: Full dataset created: {totals['rows']} rows, {stats['columns'].iloc[0]} columns")
+    print(f"Step 2: Dropped rows with no max bid or missed blocks: {totals['no_max_bid_or_missed']} rows")
+    print(f"Step 3: Dropped rows due to invalid `is_rocketpool` values: {totals['invalid_rp_rows']} rows")
+    print(f"Step 4: Final dataset size: {totals['final_rows']} rows, {stats['final_columns'].iloc[0]} columns")
+
+# K-S statistic and p-value cells, flagged against the 0.05 threshold
+def format_ks(rp_values, non_rp_values):
+    if len(rp_values) == 0 or len(non_rp_values) == 0:
+        return "-", "-"
+    ks_stat, p_value = ks_2samp_sorted(rp_values, non_rp_values)
+    ks_stat = f":{'warning:' if ks_stat > 0.05 else 'white_check_mark:'} {ks_stat:.10f}"
+    p_value = f":{'white_check_mark:' if p_value > 0.05 else 'warning:'} {p_value:.10f}"
+    return ks_stat, p_value
+
+def calculate_metrics(rp_values, non_rp_values, ranges):
     metrics = []
 
     for lower, upper in ranges:
-        range_filter = (cleaned_df['max_bid_eth'] >= lower) & (cleaned_df['max_bid_eth'] < upper)
-        range_cleaned_df = cleaned_df[range_filter]
-
-        total_slots = range_cleaned_df.shape[0]
-        rp_slots = range_cleaned_df[range_cleaned_df['is_rocketpool'] == "true"].shape[0]
-        non_rp_slots = range_cleaned_df[range_cleaned_df['is_rocketpool'] == "false"].shape[0]
-
-        # K-S test
-        if rp_slots > 0 and non_rp_slots > 0:
-            ks_stat, p_value = ks_2samp(
-                range_cleaned_df[range_cleaned_df['is_rocketpool'] == "true"]['max_bid_eth'],
-                range_cleaned_df[range_cleaned_df['is_rocketpool'] == "false"]['max_bid_eth'],
-            )
-            ks_stat = f":{'warning:' if ks_stat > 0.05 else 'white_check_mark:'} {ks_stat:.10f}"
-            p_value = f":{'white_check_mark:' if p_value > 0.05 else 'warning:'} {p_value:.10f}"
-        else:
-            ks_stat = "-"
-            p_value = "-"
+        rp_range = range_slice(rp_values, lower, upper)
+        non_rp_range = range_slice(non_rp_values, lower, upper)
+        ks_stat, p_value = format_ks(rp_range, non_rp_range)
 
         metrics.append({
             "Range": f"{lower}-{upper} ETH" if upper != float('inf') else f">{lower} ETH",
-            "# of Slots": total_slots,
-            "# of RP Slots": rp_slots,
-            "# of non-RP Slots": non_rp_slots,
+            "# of Slots": len(rp_range) + len(non_rp_range),
+            "# of RP Slots": len(rp_range),
+            "# of non-RP Slots": len(non_rp_range),
             "K-S statistic": ks_stat,
             "p-value": p_value,
         })
 
     # Add totals
-    total_rp = cleaned_df[cleaned_df['is_rocketpool'] == "true"]
-    total_non_rp = cleaned_df[cleaned_df['is_rocketpool'] == "false"]
-
-    if not total_rp.empty and not total_non_rp.empty:
-        ks_stat, p_value = ks_2samp(
-            total_rp['max_bid_eth'],
-            total_non_rp['max_bid_eth'],
-        )
-        ks_stat = f":{'warning:' if ks_stat > 0.05 else 'white_check_mark:'} {ks_stat:.10f}"
-        p_value = f":{'white_check_mark:' if p_value > 0.05 else 'warning:'} {p_value:.10f}"
-    else:
-        ks_stat = "-"
-        p_value = "-"
-
+    ks_stat, p_value = format_ks(rp_values, non_rp_values)
     metrics.append({
         "Range": "Total",
-        "# of Slots": cleaned_df.shape[0],
-        "# of RP Slots": total_rp.shape[0],
-        "# of non-RP Slots": total_non_rp.shape[0],
+        "# of Slots": len(rp_values) + len(non_rp_values),
+        "# of RP Slots": len(rp_values),
+        "# of non-RP Slots": len(non_rp_values),
         "K-S statistic": ks_stat,
         "p-value": p_value,
     })
     return metrics
 
-def main():
-    original_df = combine_processed_files(folder_path)
-    cleaned_df = clean_and_prepare_data(original_df)
-
+# Both cohorts are sorted once; every range is then a slice of the sorted arrays
+def range_metrics_table(cohorts):
     ranges = [(0, 0.01), (0.01, 0.1), (0.1, 1), (1, 10), (10, float('inf'))]
-    metrics = calculate_metrics(cleaned_df, ranges)
-
+    metrics = calculate_metrics(*sort_cohorts(cohorts), ranges)
     print(tabulate(metrics, headers="keys", tablefmt="github"))
 
+# Report tables in output order: (name, compute, render). compute(df) returns the partial result of a block of cleaned slot rows,
+# render(result) prints the table from the combined result (see rptheft_reportengine.py).
+# The K-S tests need every max bid, so the range table keeps the bid values of both cohorts (8 bytes per slot) rather than the slot rows.
+# Each table can be run and cached on its own by the pipeline driver (rptheft_pipeline.py).
+REPORTS = [
+    ("range_metrics", comparison_cohorts, range_metrics_table),
+]
+
+# Prepare a frame of slot rows and compute the given report tables (all by default) on it
+def compute_report_frame(df, names=None):
+    return compute_partials(df, clean_and_prepare_data, select_tables(REPORTS, names))
+
+# Compute the given report tables over the processed slots, in memory or in chunks (REPORT_CHUNK_ROWS)
+def compute_report_tables(names=None):
+    return compute_tables(folder_path, REQUIRED_COLUMNS, lambda df: compute_report_frame(df, names), print_prepare_summary)
+
+def main():
+    render_tables(REPORTS, compute_report_tables())
+
 if __name__ == "__main__":
-    main()
+    slot_range_argument()
+    with run_report("rptheft_maxbids_comptable"):
+        main()
@@ -6,10 +6,13 @@ Besides creating a visual evaluation for each of the cohorts, it plots the Kolmo
 
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-from scipy.stats import ks_2samp
 from dotenv import load_dotenv
+from rptheft_dataloader import loaded_columns
+from rptheft_reportengine import derive_report_columns, select_tables, compute_partials, compute_tables, render_tables
+from rptheft_stats import comparison_cohorts, sort_cohorts, range_slice, cdf_points, ks_2samp_sorted
+from rptheft_plotting import plots_enabled, pyplot, finish_plot, downsample_cdf
+from rptheft_slotrange import slot_range_argument
+from rptheft_perf import run_report
 import warnings
 
 # Suppress specific warnings for cleaner logs
@@ -20,56 +23,56 @@ warnings.filterwarnings("ignore", category=pd.errors.SettingWithCopyWarning)
 load_dotenv(dotenv_path="local_paths.env")
 folder_path = os.getenv("PROCESSED_PATH")
 
-def combine_processed_files(folder_path):
-    # List all matching files
-    all_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.startswith("processed_")]
+# Columns read from the processed store
+REQUIRED_COLUMNS = {
+    'proposer_index': 'Int32',
+    'max_bid': 'float64',
+    'mevmonitor_max_bid': 'float64',
+    'is_rocketpool': 'boolean',
+}
 
-    # Check if no files are found
-    if not all_files:
-        raise FileNotFoundError(f"No files found in the folder '{folder_path}' matching the expected pattern.")
-
-    # Combine all files
-    combined_df = pd.concat((pd.read_csv(file) for file in all_files), ignore_index=True)
-    return combined_df
+# Columns derived once per frame (see rptheft_reportengine.py): the average max bid and the slots of the comparison
+DERIVED_COLUMNS = ['max_bid_eth', 'bid_comparison']
 
+# Select the slots of the bid distributions in a block of slot rows. The rows are marked (bid_comparison) rather than copied,
+# so the frame can be shared with other reports; returns the frame and a one-row frame of cleaning statistics.
 def clean_and_prepare_data(df):
-    print(f"Step 1: Full dataset created: {df.shape[0]} rows, {df.shape[1]} columns")
-
-    # Dropping rows with missing validator index
-    initial_rows = df.shape[0]
-    df = df.dropna(subset=['proposer_index'])
-    print(f"Step 2: Dropped rows due to missed blocks (validator index empty): {initial_rows - df.shape[0]} rows")
-
-    # Ensure numeric conversion
-    df['max_bid'] = pd.to_numeric(df['max_bid'], errors='coerce')
-    df['mevmonitor_max_bid'] = pd.to_numeric(df['mevmonitor_max_bid'], errors='coerce')
-
-    # Calculate average or use single value when one is missing
-    df['max_bid_eth'] = df[['max_bid', 'mevmonitor_max_bid']].mean(axis=1, skipna=True)
-
-    # Dropping rows with missing max_bid_eth
-    rows_after_proposer_index = df.shape[0]
-    df = df.dropna(subset=['max_bid_eth'])
-    print(f"Step 3: Dropped rows due to missing max_bid values: {rows_after_proposer_index - df.shape[0]} rows")
-
-    # Standardize the `is_rocketpool` column
-    rows_after_max_bid = df.shape[0]
-    df['is_rocketpool'] = df['is_rocketpool'].astype(str).str.lower()
-    df = df[df['is_rocketpool'].isin(['true', 'false'])]
-    print(f"Step 4: Dropped rows due to invalid `is_rocketpool` values: {rows_after_max_bid - df.shape[0]} rows")
-
-    print(f"Step 5: Final dataset size: {df.shape[0]} rows, {df.shape[1]} columns")
-    return df
-
-def calculate_cdf(data):
-    sorted_data = np.sort(data)
-    cdf = np.arange(1, len(sorted_data) + 1) / len(sorted_data)
-    return sorted_data, cdf
-
-def plot_cdf(rocketpool_data, non_rocketpool_data, A, B):
-    # Filter data within the range
-    rocketpool_filtered = rocketpool_data[(rocketpool_data >= A) & (rocketpool_data <= B)]
-    non_rocketpool_filtered = non_rocketpool_data[(non_rocketpool_data >= A) & (non_rocketpool_data <= B)]
+    # Column counts refer to this script's columns, also when the frame is shared by a report session
+    rows, columns = len(df), len(loaded_columns(REQUIRED_COLUMNS))
+    df = derive_report_columns(df, DERIVED_COLUMNS)
+
+    # Rows with missing validator index (missed blocks)
+    missed_blocks = df['proposer_index'].isna()
+
+    # Rows with missing max_bid_eth (average, or single value when one is missing), among the rest
+    missing_max_bid = ~missed_blocks & df['max_bid_eth'].isna()
+
+    # Rows without an `is_rocketpool` value, among the rest
+    invalid_rp_rows = ~missed_blocks & ~missing_max_bid & df['is_rocketpool'].isna()
+
+    stats = pd.DataFrame([{
+        "rows": rows, "columns": columns,
+        "missed_blocks": int(missed_blocks.sum()),
+        "missing_max_bid": int(missing_max_bid.sum()),
+        "invalid_rp_rows": int(invalid_rp_rows.sum()),
+        # The cleaned dataset adds max_bid_eth
+        "final_rows": int(df['bid_comparison'].sum()), "final_columns": columns + 1,
+    }])
+    return df, stats
+
+# Print the cleaning steps from the statistics of all blocks
+def print_prepare_summary(stats):
+    totals = stats.sum()
+    print(f"Step 1: Full dataset created: {totals['rows']} rows, {stats['columns'].iloc[0]} columns")
+    print(f"Step 2: Dropped rows due to missed blocks (validator index empty): {totals['missed_blocks']} rows")
+    print(f"Step 3: Dropped rows due to missing max_bid values: {totals['missing_max_bid']} rows")
+    print(f"Step 4: Dropped rows due to invalid `is_rocketpool` values: {totals['invalid_rp_rows']} rows")
+    print(f"Step 5: Final dataset size: {totals['final_rows']} rows, {stats['final_columns'].iloc[0]} columns")
+
+def plot_cdf(rocketpool_values, non_rocketpool_values, A, B):
+    # Values within the range, as slices of the sorted cohort arrays
+    rocketpool_filtered = range_slice(rocketpool_values, A, B, include_upper=True)
+    non_rocketpool_filtered = range_slice(non_rocketpool_values, A, B, include_upper=True)
 
     # Print summary statistics
     print(f"Total number of rows being plotted between {A:.2e} ETH and {B:.2e} ETH: {len(rocketpool_filtered) + len(non_rocketpool_filtered)}")
@@ -78,17 +81,21 @@ def plot_cdf(rocketpool_data, non_rocketpool_data, A, B):
 
     # Calculate K-S statistic
     if len(rocketpool_filtered) > 0 and len(non_rocketpool_filtered) > 0:
-        ks_stat, p_value = ks_2samp(rocketpool_filtered, non_rocketpool_filtered)
+        ks_stat, p_value = ks_2samp_sorted(rocketpool_filtered, non_rocketpool_filtered)
         print(f"K-S statistic: {ks_stat:.4f}")
         print(f"p-value: {p_value:.4e}")
     else:
         print("Not enough data points for K-S test.")
 
-    # Calculate CDF
-    rocketpool_values, rocketpool_cdf = calculate_cdf(rocketpool_filtered)
-    non_rocketpool_values, non_rocketpool_cdf = calculate_cdf(non_rocketpool_filtered)
+    if not plots_enabled():
+        return
+
+    # Calculate CDF, reduced to evenly spaced quantiles for drawing
+    rocketpool_values, rocketpool_cdf = downsample_cdf(*cdf_points(rocketpool_filtered))
+    non_rocketpool_values, non_rocketpool_cdf = downsample_cdf(*cdf_points(non_rocketpool_filtered))
 
     # Plot the CDF
+    plt = pyplot()
     plt.figure(figsize=(10, 6))
     plt.loglog(non_rocketpool_values, non_rocketpool_cdf, 'o-', label='Is RocketPool: FALSE', linewidth=0.5, markersize=3)
     plt.loglog(rocketpool_values, rocketpool_cdf, 'o-', label='Is RocketPool: TRUE', linewidth=1, markersize=2)
@@ -98,18 +105,11 @@ def plot_cdf(rocketpool_data, non_rocketpool_data, A, B):
     plt.title('Cumulative Distribution of Max Bid Values')
     plt.grid(which='major', linestyle='-', linewidth=0.5)
     plt.legend()
-    plt.show()
-
-def main():
-    # Combine all processed files
-    combined_df = combine_processed_files(folder_path)
+    finish_plot(plt, "max_bid_cdf")
 
-    # Clean and prepare data
-    combined_df = clean_and_prepare_data(combined_df)
-
-    # Separate RocketPool and non-RocketPool data
-    rocketpool_data = combined_df[combined_df['is_rocketpool'] == "true"]['max_bid_eth']
-    non_rocketpool_data = combined_df[combined_df['is_rocketpool'] == "false"]['max_bid_eth']
+def cdf_plot(cohorts):
+    # RocketPool and non-RocketPool data, sorted once
+    rocketpool_data, non_rocketpool_data = sort_cohorts(cohorts)
 
     # Define X-axis limits
     A = 10**-5  # Lower limit (e.g., 0.01 ETH)
@@ -118,5 +118,26 @@ def main():
     # Plot CDF
     plot_cdf(rocketpool_data, non_rocketpool_data, A, B)
 
+# Report tables in output order: (name, compute, render). compute(df) returns the partial result of a block of cleaned slot rows,
+# render(result) prints the table from the combined result (see rptheft_reportengine.py).
+# The CDFs and the K-S test need every max bid, so the plot keeps the bid values of both cohorts (8 bytes per slot) rather than the slot rows.
+# Each table can be run and cached on its own by the pipeline driver (rptheft_pipeline.py).
+REPORTS = [
+    ("plot_cdf", comparison_cohorts, cdf_plot),
+]
+
+# Prepare a frame of slot rows and compute the given report tables (all by default) on it
+def compute_report_frame(df, names=None):
+    return compute_partials(df, clean_and_prepare_data, select_tables(REPORTS, names))
+
+# Compute the given report tables over the processed slots, in memory or in chunks (REPORT_CHUNK_ROWS)
+def compute_report_tables(names=None):
+    return compute_tables(folder_path, REQUIRED_COLUMNS, lambda df: compute_report_frame(df, names), print_prepare_summary)
+
+def main():
+    render_tables(REPORTS, compute_report_tables())
+
 if __name__ == "__main__":
-    main()
+    slot_range_argument()
+    with run_report("rptheft_maxbids_cumdistr"):
+        main()
@@ -0,0 +1,222 @@
+"""
+What the script does: Performance instrumentation for the pipeline and report scripts.
+Every script runs inside a run report; the stages of a run (reading, each classification step, writing, each report table, plotting) are timed with `stage(...)`.
+For every stage the run report records wall time, CPU time, rows processed, rows per second, bytes read and peak resident memory (RSS),
+and it is written as JSON to PERF_REPORT_DIR (default perf_reports/) when the script finishes, so runs can be compared over time.
+A stage executed many times (e.g. once per file or chunk) is reported once, with its totals and the number of calls.
+With PROFILE_STAGES=<stage>,<stage> (or all), the listed stages are also profiled with cProfile; the .prof files are written next to the run report
+(view with `python -m pstats FILE` or snakeviz). Only the main process is profiled, so use CLASSIFY_WORKERS=1 to profile classification steps.
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import platform
+import contextlib
+from datetime import datetime, timezone
+from tabulate import tabulate
+
+# resource is Unix-only; without it (Windows) CPU time covers this process only and peak RSS is reported as 0
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Pipeline settings recorded with every run report
+RECORDED_SETTINGS = [
+    'EXTRACT_WORKERS', 'EXTRACT_BLOCK_MB', 'CLASSIFY_WORKERS', 'STREAM_FROM_GZ', 'CHUNK_ROWS', 'CHECK_WORKERS', 'LOADER_CACHE',
+    'FORCE_REPROCESS', 'SURROUNDING_SLOTS', 'PROFILE_STAGES', 'REPORT_CHUNK_ROWS', 'SQL_THREADS', 'SLOT_RANGE'
+]
+
+_active_stages = []    # stages currently running in this process, outermost first
+_finished_stages = []  # finished stage records of this process, in completion order
+_profilers = {}        # stage name -> cProfile.Profile accumulating every call of the stage
+_profiling = False
+
+def reports_enabled():
+    return os.getenv("PERF_REPORTS", "true").strip().lower() == "true"
+
+def report_folder():
+    return os.getenv("PERF_REPORT_DIR", "perf_reports")
+
+def profiled_stages():
+    names = os.getenv("PROFILE_STAGES", "").strip()
+    return {name.strip() for name in names.split(",") if name.strip()}
+
+# === MEMORY ===
+
+# Peak RSS of this process in bytes: the kernel's high-water mark (resettable per stage on Linux), else the lifetime maximum
+def peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return max_rss()
+
+# Lifetime peak RSS of this process (or of its finished child processes) in bytes, 0 where it is not available
+def max_rss(children=False):
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    value = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return value if sys.platform == "darwin" else value * 1024
+
+# Reset the high-water mark, so the next reading is the peak of the stage alone (Linux only; elsewhere the peak so far is reported)
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+# Carry the current high-water mark into every running stage before it is reset
+def note_peak_rss():
+    peak = peak_rss()
+    for record in _active_stages:
+        record["peak_rss_bytes"] = max(record["peak_rss_bytes"], peak)
+
+def cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+# === STAGES ===
+
+# Time a pipeline stage. Yields the stage record; callers add processed rows with record["rows"] += n (or pass rows=).
+@contextlib.contextmanager
+def stage(name, rows=0):
+    global _profiling
+    record = {"name": name, "calls": 1, "rows": rows, "bytes_read": 0, "peak_rss_bytes": 0, "peak_rss_children_bytes": 0}
+    note_peak_rss()
+    reset_peak_rss()
+    _active_stages.append(record)
+
+    profiler = None
+    if not _profiling and (name in profiled_stages() or "all" in profiled_stages()):
+        profiler = _profilers.setdefault(name, cProfile.Profile())
+        _profiling = True
+        profiler.enable()
+
+    started, started_cpu = time.perf_counter(), cpu_seconds()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+        record["wall_seconds"] = time.perf_counter() - started
+        record["cpu_seconds"] = cpu_seconds() - started_cpu
+        note_peak_rss()
+        record["peak_rss_children_bytes"] = max_rss(children=True)
+        _active_stages.pop()
+        _finished_stages.append(record)
+
+# Count bytes read from disk in every running stage
+def add_bytes_read(nbytes):
+    for record in _active_stages:
+        record["bytes_read"] += nbytes
+
+def add_file_read(path):
+    add_bytes_read(os.path.getsize(path))
+
+# Iterate over a lazy reader (e.g. pd.read_csv with chunksize), timing every chunk read as a stage
+def timed_chunks(name, chunks):
+    chunks = iter(chunks)
+    while True:
+        with stage(name) as record:
+            chunk = next(chunks, None)
+            # The read that finds the end of the input still counts towards the stage time
+            record["calls"], record["rows"] = (0, 0) if chunk is None else (1, len(chunk))
+        if chunk is None:
+            return
+        yield chunk
+
+# Hand the finished stages of a worker process to the parent (see merge_stages)
+def take_stages():
+    records = list(_finished_stages)
+    _finished_stages.clear()
+    return records
+
+# Add stages finished in a worker process to this process's run report
+def merge_stages(records):
+    _finished_stages.extend(records)
+
+# Combine repeated stages into one entry per stage name (in order of first completion)
+def summarize_stages(records):
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record["name"], {
+            "name": record["name"], "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": 0,
+            "bytes_read": 0, "peak_rss_bytes": 0, "peak_rss_children_bytes": 0
+        })
+        for key in ["calls", "wall_seconds", "cpu_seconds", "rows", "bytes_read"]:
+            entry[key] += record[key]
+        for key in ["peak_rss_bytes", "peak_rss_children_bytes"]:
+            entry[key] = max(entry[key], record[key])
+    for entry in summary.values():
+        entry["rows_per_second"] = entry["rows"] / entry["wall_seconds"] if entry["rows"] and entry["wall_seconds"] > 0 else None
+        entry["peak_rss_mb"] = round(entry.pop("peak_rss_bytes") / 2**20, 1)
+        entry["peak_rss_children_mb"] = round(entry.pop("peak_rss_children_bytes") / 2**20, 1)
+    return list(summary.values())
+
+# === RUN REPORTS ===
+
+def print_run_summary(stages, report_path):
+    rows = [
+        [s["name"], s["calls"], f"{s['wall_seconds']:.2f}", f"{s['rows']:,}",
+         f"{s['rows_per_second']:,.0f}" if s["rows_per_second"] else "", f"{s['bytes_read'] / 2**20:,.1f}", f"{s['peak_rss_mb']:,.1f}"]
+        for s in stages
+    ]
+    # Timings go to stderr, so the results printed on stdout stay comparable between runs
+    print("\n⏱️ **Stage Timings:**\n", file=sys.stderr)
+    print(tabulate(rows, headers=["Stage", "Calls", "Seconds", "Rows", "Rows/s", "MB Read", "Peak RSS MB"], tablefmt="github"), file=sys.stderr)
+    if report_path:
+        print(f"\n⏱️ Run report saved to {report_path}", file=sys.stderr)
+
+# Write the JSON run report (and stage profiles) of this run; returns the report path
+def write_run_report(report):
+    folder = report_folder()
+    os.makedirs(folder, exist_ok=True)
+    run_id = f"{report['script']}_{report['started_at'].replace(':', '').replace('-', '')}_{os.getpid()}"
+    for entry in report["stages"]:
+        profiler = _profilers.get(entry["name"])
+        if profiler is not None:
+            entry["profile"] = os.path.join(folder, f"{run_id}_{entry['name']}.prof")
+            profiler.dump_stats(entry["profile"])
+    report_path = os.path.join(folder, f"{run_id}.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report_path
+
+# Run a whole script as one instrumented run ("total" stage); the run report is written when the block exits, also when it fails
+@contextlib.contextmanager
+def run_report(script):
+    started_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    status = "failed"
+    # A process may run several scripts one after another (see rptheft_pipeline.py); every run report starts empty
+    _finished_stages.clear()
+    _profilers.clear()
+    try:
+        with stage("total"):
+            yield
+        status = "ok"
+    finally:
+        stages = summarize_stages(_finished_stages)
+        report = {
+            "script": script,
+            "started_at": started_at,
+            "status": status,
+            "wall_seconds": next(s["wall_seconds"] for s in stages if s["name"] == "total"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: os.environ[key] for key in RECORDED_SETTINGS if key in os.environ},
+            "stages": stages,
+        }
+        report_path = write_run_report(report) if reports_enabled() else None
+        print_run_summary(stages, report_path)
@@ -0,0 +1,284 @@
+"""
+What the script does: Single entry point running the whole workflow as a dependency graph: extract → classify → check → reports.
+The completeness check only needs the extracted files, so it runs alongside classification; the four analysis reports run concurrently once classification is done.
+Every stage is fingerprinted from the files it reads and writes, the settings that change its output, and the code it runs
+(the source of its functions and of every rptheft_* function they call). A stage whose fingerprint is unchanged since the last successful run is skipped.
+Reports are cached per table (e.g. theft_summary or vanilla_block_summary, see REPORTS in each report script): unchanged tables print their saved output,
+and only the tables whose code changed, or all of them if the processed dataset changed, are computed again. The cache lives in PROCESSED_PATH/.rptheft_pipeline_state.json.
+Plots are saved as images (PLOT_OUTPUT=file, see rptheft_plotting.py) unless PLOT_OUTPUT is set, so the pipeline runs unattended.
+
+With --slot-range START:END every stage and report runs on the slots of that range only (see rptheft_slotrange.py); results are cached per slot range.
+
+Usage: python rptheft_pipeline.py [--stages extract,classify,check,reports] [--workers 4] [--force] [--slot-range START:END]
+"""
+
+import os
+import io
+import sys
+import time
+import types
+import hashlib
+import inspect
+import argparse
+import importlib
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from tabulate import tabulate
+from rptheft_manifest import load_manifest, save_manifest
+from rptheft_slotstore import list_processed_files
+from rptheft_slotrange import SLOT_RANGE_HELP, set_slot_range
+from rptheft_perf import stage, run_report
+
+load_dotenv(dotenv_path='local_paths.env')
+source_path = os.getenv("SOURCE_PATH")
+processed_path = os.getenv("PROCESSED_PATH")
+
+STATE_NAME = ".rptheft_pipeline_state.json"
+
+# Data stages: name -> (script module, upstream stages, settings changing the stage output)
+DATA_STAGES = {
+    "extract": ("rptheft_data1_ziptocsv", [], ["SLOT_RANGE"]),
+    "classify": ("rptheft_data2_slotclassification", ["extract"], ["STREAM_FROM_GZ", "SURROUNDING_SLOTS", "SLOT_RANGE"]),
+    "check": ("rptheft_data3_datacompletenesscheck", ["extract"], ["SLOT_RANGE"]),
+}
+
+# Report stages: name -> script module; every report reads the processed store written by classify
+REPORT_STAGES = {
+    "loss_alldata": "rptheft_loss_alldata",
+    "theft_timeseries": "rptheft_theft_timeseries",
+    "maxbids_comptable": "rptheft_maxbids_comptable",
+    "maxbids_cumdistr": "rptheft_maxbids_cumdistr",
+}
+
+# Settings changing the output of every report table
+REPORT_SETTINGS = ["SLOT_RANGE"]
+
+# === FINGERPRINTS ===
+
+def digest(*parts):
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+# Fingerprint of a set of files (names, sizes and modification times)
+def files_fingerprint(paths):
+    entries = []
+    for path in sorted(paths):
+        stat = os.stat(path)
+        entries.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return digest(*entries)
+
+# Names referenced by a code object, including nested functions, lambdas and comprehensions
+def referenced_names(code):
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(referenced_names(const))
+    return names
+
+# Fingerprint of the code a function runs: its source, the source of every rptheft_* function it calls (transitively)
+# and the values of the module constants they use
+def code_fingerprint(function):
+    parts, seen, pending = [], set(), [function]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        parts.append(inspect.getsource(current))
+        module = sys.modules[current.__module__]
+        for name in referenced_names(current.__code__):
+            value = getattr(module, name, None)
+            if inspect.isfunction(value) and value.__module__.startswith("rptheft_"):
+                pending.append(value)
+            elif isinstance(value, (str, int, float, bool, tuple, list, dict)) and not holds_functions(value):
+                parts.append(f"{current.__module__}.{name}={value!r}")
+    return digest(*parts)
+
+# Constants holding functions (the REPORTS tables) are left out of a fingerprint: their repr changes from run to run,
+# and each table is fingerprinted from its own functions
+def holds_functions(value):
+    if callable(value):
+        return True
+    if isinstance(value, dict):
+        value = list(value.values())
+    return isinstance(value, (tuple, list)) and any(holds_functions(item) for item in value)
+
+# Files a data stage reads and writes
+def data_stage_files(name):
+    source_files = [os.path.join(source_path, f) for f in os.listdir(source_path) if f.endswith((".csv", ".csv.gz"))]
+    if name == "classify":
+        return source_files + list_processed_files(processed_path)
+    return source_files
+
+def settings_fingerprint(settings):
+    return digest(*[f"{key}={os.getenv(key, '')}" for key in settings])
+
+# Import a script module without printing its start-up messages
+def import_quietly(module_name):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return importlib.import_module(module_name)
+
+# === TASKS (run in worker processes) ===
+
+# Run a data stage script; returns (console output, error or None)
+def run_data_stage(module_name):
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            module = importlib.import_module(module_name)
+            with run_report(module_name):
+                module.main()
+    except Exception:
+        return output.getvalue(), traceback.format_exc()
+    return output.getvalue(), None
+
+# Compute the given tables of a report script (one pass over the processed slots) and render each of them; returns ({table: console output}, error or None)
+def run_report_tables(module_name, table_names):
+    outputs = {}
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            module = import_quietly(module_name)
+            with run_report(module_name):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    results = module.compute_report_tables(table_names)
+                outputs["prepare"] = output.getvalue()
+                for name, _, render in module.REPORTS:
+                    if name in table_names:
+                        output = io.StringIO()
+                        with contextlib.redirect_stdout(output), stage(name):
+                            render(results[name])
+                        outputs[name] = output.getvalue()
+    except Exception:
+        return outputs, traceback.format_exc()
+    return outputs, None
+
+# === SCHEDULING ===
+
+# Plan a stage whose upstream stages are done: returns (cached output or None, task to submit, fingerprints to record on success)
+def plan_stage(name, state, force):
+    if name in DATA_STAGES:
+        module_name, _, settings = DATA_STAGES[name]
+        module = import_quietly(module_name)
+        fingerprint = digest(files_fingerprint(data_stage_files(name)), settings_fingerprint(settings), code_fingerprint(module.main))
+        entry = state["entries"].get(f"stage:{name}")
+        if not force and entry and entry["fingerprint"] == fingerprint:
+            return entry["output"], None, None
+        return None, (run_data_stage, module_name), {"code": code_fingerprint(module.main), "settings": settings_fingerprint(settings)}
+
+    module_name = REPORT_STAGES[name]
+    module = import_quietly(module_name)
+    dataset = digest(files_fingerprint(list_processed_files(processed_path)), settings_fingerprint(REPORT_SETTINGS))
+    prepare = code_fingerprint(module.compute_report_tables)
+    fingerprints = {"prepare": digest(dataset, prepare)}
+    for table, compute, render in module.REPORTS:
+        fingerprints[table] = digest(dataset, prepare, code_fingerprint(compute), code_fingerprint(render))
+    cached = {table: state["entries"].get(f"table:{name}/{table}") for table in fingerprints}
+    missing = [table for table, fp in fingerprints.items() if force or not cached[table] or cached[table]["fingerprint"] != fp]
+    if not missing:
+        return "".join(cached[table]["output"] for table in fingerprints), None, None
+    return None, (run_report_tables, module_name, [table for table in missing if table != "prepare"]), fingerprints
+
+# Record a finished stage in the pipeline state; returns its console output
+def record_stage(name, state, result, fingerprints):
+    if name in DATA_STAGES:
+        output, _ = result
+        # Recorded after the run, so the fingerprint covers the files the stage wrote
+        fingerprint = digest(files_fingerprint(data_stage_files(name)), fingerprints["settings"], fingerprints["code"])
+        state["entries"][f"stage:{name}"] = {"fingerprint": fingerprint, "output": output}
+        return output
+
+    outputs, _ = result
+    for table, output in outputs.items():
+        state["entries"][f"table:{name}/{table}"] = {"fingerprint": fingerprints[table], "output": output}
+    return "".join(state["entries"][f"table:{name}/{table}"]["output"] for table in fingerprints)
+
+def upstream(name):
+    return DATA_STAGES[name][1] if name in DATA_STAGES else ["classify"]
+
+def print_stage_output(name, status, output):
+    print(f"\n===== {name} ({status}) =====")
+    print(output, end="")
+
+# Run the selected stages in dependency order, independent stages concurrently
+def run_pipeline(selected, workers, force):
+    state_path = os.path.join(processed_path, STATE_NAME)
+    state = load_manifest(state_path)
+    pending = [name for name in list(DATA_STAGES) + list(REPORT_STAGES) if name in selected]
+    done, failed, running, summary = set(), set(), {}, []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for name in list(pending):
+                dependencies = [dep for dep in upstream(name) if dep in selected]
+                if any(dep in failed for dep in dependencies):
+                    pending.remove(name)
+                    failed.add(name)
+                    summary.append([name, "⏭️ skipped (upstream failed)", ""])
+                elif all(dep in done for dep in dependencies):
+                    pending.remove(name)
+                    cached_output, task, fingerprints = plan_stage(name, state, force)
+                    if task is None:
+                        print_stage_output(name, "unchanged, cached", cached_output)
+                        done.add(name)
+                        summary.append([name, "✅ cached", ""])
+                    else:
+                        future = executor.submit(*task)
+                        running[future] = (name, fingerprints, time.perf_counter())
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprints, started = running.pop(future)
+                seconds = f"{time.perf_counter() - started:.2f}"
+                result = future.result()
+                if result[1] is not None:
+                    print_stage_output(name, "failed", result[1])
+                    failed.add(name)
+                    summary.append([name, "❗️ failed", seconds])
+                    continue
+                output = record_stage(name, state, result, fingerprints)
+                save_manifest(state, state_path)
+                print_stage_output(name, "ran", output)
+                done.add(name)
+                cached_tables = len(fingerprints) - len(result[0]) if name in REPORT_STAGES else 0
+                summary.append([name, f"✅ ran ({cached_tables} tables cached)" if cached_tables else "✅ ran", seconds])
+
+    print("\n📌 **Pipeline Summary:**\n")
+    print(tabulate(summary, headers=["Stage", "Status", "Seconds"], tablefmt="github"))
+    return not failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the MEV theft pipeline (extract → classify → check → reports), skipping unchanged stages.")
+    parser.add_argument("--stages", default="extract,classify,check,reports",
+                        help=f"Comma-separated stages: {', '.join(list(DATA_STAGES) + list(REPORT_STAGES))} or reports (all four reports)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Stages run concurrently")
+    parser.add_argument("--force", action="store_true", help="Run every selected stage and report table, ignoring the cache")
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP)
+    args = parser.parse_args()
+
+    if args.slot_range:
+        set_slot_range(args.slot_range)
+
+    if not source_path or not processed_path:
+        raise ValueError("Please define SOURCE_PATH and PROCESSED_PATH in the .env file.")
+    os.makedirs(processed_path, exist_ok=True)
+    os.environ.setdefault("PLOT_OUTPUT", "file")
+
+    selected = set()
+    for name in args.stages.split(","):
+        name = name.strip()
+        if name == "reports":
+            selected.update(REPORT_STAGES)
+        elif name in DATA_STAGES or name in REPORT_STAGES:
+            selected.add(name)
+        else:
+            parser.error(f"Unknown stage: {name}")
+
+    if not run_pipeline(selected, args.workers, args.force):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+What the script does: Plot rendering shared by the report scripts (CDF of max bids, vanilla block and MEV theft scatter plots).
+PLOT_OUTPUT selects where plots go: `show` opens a window (default), `file` saves PNG images to PLOT_DIR (default plots/) with the
+headless Agg backend, so reports run unattended on a server, and `none` skips plotting. matplotlib is only imported once a plot is drawn.
+Large plots are reduced before drawing, so render time and memory stay bounded for millions of slots:
+CDF curves are drawn at evenly spaced quantiles (PLOT_MAX_POINTS points per curve), and scatter plots with more than PLOT_MAX_POINTS
+points draw one rasterized marker per occupied cell of a density grid (PLOT_DENSITY_BINS cells along the x axis).
+"""
+
+import os
+import numpy as np
+
+def plot_output():
+    return os.getenv("PLOT_OUTPUT", "show").strip().lower()
+
+def plots_enabled():
+    return plot_output() != "none"
+
+def max_points():
+    return int(os.getenv("PLOT_MAX_POINTS", "20000"))
+
+# Import pyplot on first use; file output uses the non-interactive Agg backend
+def pyplot():
+    import matplotlib
+    if plot_output() == "file":
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+# Show the current figure or save it as PLOT_DIR/<name>.png, then release it
+def finish_plot(plt, name):
+    if plot_output() == "file":
+        folder = os.getenv("PLOT_DIR", "plots")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{name}.png")
+        plt.savefig(path, dpi=120)
+        print(f"🖼️ Plot saved to {path}")
+    else:
+        plt.show()
+    plt.close("all")
+
+# Reduce a CDF curve (sorted values, cumulative proportions) to points at evenly spaced quantiles, keeping both ends
+def downsample_cdf(values, cdf, limit=None):
+    limit = limit or max_points()
+    if len(values) <= limit:
+        return values, cdf
+    positions = np.unique(np.linspace(0, len(values) - 1, limit).round().astype(np.int64))
+    return values[positions], cdf[positions]
+
+# Centers of the occupied cells of a density grid over (x, y); log_y bins y logarithmically (positive values only)
+def density_points(x, y, log_y=False, bins=None):
+    bins = bins or int(os.getenv("PLOT_DENSITY_BINS", "1000"))
+    x, y = np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')
+    if log_y:
+        keep = y > 0
+        x, y = x[keep], np.log10(y[keep])
+    if len(x) == 0:
+        return x, y
+    # Square cells in display space: a 16:6 figure gets about 3/8 as many rows as columns
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=[bins, max(bins * 3 // 8, 1)])
+    x_index, y_index = np.nonzero(counts)
+    x_centers = (x_edges[x_index] + x_edges[x_index + 1]) / 2
+    y_centers = (y_edges[y_index] + y_edges[y_index + 1]) / 2
+    return x_centers, 10**y_centers if log_y else y_centers
+
+# Scatter one series; above PLOT_MAX_POINTS points the series is drawn as rasterized density cells
+def scatter_series(plt, x, y, log_y=False, **kwargs):
+    if len(x) > max_points():
+        x, y = density_points(x, y, log_y=log_y)
+        kwargs["rasterized"] = True
+    plt.scatter(x, y, **kwargs)
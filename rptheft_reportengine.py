@@ -0,0 +1,127 @@
+"""
+What the script does: Runs the report tables of the analysis scripts, either on the whole processed dataset in memory (default) or out of core.
+Each report script lists its tables as (name, compute, render): compute(df) returns a partial result for a block of prepared slot rows
+(counts and exact integer gwei sums, the few rows a table lists or plots, or the bid values of the K-S tests), and render(result) prints the table.
+With REPORT_CHUNK_ROWS=<rows>, the processed partitions are streamed in chunks of that many rows (see iter_processed_slots in rptheft_dataloader.py):
+every chunk is prepared and passed to each table's compute, and only the partial results are kept. Partial results are combined with combine_partials,
+and because sums are exact integers the rendered tables are identical to the in-memory run. Peak memory is set by the chunk size plus the partial
+results, instead of the full dataset.
+The columns derived from the slot rows (per-slot totals and averages, max_bid_eth) and the filters shared by several tables (e.g. Rocket Pool slots
+with a max bid) are added once per frame by derive_report_columns, so a report session (rptheft_reportsession.py) running several scripts on one
+frame computes each of them only once.
+With a slot range (--slot-range START:END or SLOT_RANGE, see rptheft_slotrange.py), only the slots of the range are loaded or streamed, and the tables
+read from materialized summaries (rollup, time cube, address index) are restricted to the same slots.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from rptheft_slotstore import is_true, is_false
+from rptheft_dataloader import load_processed_slots, iter_processed_slots
+from rptheft_slotrange import slot_range_setting
+from rptheft_perf import stage
+
+MEV_REWARD_COLUMNS = ['mev_reward', 'beaconcha_mev_reward', 'mevmonitor_mev_reward']
+MAX_BID_COLUMNS = ['max_bid', 'mevmonitor_max_bid']
+
+# Rows per chunk in out-of-core mode; 0 loads the whole dataset in memory
+def report_chunk_rows():
+    return int(os.getenv("REPORT_CHUNK_ROWS", "0"))
+
+# === SHARED COLUMNS ===
+
+# Add the derived columns `names` (in order) to a frame of slot rows; columns already present, e.g. derived by a report session, are kept.
+# Source columns are left untouched, so the frame can be shared by several report scripts.
+def derive_report_columns(df, names):
+    for name in names:
+        if name not in df.columns:
+            df[name] = derived_column(df, name)
+    return df
+
+def derived_column(df, name):
+    # Exact per-slot totals: average_mev_reward = mev_reward_total_gwei / 3, average_max_bid = max_bid_total_gwei / 2
+    if name == 'mev_reward_total_gwei':
+        return df[[f"{col}_gwei" for col in MEV_REWARD_COLUMNS]].fillna(0).astype('int64').sum(axis=1)
+    if name == 'max_bid_total_gwei':
+        return df[[f"{col}_gwei" for col in MAX_BID_COLUMNS]].fillna(0).astype('int64').sum(axis=1)
+    # Averages over all sources, a missing source counting as 0
+    if name == 'average_mev_reward':
+        return df[MEV_REWARD_COLUMNS].fillna(0.0).mean(axis=1)
+    if name == 'average_max_bid':
+        return df[MAX_BID_COLUMNS].fillna(0.0).mean(axis=1)
+    # Average of the available max bids (empty when no source has one), as compared by the max bid reports
+    if name == 'max_bid_eth':
+        return df[MAX_BID_COLUMNS].mean(axis=1, skipna=True)
+
+    # Shared filters
+    if name == 'has_max_bid':
+        return df[MAX_BID_COLUMNS].sum(axis=1) > 0
+    if name == 'rp_with_max_bid':
+        return is_true(df['is_rocketpool']) & df['has_max_bid']
+    if name == 'non_rp_with_max_bid':
+        return is_false(df['is_rocketpool']) & df['proposer_index'].notnull() & df['has_max_bid']
+    # Slots of the max bid comparison: proposed (not missed), with a max bid and a known Rocket Pool status
+    if name == 'bid_comparison':
+        return df['proposer_index'].notna() & df['max_bid_eth'].notna() & df['is_rocketpool'].notna()
+    raise ValueError(f"Unknown derived report column: {name}")
+
+# === COMPUTING ===
+
+# Frames of processed slot rows: the whole dataset, or chunks of chunk_rows rows (default REPORT_CHUNK_ROWS), of the slots in slot_range (default SLOT_RANGE)
+def report_frames(folder_path, columns, chunk_rows=None, slot_range=None):
+    chunk_rows = report_chunk_rows() if chunk_rows is None else chunk_rows
+    slot_range = slot_range_setting() if slot_range is None else slot_range
+    if chunk_rows:
+        return iter_processed_slots(folder_path, columns, chunk_rows, slot_range)
+    return iter([load_processed_slots(folder_path, columns, slot_range=slot_range)])
+
+# Tables of a REPORTS list, in report order (all of them when names is None)
+def select_tables(tables, names=None):
+    return [table for table in tables if names is None or table[0] in names]
+
+# Prepare a frame of slot rows and compute the partial result of each table on it.
+# prepare(df) returns the prepared rows and a partial of the preparation statistics. Returns (statistics, {name: partial result}).
+def compute_partials(df, prepare, tables):
+    with stage("prepare", rows=len(df)):
+        df, statistics = prepare(df)
+    partials = {}
+    for name, compute, _ in tables:
+        with stage(name, rows=len(df)):
+            partials[name] = compute(df)
+    return statistics, partials
+
+# Combine the partial results of one table over all chunks: numbers are added, frames and arrays concatenated in chunk order,
+# and dicts and tuples are combined item by item
+def combine_partials(partials):
+    partials = [partial for partial in partials if partial is not None]
+    if not partials:
+        return None
+    first = partials[0]
+    if isinstance(first, dict):
+        return {key: combine_partials([partial[key] for partial in partials]) for key in first}
+    if isinstance(first, tuple):
+        return tuple(combine_partials(list(items)) for items in zip(*partials))
+    if isinstance(first, pd.DataFrame):
+        return pd.concat(partials, ignore_index=True)
+    if isinstance(first, np.ndarray):
+        return np.concatenate(partials)
+    return sum(partials[1:], first)
+
+# compute function of tables read from a materialized summary (rollup, address index) rather than slot rows
+def no_slot_rows(df):
+    return None
+
+# Compute report tables over the processed dataset. compute(df) returns (statistics, {name: partial result}) for a frame (see compute_partials);
+# print_prepared(statistics) prints the combined preparation statistics. Returns {name: combined result}.
+def compute_tables(folder_path, columns, compute, print_prepared=None, chunk_rows=None):
+    statistics, results = combine_partials([compute(df) for df in report_frames(folder_path, columns, chunk_rows)])
+    if print_prepared is not None:
+        print_prepared(statistics)
+    return results
+
+# Print the tables from their computed results, in order
+def render_tables(tables, results):
+    for name, _, render in tables:
+        if name in results:
+            with stage(name):
+                render(results[name])
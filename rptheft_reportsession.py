@@ -0,0 +1,65 @@
+"""
+What the script does: Report session: runs the tables of several analysis scripts over a single load of the processed slot dataset.
+The union of the columns the chosen scripts need is loaded once (or streamed once in chunks, see REPORT_CHUNK_ROWS in rptheft_reportengine.py),
+the derived columns and shared filters (average_mev_reward, average_max_bid, max_bid_eth, RP slots with a max bid, ...) are computed once,
+and every script's tables then run against that shared frame, which they only read. Output is the same as running the scripts one by one.
+
+Usage: python rptheft_reportsession.py [--reports loss_alldata,theft_timeseries,maxbids_comptable,maxbids_cumdistr] [--tables theft_summary,range_metrics] [--slot-range START:END]
+"""
+
+import os
+import argparse
+import importlib
+from dotenv import load_dotenv
+from rptheft_reportengine import derive_report_columns, select_tables, report_frames, combine_partials, render_tables
+from rptheft_slotrange import SLOT_RANGE_HELP, set_slot_range
+from rptheft_perf import stage, run_report
+
+REPORT_SCRIPTS = ['loss_alldata', 'theft_timeseries', 'maxbids_comptable', 'maxbids_cumdistr']
+
+# Columns (and dtypes) needed by all the scripts of a session
+def session_columns(modules):
+    columns = {}
+    for module in modules:
+        for col, dtype in module.REQUIRED_COLUMNS.items():
+            if columns.setdefault(col, dtype) != dtype:
+                raise ValueError(f"{module.__name__} reads {col} as {dtype}, another report as {columns[col]}")
+    return columns
+
+# Run the given tables (all by default) of the report script modules over one load of the processed slots in folder_path
+def run_session(modules, folder_path, names=None, chunk_rows=None):
+    modules = [module for module in modules if select_tables(module.REPORTS, names)]
+    derived = list(dict.fromkeys(col for module in modules for col in module.DERIVED_COLUMNS))
+
+    partials = {module.__name__: [] for module in modules}
+    for df in report_frames(folder_path, session_columns(modules), chunk_rows):
+        with stage("derive", rows=len(df)):
+            df = derive_report_columns(df, derived)
+        for module in modules:
+            partials[module.__name__].append(module.compute_report_frame(df, names))
+
+    for module in modules:
+        statistics, results = combine_partials(partials[module.__name__])
+        print(f"\n===== {module.__name__} =====")
+        print_prepared = getattr(module, "print_prepare_summary", None)
+        if print_prepared is not None:
+            print_prepared(statistics)
+        render_tables(module.REPORTS, results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several analysis reports over one load of the processed slots.")
+    parser.add_argument("--reports", default=",".join(REPORT_SCRIPTS), help="Comma-separated report scripts (default: all four)")
+    parser.add_argument("--tables", help="Comma-separated table names (REPORTS in each script); default: every table")
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP)
+    args = parser.parse_args()
+
+    if args.slot_range:
+        set_slot_range(args.slot_range)
+    load_dotenv(dotenv_path='local_paths.env')
+    modules = [importlib.import_module(f"rptheft_{name.strip()}") for name in args.reports.split(",")]
+    names = None if args.tables is None else [name.strip() for name in args.tables.split(",")]
+    run_session(modules, os.getenv("PROCESSED_PATH"), names)
+
+if __name__ == "__main__":
+    with run_report("rptheft_reportsession"):
+        main()
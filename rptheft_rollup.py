@@ -0,0 +1,199 @@
+"""
+What the script does: Materialized per-node-operator rollup of the processed slot dataset, with top-N queries over slices of it.
+Slot classification (rptheft_data2_slotclassification.py) aggregates every Rocket Pool slot file into a small rollup part (PROCESSED_PATH/.rptheft_rollup/),
+so rollup parts are rebuilt together with their processed partition and only for new or changed slot files.
+A rollup row holds, per slot bucket (ROLLUP_SLOT_BUCKET slots), node address, smoothing pool status and max bid relay:
+vanilla blocks and their neglected max bids, blocks accepting less than the max bid and the bid gap, smoothing pool theft and regular theft events and their MEV rewards.
+Rankings such as the top 20 node operators by vanilla block losses are answered from the rollup alone, for the whole dataset or a slice
+(smoothing pool status, slot window, relay), without reading slot-level data.
+
+Usage: python rptheft_rollup.py vanilla|bid_gap|sp_theft|reg_theft|theft [--top 20] [--smoothing-pool true|false] [--slots START:END] [--relay NAME] [--sort events|eth] [--slot-range START:END]
+"""
+
+import os
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from tabulate import tabulate
+from rptheft_slotstore import read_store_file, apply_store_schema, gwei_to_eth, is_true, is_false, sidecar_path
+from rptheft_manifest import atomic_output
+from rptheft_slotrange import processed_files_in_range, SLOT_RANGE_HELP, set_slot_range, slot_range_setting
+from rptheft_perf import stage, add_file_read, run_report
+
+ROLLUP_FOLDER_NAME = ".rptheft_rollup"
+
+# Slot window granularity of the rollup; slot window queries must start and end on a bucket boundary
+ROLLUP_SLOT_BUCKET = 1000
+
+KEY_COLUMNS = ['slot_bucket', 'node_address', 'in_smoothing_pool', 'relay']
+
+# Processed columns a rollup is built from
+SOURCE_COLUMNS = [
+    'slot', 'node_address', 'is_rocketpool', 'in_smoothing_pool', 'max_bid_relay', 'vanilla_block',
+    'sp_high-confidence_theft', 'reg_high-confidence_theft',
+    'max_bid_gwei', 'mevmonitor_max_bid_gwei', 'mev_reward_gwei', 'beaconcha_mev_reward_gwei', 'mevmonitor_mev_reward_gwei'
+]
+
+# Metrics: name -> (event count columns, gwei sum columns, divisor turning the gwei sum into ETH).
+# Sums are kept in exact integer gwei, scaled like the report columns (max_bid_total_gwei = 2 x average max bid,
+# mev_reward_total_gwei = 3 x average MEV reward, gap_x6_gwei = 6 x (average max bid - average MEV reward)).
+METRICS = {
+    "vanilla": (['vanilla_blocks'], ['vanilla_max_bid_total_gwei'], 2),
+    "bid_gap": (['bid_gap_blocks'], ['bid_gap_x6_gwei'], 6),
+    "sp_theft": (['sp_theft_events'], ['sp_theft_mev_reward_total_gwei'], 3),
+    "reg_theft": (['reg_theft_events'], ['reg_theft_mev_reward_total_gwei'], 3),
+    "theft": (['sp_theft_events', 'reg_theft_events'], ['sp_theft_mev_reward_total_gwei', 'reg_theft_mev_reward_total_gwei'], 3),
+}
+MEASURE_COLUMNS = list(dict.fromkeys(col for counts, sums, _ in METRICS.values() for col in counts + sums))
+
+# === BUILDING ===
+
+# Aggregate a block of classified slot rows into rollup rows (Rocket Pool slots with at least one event)
+def build_rollup(df):
+    df = apply_store_schema(df[[col for col in SOURCE_COLUMNS if col in df.columns]])
+    rp = df[is_true(df['is_rocketpool'])]
+
+    max_bid_total = rp[['max_bid_gwei', 'mevmonitor_max_bid_gwei']].fillna(0).astype('int64').sum(axis=1)
+    mev_reward_total = rp[['mev_reward_gwei', 'beaconcha_mev_reward_gwei', 'mevmonitor_mev_reward_gwei']].fillna(0).astype('int64').sum(axis=1)
+    gap_x6 = 3 * max_bid_total - 2 * mev_reward_total
+
+    # Same selections as the report scripts: vanilla blocks and bid gaps among slots with a max bid, theft with an MEV reward
+    has_bid = max_bid_total > 0
+    vanilla = has_bid & rp['vanilla_block']
+    bid_gap = has_bid & (mev_reward_total > 0) & (gap_x6 > 0)
+    sp_theft = rp['sp_high-confidence_theft'] & (mev_reward_total > 0)
+    reg_theft = rp['reg_high-confidence_theft'] & (mev_reward_total > 0)
+
+    rows = pd.DataFrame({
+        'slot_bucket': (rp['slot'].astype('int64') // ROLLUP_SLOT_BUCKET) * ROLLUP_SLOT_BUCKET,
+        'node_address': rp['node_address'].astype('string'),
+        'in_smoothing_pool': rp['in_smoothing_pool'],
+        'relay': rp['max_bid_relay'].astype('string'),
+        'vanilla_blocks': vanilla.astype('int64'),
+        'vanilla_max_bid_total_gwei': max_bid_total.where(vanilla, 0),
+        'bid_gap_blocks': bid_gap.astype('int64'),
+        'bid_gap_x6_gwei': gap_x6.where(bid_gap, 0),
+        'sp_theft_events': sp_theft.astype('int64'),
+        'sp_theft_mev_reward_total_gwei': mev_reward_total.where(sp_theft, 0),
+        'reg_theft_events': reg_theft.astype('int64'),
+        'reg_theft_mev_reward_total_gwei': mev_reward_total.where(reg_theft, 0),
+    })
+    rows = rows[(vanilla | bid_gap | sp_theft | reg_theft).to_numpy()]
+    return combine_rollups([rows])
+
+# Combine rollup rows (e.g. of several chunks or files) into one row per key
+def combine_rollups(frames):
+    if not frames:
+        return pd.DataFrame(columns=KEY_COLUMNS + MEASURE_COLUMNS)
+    rows = pd.concat(frames, ignore_index=True)
+    return rows.groupby(KEY_COLUMNS, dropna=False, sort=True)[MEASURE_COLUMNS].sum().reset_index()
+
+# Rollup part of a processed partition
+def rollup_path(processed_file_path):
+    return sidecar_path(processed_file_path, ROLLUP_FOLDER_NAME, "rollup")
+
+def write_rollup(rollup, processed_file_path):
+    path = rollup_path(processed_file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_output(path) as tmp_path:
+        rollup.to_parquet(tmp_path, index=False)
+    return path
+
+# === QUERIES ===
+
+# Load the rollup of a processed folder. Parts missing or older than their partition (e.g. processed folders from before the rollup)
+# are rebuilt from the partition's columns and saved.
+# slot_range (start, end) restricts the rollup to the slots in the range (see rptheft_slotrange.py).
+def load_node_rollup(folder_path, slot_range=None):
+    parts = []
+    with stage("load_node_rollup") as record:
+        for processed_file, row_groups, whole in processed_files_in_range(folder_path, slot_range):
+            path = rollup_path(processed_file)
+            if not whole:
+                # Partition partly inside the slot range: aggregate its slots in the range (not saved)
+                add_file_read(processed_file)
+                parts.append(build_rollup(read_store_file(processed_file, SOURCE_COLUMNS, slot_range, row_groups)))
+                continue
+            if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(processed_file):
+                add_file_read(path)
+                parts.append(pd.read_parquet(path))
+            else:
+                add_file_read(processed_file)
+                part = build_rollup(read_store_file(processed_file, SOURCE_COLUMNS))
+                write_rollup(part, processed_file)
+                parts.append(part)
+        rollup = combine_rollups(parts)
+        record["rows"] = len(rollup)
+    return rollup
+
+# Rollup rows of a slice: smoothing_pool True/False, slot_range (start, end) with end exclusive, relay name
+def slice_rollup(rollup, smoothing_pool=None, slot_range=None, relay=None):
+    keep = pd.Series(True, index=rollup.index)
+    if smoothing_pool is not None:
+        keep &= is_true(rollup['in_smoothing_pool']) if smoothing_pool else is_false(rollup['in_smoothing_pool'])
+    if slot_range is not None:
+        start, end = slot_range
+        if start % ROLLUP_SLOT_BUCKET or end % ROLLUP_SLOT_BUCKET:
+            raise ValueError(f"Slot windows must start and end on a multiple of {ROLLUP_SLOT_BUCKET} slots, got {start}:{end}")
+        keep &= (rollup['slot_bucket'] >= start) & (rollup['slot_bucket'] < end)
+    if relay is not None:
+        keep &= relay_matches(rollup['relay'], relay)
+    return rollup[keep]
+
+# Rows whose max bid relays include `relay`; a slot's max bid can be shared by several relays (";"-separated)
+def relay_matches(relays, relay):
+    relays = ";" + relays.fillna("") + ";"
+    return relays.str.contains(f";{relay};", regex=False)
+
+# Per-node totals of a metric over a slice: node_address index (sorted), columns events and total_gwei; nodes without events are left out
+def node_totals(rollup, metric, **slice_options):
+    counts, sums, _ = METRICS[metric]
+    rows = slice_rollup(rollup, **slice_options)
+    totals = pd.DataFrame({
+        'node_address': rows['node_address'],
+        'events': rows[counts].sum(axis=1),
+        'total_gwei': rows[sums].sum(axis=1),
+    })
+    totals = totals.groupby('node_address', sort=True)[['events', 'total_gwei']].sum()
+    return totals[totals['events'] > 0]
+
+# Top-N node operators of a metric over a slice, ranked by the ETH total (sort_by='total_gwei') or the event count (sort_by='events').
+# Returns node_address, events, total_gwei and eth; n=None returns every node.
+def top_nodes(rollup, metric, n=20, sort_by='total_gwei', **slice_options):
+    totals = node_totals(rollup, metric, **slice_options).sort_values(by=sort_by, ascending=False)
+    if n is not None:
+        totals = totals.head(n)
+    totals['eth'] = gwei_to_eth(totals['total_gwei'], METRICS[metric][2])
+    return totals.reset_index()
+
+# === CLI ===
+
+def parse_slot_range(text):
+    start, end = text.split(":")
+    return int(start), int(end)
+
+def main():
+    parser = argparse.ArgumentParser(description="Top node operators from the per-node rollup.")
+    parser.add_argument("metric", choices=list(METRICS))
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--smoothing-pool", choices=["true", "false"])
+    parser.add_argument("--slots", type=parse_slot_range, help=f"Slot window START:END (end exclusive, multiples of {ROLLUP_SLOT_BUCKET})")
+    parser.add_argument("--relay", help="Standardized relay name offering the max bid, e.g. ultrasound-relay")
+    parser.add_argument("--sort", choices=["events", "eth"], default="eth")
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP + " (any slot, unlike --slots)")
+    args = parser.parse_args()
+
+    if args.slot_range:
+        set_slot_range(args.slot_range)
+    load_dotenv(dotenv_path='local_paths.env')
+    rollup = load_node_rollup(os.getenv("PROCESSED_PATH"), slot_range_setting())
+    smoothing_pool = None if args.smoothing_pool is None else args.smoothing_pool == "true"
+    top = top_nodes(rollup, args.metric, args.top, 'events' if args.sort == "events" else 'total_gwei',
+                    smoothing_pool=smoothing_pool, slot_range=args.slots, relay=args.relay)
+
+    print(f"\n📄 **Top {args.top} Node Operators ({args.metric}):**\n")
+    print(tabulate(top.drop(columns=['total_gwei']), headers='keys', tablefmt='github', floatfmt=".4f"))
+
+if __name__ == "__main__":
+    with run_report("rptheft_rollup"):
+        main()
@@ -0,0 +1,151 @@
+"""
+What the script does: Slot windows for every stage and report (--slot-range START:END), backed by per-file zone maps so only the files and rows of the window are read.
+A slot range is START:END with END exclusive, and either end can be left open (e.g. 9000000: for the slots from 9,000,000 on, :7000000 for the slots before 7,000,000).
+It is given with --slot-range on the command line of any script, or with SLOT_RANGE in local_paths.env or the environment (the pipeline passes it to its stages this way).
+- Raw slot files are selected by the slot range in their name (rt2_slot-START-to-END.csv, END included).
+- Processed partitions are selected with a zone map (PROCESSED_PATH/.rptheft_zone_maps.json): the row count and min/max slot of every partition and of each of its
+  row groups, taken from the Parquet footers and refreshed by slot classification. Partitions outside the window are never opened, and within a partition only the
+  row groups overlapping the window are read, then cut to the exact window.
+"""
+
+import os
+import re
+import argparse
+import pyarrow.parquet as pq
+from rptheft_slotstore import list_processed_files, STORE_SUFFIX
+from rptheft_manifest import load_manifest, save_manifest
+
+ZONE_MAP_NAME = ".rptheft_zone_maps.json"
+
+# Bump when the zone map layout changes, so zone maps are rebuilt
+ZONE_MAP_VERSION = "1"
+
+RAW_FILE_SLOTS = re.compile(r"slot-(\d+)-to-(\d+)")
+
+SLOT_RANGE_HELP = "Only the slots START:END (END exclusive, either end may be left open); default SLOT_RANGE, or all slots"
+
+# === SLOT RANGES ===
+
+# Parse START:END (END exclusive, either end may be empty) into (start, end), None for an open end
+def parse_slot_range(text):
+    bounds = text.split(":")
+    if len(bounds) != 2:
+        raise ValueError(f"Slot range must be START:END, got {text!r}")
+    start, end = (int(bound) if bound.strip() else None for bound in bounds)
+    if start is not None and end is not None and start >= end:
+        raise ValueError(f"Empty slot range {text!r}: END is exclusive and must be greater than START")
+    return start, end
+
+def format_slot_range(slot_range):
+    start, end = slot_range
+    return f"{'' if start is None else start}:{'' if end is None else end}"
+
+# Slot range of this run (SLOT_RANGE), or None for all slots
+def slot_range_setting():
+    text = os.getenv("SLOT_RANGE", "").strip()
+    return parse_slot_range(text) if text else None
+
+# Use a slot range for this run and the stages it starts (validated first)
+def set_slot_range(text):
+    parse_slot_range(text)
+    os.environ["SLOT_RANGE"] = text
+
+# Read a --slot-range option from the command line of a script without its own argument parser
+def slot_range_argument():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP)
+    args, _ = parser.parse_known_args()
+    if args.slot_range is not None:
+        set_slot_range(args.slot_range)
+
+# Whether the slots first..last (inclusive) overlap a slot range, or lie entirely inside it
+def overlaps(slot_range, first, last):
+    start, end = slot_range
+    return (start is None or last >= start) and (end is None or first < end)
+
+def contains(slot_range, first, last):
+    start, end = slot_range
+    return (start is None or first >= start) and (end is None or last < end)
+
+# Raw slot files (or archives) whose name range overlaps a slot range; files without a slot range in their name are kept
+def raw_files_in_range(paths, slot_range):
+    if slot_range is None:
+        return list(paths)
+    selected = []
+    for path in paths:
+        match = RAW_FILE_SLOTS.search(os.path.basename(path))
+        if match is None or overlaps(slot_range, int(match.group(1)), int(match.group(2))):
+            selected.append(path)
+    return selected
+
+# === ZONE MAPS ===
+
+# Zone map of a partition from its Parquet footer: rows, min_slot, max_slot and [rows, min_slot, max_slot] per row group
+def file_zone_map(path):
+    metadata = pq.read_metadata(path)
+    slot_index = metadata.schema.names.index('slot')
+    row_groups = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        statistics = row_group.column(slot_index).statistics
+        if statistics is None or not statistics.has_min_max:
+            row_groups.append([row_group.num_rows, None, None])
+        else:
+            row_groups.append([row_group.num_rows, int(statistics.min), int(statistics.max)])
+    known = [group for group in row_groups if group[1] is not None]
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "rows": metadata.num_rows,
+        "min_slot": min((group[1] for group in known), default=None),
+        "max_slot": max((group[2] for group in known), default=None),
+        "row_groups": row_groups,
+    }
+
+# Zone maps of the partitions of a processed folder ({file name: zone map}); entries of new or rewritten partitions are read from their footer and saved
+def load_zone_maps(folder_path):
+    path = os.path.join(folder_path, ZONE_MAP_NAME)
+    zone_maps = load_manifest(path)
+    if zone_maps.get("version") != ZONE_MAP_VERSION:
+        zone_maps = {"version": ZONE_MAP_VERSION, "entries": {}}
+
+    entries, changed = {}, False
+    for file in list_processed_files(folder_path):
+        if not file.endswith(STORE_SUFFIX):
+            continue
+        name = os.path.basename(file)
+        entry = zone_maps["entries"].get(name)
+        stat = os.stat(file)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry, changed = file_zone_map(file), True
+        entries[name] = entry
+    changed = changed or entries.keys() != zone_maps["entries"].keys()
+
+    zone_maps["entries"] = entries
+    if changed:
+        save_manifest(zone_maps, path)
+    return entries
+
+# Processed partitions holding slots of a slot range, in slot order: (path, row groups to read or None for all, whether the whole partition is inside the range).
+# Legacy processed CSVs have no zone map and are always read.
+def processed_files_in_range(folder_path, slot_range):
+    all_files = list_processed_files(folder_path)
+    if slot_range is None:
+        return [(file, None, True) for file in all_files]
+
+    zone_maps = load_zone_maps(folder_path)
+    selected = []
+    for file in all_files:
+        entry = zone_maps.get(os.path.basename(file))
+        if entry is None:
+            selected.append((file, None, False))
+            continue
+        if entry["min_slot"] is None or not overlaps(slot_range, entry["min_slot"], entry["max_slot"]):
+            continue
+        if contains(slot_range, entry["min_slot"], entry["max_slot"]):
+            selected.append((file, None, True))
+            continue
+        row_groups = [i for i, (_, first, last) in enumerate(entry["row_groups"]) if first is not None and overlaps(slot_range, first, last)]
+        selected.append((file, row_groups, False))
+    return selected
@@ -0,0 +1,297 @@
+"""
+What the script does: Columnar storage layer for the processed slot dataset.
+Writes every processed slot file as a Parquet partition (one partition per source slot range, e.g. processed_rt2_slot-5203000-to-5299999.parquet) using a fixed, typed schema,
+and reads those partitions back (see rptheft_dataloader.py), so a report starts without CSV tokenizing or dtype guessing.
+Processed folders created before the columnar store (processed_*.csv) are still readable as a fallback.
+"""
+
+import os
+import contextlib
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rptheft_manifest import atomic_output
+
+PROCESSED_PREFIX = "processed_"
+STORE_SUFFIX = ".parquet"
+LEGACY_SUFFIX = ".csv"
+
+# Rows per Parquet row group; chunked readers (see iter_store_file) hold at most one row group in memory
+STORE_ROW_GROUP_ROWS = 65536
+
+# === FIXED SCHEMA ===
+# Integer identifiers, downcast to 32 bits (proposer_index is empty for missed slots)
+INTEGER_COLUMNS = ['slot', 'proposer_index']
+
+# Amounts recorded in wei by the data sources. The store keeps them as exact integer gwei in <column>_gwei;
+# readers get the ETH value under the original column name for display.
+WEI_COLUMNS = [
+    'last_tx_value', 'priority_fees', 'eth_collat_ratio',
+    'max_bid', 'mev_reward', 'beaconcha_mev_reward',
+    'mevmonitor_max_bid', 'mevmonitor_mev_reward'
+]
+GWEI_COLUMNS = [f"{col}_gwei" for col in WEI_COLUMNS]
+WEI_PER_GWEI = 10**9
+GWEI_PER_ETH = 10**9
+
+# Beacon chain time: slot N starts at GENESIS_TIME + N * SECONDS_PER_SLOT (Unix time, UTC); an epoch is SLOTS_PER_EPOCH slots
+GENESIS_TIME = 1606824023
+SECONDS_PER_SLOT = 12
+SLOTS_PER_EPOCH = 32
+SECONDS_PER_DAY = 86400
+
+# Classification flags created during slot classification (bool)
+FLAG_COLUMNS = ['vanilla_block', 'sp_high-confidence_theft', 'reg_high-confidence_theft']
+
+# Source flags which are empty for missed or non-RP slots (nullable boolean)
+COHORT_COLUMNS = ['is_rocketpool', 'in_smoothing_pool']
+
+# Derived ETH amounts which are averages rather than exact per-slot values (float64)
+FLOAT_COLUMNS = ['surrounding_avg_max_bid']
+
+# Columns with few distinct values across millions of slots (relay names, node operator and distributor addresses), stored as categoricals
+CATEGORY_COLUMNS = [
+    'max_bid_relay', 'mev_reward_relay', 'beaconcha_mev_reward_relay',
+    'mevmonitor_max_bid_relay', 'mevmonitor_mev_reward_relay',
+    'node_address', 'distributor_address'
+]
+
+# Convert a processed DataFrame to the fixed store schema.
+# Rows without a valid slot number (missing or non-numeric, e.g. in legacy processed CSVs) cannot be stored and are left out;
+# slot classification drops and counts them before (see drop_invalid_slots).
+def apply_store_schema(df):
+    df = df.copy()
+    if 'slot' in df.columns:
+        slots = pd.to_numeric(df['slot'], errors='coerce')
+        valid = valid_slot_numbers(slots)
+        if not valid.all():
+            df, slots = df[valid], slots[valid]
+        df['slot'] = slots.astype('int32')
+    if 'proposer_index' in df.columns:
+        df['proposer_index'] = pd.to_numeric(df['proposer_index'], errors='coerce').astype('Int32')
+    for col in GWEI_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    for col in FLAG_COLUMNS:
+        if col in df.columns and df[col].dtype != bool:
+            # Legacy "TRUE" / "" text flags
+            df[col] = df[col].astype(str).str.strip().str.upper() == "TRUE"
+    for col in COHORT_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.BooleanDtype):
+            normalized = df[col].astype(str).str.strip().str.lower()
+            df[col] = normalized.map({"true": True, "false": False}).astype('boolean')
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('string').astype('category')
+        elif col not in INTEGER_COLUMNS + GWEI_COLUMNS + FLOAT_COLUMNS + FLAG_COLUMNS + COHORT_COLUMNS:
+            df[col] = df[col].astype('string')
+    return df
+
+# Slot numbers (already numeric) that the store can hold: present, whole and not negative
+def valid_slot_numbers(slots):
+    return slots.notna() & (slots >= 0) & (slots % 1 == 0)
+
+# Drop the rows of a raw or processed block without a valid slot number; returns the remaining rows and the number dropped
+def drop_invalid_slots(df):
+    valid = valid_slot_numbers(pd.to_numeric(df['slot'], errors='coerce'))
+    if valid.all():
+        return df, 0
+    return df[valid], int((~valid).sum())
+
+# Concatenate store frames; categorical columns get the sorted union of their categories so they stay categorical
+def concat_store_frames(frames):
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame()
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([frame[col] for frame in frames], sort_categories=True).categories
+            for frame in frames:
+                frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+# Boolean masks for nullable flags: missing values match neither True nor False
+def is_true(series):
+    return series.fillna(False).astype(bool)
+
+def is_false(series):
+    return (~series).fillna(False).astype(bool)
+
+# Parse wei amounts (decimal strings) into exact integer gwei, rounded half-up to the nearest gwei.
+# The digits are split as text, so amounts beyond 2^53 wei never pass through float64.
+def parse_wei_to_gwei(series):
+    text = series.astype('string').str.strip()
+    is_integer = text.str.fullmatch(r"\d+").fillna(False).astype(bool)
+    gwei = pd.Series(pd.NA, index=series.index, dtype='Int64')
+
+    padded = text[is_integer].str.zfill(10)
+    whole = pd.to_numeric(padded.str[:-9]).astype('Int64')
+    round_up = padded.str[-9].isin(list("56789")).astype('int64')
+    gwei[is_integer] = whole + round_up
+
+    # Amounts written in float notation (e.g. "1.5e+18") are already inexact; round them to the nearest gwei
+    is_other = ~is_integer & text.notna()
+    if is_other.any():
+        gwei[is_other] = (pd.to_numeric(text[is_other], errors='coerce') / WEI_PER_GWEI).round().astype('Int64')
+    return gwei
+
+# Convert exact gwei values or totals to ETH for display.
+# `divisor` turns a total of per-slot sums into a total of per-slot averages (e.g. 2 for the two max bid sources).
+def gwei_to_eth(gwei, divisor=1):
+    if isinstance(gwei, (pd.Series, np.ndarray)):
+        return gwei.astype('float64') / (divisor * GWEI_PER_ETH)
+    return int(gwei) / (divisor * GWEI_PER_ETH)
+
+# UTC day (midnight) in which each slot starts
+def slot_day(slots):
+    days = (GENESIS_TIME + slots.astype('int64') * SECONDS_PER_SLOT) // SECONDS_PER_DAY
+    return pd.to_datetime(days * SECONDS_PER_DAY, unit='s')
+
+# Build the store file name for a raw slot file (rt2_slot-A-to-B.csv -> processed_rt2_slot-A-to-B.parquet)
+def processed_file_name(filename):
+    stem = filename[:-len(".csv.gz")] if filename.endswith(".csv.gz") else os.path.splitext(filename)[0]
+    return f"{PROCESSED_PREFIX}{stem}{STORE_SUFFIX}"
+
+# Path of a file derived from a processed partition, kept in a subfolder of the processed folder
+# (e.g. processed_rt2_slot-A-to-B.parquet -> .rptheft_rollup/rollup_rt2_slot-A-to-B.parquet)
+def sidecar_path(processed_file_path, folder_name, prefix):
+    folder, name = os.path.split(processed_file_path)
+    stem = os.path.splitext(name)[0][len(PROCESSED_PREFIX):]
+    return os.path.join(folder, folder_name, f"{prefix}_{stem}.parquet")
+
+# Arrow schema of a partition: categorical columns use int32 dictionary indices, so every chunk fits the same schema
+def store_arrow_schema(schema):
+    fields = [
+        pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type)) if pa.types.is_dictionary(field.type) else field
+        for field in schema
+    ]
+    return pa.schema(fields, metadata=schema.metadata)
+
+# Write one processed slot file as a Parquet partition, one row group per written chunk.
+# Yields the output path and a function writing a processed chunk; the partition is published atomically on exit.
+@contextlib.contextmanager
+def processed_file_writer(output_folder, filename):
+    output_file_path = os.path.join(output_folder, processed_file_name(filename))
+    with atomic_output(output_file_path) as tmp_path:
+        writer = None
+
+        def write_chunk(df):
+            nonlocal writer
+            table = pa.Table.from_pandas(apply_store_schema(df), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, store_arrow_schema(table.schema))
+            writer.write_table(table.cast(writer.schema), row_group_size=STORE_ROW_GROUP_ROWS)
+
+        try:
+            yield output_file_path, write_chunk
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pd.DataFrame().to_parquet(tmp_path, index=False)
+
+# List processed partitions in slot order, falling back to legacy processed_*.csv files
+def list_processed_files(folder_path):
+    names = sorted(f for f in os.listdir(folder_path) if f.startswith(PROCESSED_PREFIX))
+    store_files = [os.path.join(folder_path, f) for f in names if f.endswith(STORE_SUFFIX)]
+    if store_files:
+        return store_files
+    return [os.path.join(folder_path, f) for f in names if f.endswith(LEGACY_SUFFIX)]
+
+# Map requested ETH columns to the gwei columns they are derived from
+def store_columns(columns):
+    if columns is None:
+        return None
+    mapped = []
+    for col in columns:
+        source = f"{col}_gwei" if col in WEI_COLUMNS else col
+        if source not in mapped:
+            mapped.append(source)
+    return mapped
+
+# Read one processed file into the store schema; legacy processed CSVs are converted on the fly.
+# With a slot_range (start, end), end exclusive and None for an open end, only the rows in the range are returned;
+# row_groups (see rptheft_slotrange.py) limits a partition read to the row groups that can hold them.
+def read_store_file(file_path, columns=None, slot_range=None, row_groups=None):
+    requested = store_columns(columns)
+    if slot_range is None:
+        if file_path.endswith(STORE_SUFFIX):
+            return pd.read_parquet(file_path, columns=requested)
+        return convert_legacy_frame(pd.read_csv(file_path, usecols=legacy_columns(requested)))
+
+    read = with_slot_column(requested)
+    if file_path.endswith(STORE_SUFFIX):
+        parquet_file = pq.ParquetFile(file_path)
+        groups = range(parquet_file.num_row_groups) if row_groups is None else row_groups
+        df = parquet_file.read_row_groups(groups, columns=read).to_pandas()
+    else:
+        df = convert_legacy_frame(pd.read_csv(file_path, usecols=legacy_columns(read)))
+    return slot_window(df, slot_range, requested)
+
+# Read one processed file into the store schema in chunks of about chunk_rows rows (only the rows in slot_range, see read_store_file)
+def iter_store_file(file_path, columns=None, chunk_rows=100000, slot_range=None, row_groups=None):
+    requested = store_columns(columns)
+    read = requested if slot_range is None else with_slot_column(requested)
+    if file_path.endswith(STORE_SUFFIX):
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, row_groups=row_groups, columns=read):
+            # The table keeps the pandas metadata of the file, so chunks get the same dtypes as read_store_file
+            df = pa.Table.from_batches([batch]).to_pandas()
+            if slot_range is not None:
+                df = slot_window(df, slot_range, requested)
+                if df.empty:
+                    continue
+            yield df
+        return
+
+    for df in pd.read_csv(file_path, usecols=legacy_columns(read), chunksize=chunk_rows):
+        df = convert_legacy_frame(df)
+        if slot_range is not None:
+            df = slot_window(df, slot_range, requested)
+            if df.empty:
+                continue
+        yield df
+
+# Boolean mask of the slots inside slot_range (start, end), end exclusive, None for an open end
+def in_slot_range(slots, slot_range):
+    start, end = slot_range
+    mask = np.ones(len(slots), dtype=bool)
+    if start is not None:
+        mask &= (slots >= start).to_numpy(dtype=bool, na_value=False)
+    if end is not None:
+        mask &= (slots < end).to_numpy(dtype=bool, na_value=False)
+    return mask
+
+# Columns to read for a slot window: the requested ones plus slot
+def with_slot_column(requested):
+    return requested if requested is None or 'slot' in requested else requested + ['slot']
+
+# Rows of a frame inside slot_range, with only the requested columns
+def slot_window(df, slot_range, requested):
+    df = df[in_slot_range(df['slot'], slot_range)].reset_index(drop=True)
+    return df if requested is None or 'slot' in requested else df.drop(columns=['slot'])
+
+# Legacy processed CSV columns holding the requested store columns
+def legacy_columns(requested):
+    return None if requested is None else [col[:-len("_gwei")] if col in GWEI_COLUMNS else col for col in requested]
+
+# Convert rows of a legacy processed CSV to the store schema
+def convert_legacy_frame(df):
+    for col, gwei_col in zip(WEI_COLUMNS, GWEI_COLUMNS):
+        if col in df.columns:
+            # Legacy processed CSVs only hold ETH rounded to 8 decimals
+            df[gwei_col] = (pd.to_numeric(df[col], errors='coerce') * GWEI_PER_ETH).round()
+            df = df.drop(columns=[col])
+    return apply_store_schema(df)
+
+# Add the reader-facing ETH amounts next to the exact gwei values (for display and plots)
+def finalize_processed_frame(df):
+    for col, gwei_col in zip(WEI_COLUMNS, GWEI_COLUMNS):
+        if gwei_col in df.columns:
+            df[col] = gwei_to_eth(df[gwei_col])
+    return df
@@ -0,0 +1,167 @@
+"""
+What the script does: Embedded SQL query layer over the processed slot dataset, for ad-hoc questions (losses per relay, theft by month, ...) without writing a new report script.
+Queries run in-process with DuckDB (no server): the Parquet partitions of PROCESSED_PATH are scanned in place with multithreaded columnar execution,
+reading only the columns a query uses and skipping row groups that its filters rule out (predicate pushdown). Requires `duckdb` (pip install duckdb).
+Views:
+- slots: every processed column, with the ETH value of each amount next to its exact <column>_gwei counterpart (e.g. max_bid and max_bid_gwei)
+- slot_metrics: slots plus the derived columns of the report scripts: slot_time (UTC), epoch, mev_reward_total_gwei and max_bid_total_gwei (exact per-slot sums),
+  average_mev_reward and average_max_bid (ETH, missing sources count as 0), max_bid_eth (ETH, mean of the available max bids), sp_theft and reg_theft
+- vanilla_blocks: Rocket Pool vanilla blocks among the slots with at least one max bid (as in rptheft_loss_alldata.py)
+- theft_events: one row per theft flag (theft_type 'smoothing_pool' or 'regular'), with the slot's node, MEV reward and max bid
+
+With a slot range (--slot-range START:END or SLOT_RANGE, see rptheft_slotrange.py), the views only cover the slots of the range, and partitions outside it are not scanned.
+
+Usage: python rptheft_sql.py "SELECT ..." | --file QUERY.sql [--output RESULT.csv] [--max-rows 100] [--explain] [--slot-range START:END]
+       python rptheft_sql.py --views
+"""
+
+import os
+import argparse
+from dotenv import load_dotenv
+from tabulate import tabulate
+from rptheft_slotstore import WEI_COLUMNS, STORE_SUFFIX, GENESIS_TIME, SECONDS_PER_SLOT, SLOTS_PER_EPOCH, GWEI_PER_ETH
+from rptheft_slotrange import processed_files_in_range, SLOT_RANGE_HELP, set_slot_range, slot_range_setting
+from rptheft_perf import stage, run_report
+
+# duckdb is only needed for SQL queries; the rest of the pipeline runs without it
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+VIEWS = ['slots', 'slot_metrics', 'vanilla_blocks', 'theft_events']
+
+# === VIEWS ===
+
+def sql_string(text):
+    return "'" + text.replace("'", "''") + "'"
+
+def slots_view_sql(files, slot_range=None):
+    eth_columns = ", ".join(f"{col}_gwei / {GWEI_PER_ETH}.0 AS {col}" for col in WEI_COLUMNS)
+    file_list = ", ".join(sql_string(file) for file in files)
+    conditions = []
+    if slot_range is not None:
+        start, end = slot_range
+        conditions += ([] if start is None else [f"slot >= {int(start)}"]) + ([] if end is None else [f"slot < {int(end)}"])
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"CREATE VIEW slots AS SELECT *, {eth_columns} FROM read_parquet([{file_list}]){where}"
+
+SLOT_METRICS_VIEW = f"""
+CREATE VIEW slot_metrics AS
+SELECT *,
+    to_timestamp({GENESIS_TIME} + slot * {SECONDS_PER_SLOT}) AS slot_time,
+    slot // {SLOTS_PER_EPOCH} AS epoch,
+    coalesce(mev_reward_gwei, 0) + coalesce(beaconcha_mev_reward_gwei, 0) + coalesce(mevmonitor_mev_reward_gwei, 0) AS mev_reward_total_gwei,
+    coalesce(max_bid_gwei, 0) + coalesce(mevmonitor_max_bid_gwei, 0) AS max_bid_total_gwei,
+    mev_reward_total_gwei / {3 * GWEI_PER_ETH}.0 AS average_mev_reward,
+    max_bid_total_gwei / {2 * GWEI_PER_ETH}.0 AS average_max_bid,
+    (coalesce(max_bid, 0) + coalesce(mevmonitor_max_bid, 0)) / nullif((max_bid IS NOT NULL)::INTEGER + (mevmonitor_max_bid IS NOT NULL)::INTEGER, 0) AS max_bid_eth,
+    "sp_high-confidence_theft" AS sp_theft,
+    "reg_high-confidence_theft" AS reg_theft
+FROM slots
+"""
+
+VANILLA_BLOCKS_VIEW = """
+CREATE VIEW vanilla_blocks AS
+SELECT * FROM slot_metrics
+WHERE is_rocketpool AND max_bid_total_gwei > 0 AND vanilla_block
+"""
+
+THEFT_EVENTS_VIEW = """
+CREATE VIEW theft_events AS
+SELECT slot, slot_time, epoch, theft_type, node_address, in_smoothing_pool,
+       mev_reward_total_gwei, average_mev_reward, max_bid_total_gwei, average_max_bid
+FROM (
+    SELECT *, 'smoothing_pool' AS theft_type FROM slot_metrics WHERE sp_theft
+    UNION ALL
+    SELECT *, 'regular' AS theft_type FROM slot_metrics WHERE reg_theft
+)
+"""
+
+# Open an in-memory DuckDB connection with the views over a processed folder. threads defaults to SQL_THREADS, or all cores;
+# slot_range (default SLOT_RANGE) limits the views to the slots of the range.
+def connect(folder_path, threads=None, slot_range=None):
+    if duckdb is None:
+        raise ImportError("rptheft_sql.py requires duckdb: pip install duckdb")
+    slot_range = slot_range_setting() if slot_range is None else slot_range
+    all_files = [file for file, _, _ in processed_files_in_range(folder_path, slot_range)]
+    if not all_files:
+        raise FileNotFoundError(f"No processed files found in {folder_path}")
+    legacy_files = [file for file in all_files if not file.endswith(STORE_SUFFIX)]
+    if legacy_files:
+        raise ValueError(f"{len(legacy_files)} legacy CSV processed files in {folder_path}; rerun slot classification with FORCE_REPROCESS=true to convert them to Parquet")
+
+    con = duckdb.connect()
+    # slot_time and date functions (e.g. date_trunc('month', slot_time)) work in UTC
+    con.execute("SET TimeZone = 'UTC'")
+    threads = threads or os.getenv("SQL_THREADS")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    con.execute(slots_view_sql(all_files, slot_range))
+    for view in [SLOT_METRICS_VIEW, VANILLA_BLOCKS_VIEW, THEFT_EVENTS_VIEW]:
+        con.execute(view)
+    return con
+
+# Run a query over a processed folder (default PROCESSED_PATH) and return the result as a DataFrame
+def query(sql, folder_path=None, con=None):
+    if con is None:
+        con = connect(folder_path or os.getenv("PROCESSED_PATH"))
+    with stage("sql_query") as record:
+        result = con.execute(sql).df()
+        record["rows"] = len(result)
+    return result
+
+# Columns of every view: view, column, type
+def describe_views(con):
+    rows = []
+    for view in VIEWS:
+        for column, column_type, *_ in con.execute(f"DESCRIBE {view}").fetchall():
+            rows.append([view, column, column_type])
+    return rows
+
+# === CLI ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SQL over the processed slot dataset.")
+    parser.add_argument("sql", nargs="?", help="Query, e.g. \"SELECT max_bid_relay, count(*) FROM vanilla_blocks GROUP BY 1\"")
+    parser.add_argument("--file", help="Read the query from a file")
+    parser.add_argument("--output", help="Save the full result as CSV")
+    parser.add_argument("--max-rows", type=int, default=100, help="Rows printed (default 100)")
+    parser.add_argument("--explain", action="store_true", help="Print the query plan instead of running the query")
+    parser.add_argument("--views", action="store_true", help="List the views and their columns")
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP)
+    args = parser.parse_args()
+
+    if args.slot_range:
+        set_slot_range(args.slot_range)
+    load_dotenv(dotenv_path='local_paths.env')
+    folder_path = os.getenv("PROCESSED_PATH")
+    con = connect(folder_path)
+
+    if args.views:
+        print(tabulate(describe_views(con), headers=["View", "Column", "Type"], tablefmt="github"))
+        return
+
+    if args.file:
+        with open(args.file) as f:
+            sql = f.read()
+    elif args.sql:
+        sql = args.sql
+    else:
+        parser.error("a query or --file is required")
+
+    if args.explain:
+        for _, plan in con.execute(f"EXPLAIN {sql}").fetchall():
+            print(plan)
+        return
+
+    result = query(sql, con=con)
+    print(tabulate(result.head(args.max_rows), headers='keys', tablefmt='github', showindex=False))
+    print(f"\n🔸 Rows: {len(result):,}" + (f" (first {args.max_rows:,} shown)" if len(result) > args.max_rows else ""))
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"💾 Result saved to {args.output}")
+
+if __name__ == "__main__":
+    with run_report("rptheft_sql"):
+        main()
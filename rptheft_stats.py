@@ -0,0 +1,61 @@
+"""
+What the script does: Statistics engine for the max bid comparison of Rocket Pool and non-Rocket Pool slots (see rptheft_maxbids_comptable.py and rptheft_maxbids_cumdistr.py).
+The max bids of each cohort are sorted once; every bid range is then a slice of the sorted arrays found with a binary search (searchsorted),
+so range counts, CDF points and two-sample Kolmogorov-Smirnov (K-S) tests for any range or window need no further pass over the slot rows.
+K-S statistics and p-values are the same as scipy.stats.ks_2samp (two-sided, method 'auto').
+"""
+
+import numpy as np
+from scipy.stats import ks_2samp, kstwo
+
+# Above this sample size ks_2samp switches from the exact p-value to Smirnov's asymptotic formula (scipy's MAX_AUTO_N)
+EXACT_KS_MAX_N = 10000
+
+# Values of both cohorts (optionally of a boolean row mask), unsorted: returns (Rocket Pool values, non-Rocket Pool values);
+# chunks of a dataset can be concatenated and sorted later
+def cohort_values(df, value_column='max_bid_eth', cohort_column='is_rocketpool', rows=None):
+    values = df[value_column].to_numpy(dtype='float64')
+    is_cohort = df[cohort_column].to_numpy(dtype=bool, na_value=False)
+    if rows is not None:
+        values, is_cohort = values[rows], is_cohort[rows]
+    return values[is_cohort], values[~is_cohort]
+
+# Cohort values of the slots in the max bid comparison (the bid_comparison rows, see rptheft_reportengine.py)
+def comparison_cohorts(df):
+    return cohort_values(df, rows=df['bid_comparison'].to_numpy())
+
+# Sort the values of both cohorts once: returns (sorted Rocket Pool values, sorted non-Rocket Pool values)
+def sorted_cohorts(df, value_column='max_bid_eth', cohort_column='is_rocketpool'):
+    return sort_cohorts(cohort_values(df, value_column, cohort_column))
+
+def sort_cohorts(cohorts):
+    rp_values, non_rp_values = cohorts
+    return np.sort(rp_values), np.sort(non_rp_values)
+
+# Values of a sorted array within [lower, upper) (or [lower, upper] with include_upper), as a view without copying
+def range_slice(sorted_values, lower, upper, include_upper=False):
+    start = np.searchsorted(sorted_values, lower, side='left')
+    stop = np.searchsorted(sorted_values, upper, side='right' if include_upper else 'left')
+    return sorted_values[start:stop]
+
+# Empirical CDF points of a sorted array (x values, proportion of values <= x)
+def cdf_points(sorted_values):
+    return sorted_values, np.arange(1, len(sorted_values) + 1) / len(sorted_values)
+
+# Two-sided two-sample K-S test of two sorted arrays; returns (statistic, p-value) as scipy.stats.ks_2samp
+def ks_2samp_sorted(sorted_x, sorted_y):
+    n1, n2 = len(sorted_x), len(sorted_y)
+    if max(n1, n2) <= EXACT_KS_MAX_N:
+        # Small samples use scipy's exact p-value; sorting them again is cheap
+        result = ks_2samp(sorted_x, sorted_y)
+        return result.statistic, result.pvalue
+
+    # The largest CDF difference is reached at one of the sample values; both CDFs are read off the sorted arrays
+    points = np.concatenate([sorted_x, sorted_y])
+    cdf_diffs = np.searchsorted(sorted_x, points, side='right') / n1 - np.searchsorted(sorted_y, points, side='right') / n2
+    statistic = max(np.clip(-cdf_diffs.min(), 0, 1), cdf_diffs.max())
+
+    # Smirnov's asymptotic distribution, as used by ks_2samp for large samples
+    m, n = sorted([float(n1), float(n2)], reverse=True)
+    p_value = np.clip(kstwo.sf(statistic, np.round(m * n / (m + n))), 0, 1)
+    return np.float64(statistic), p_value
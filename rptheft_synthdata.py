@@ -0,0 +1,215 @@
+"""
+What the script does: Synthetic slot data generator for benchmarks and regression checks.
+It writes raw slot files with the same schema and naming as the mined dataset (rt2_slot-A-to-B.csv / .csv.gz, 100,000 slots per file): wei amounts as integer strings,
+";"-separated relay and fee recipient lists with the raw relay names of the data sources, Rocket Pool cohort columns (is_rocketpool, node_address, distributor_address, in_smoothing_pool),
+missed slots, vanilla blocks and a small share of high-confidence theft, with null rates similar to the real data.
+Every file is generated independently from the seed and its slot range, so 10k or 5M+ slots are produced in bounded memory and the same slots always get the same data.
+
+Usage: python rptheft_synthdata.py OUTPUT_FOLDER [--slots 100000] [--start-slot 5203000] [--slots-per-file 100000] [--seed 1] [--format gz|csv|both]
+"""
+
+import os
+import gzip
+import argparse
+import numpy as np
+import pandas as pd
+
+SP_ADDRESS = "0xd4e96ef8eee8678dbff4d535e033ed1a4f7605b7"
+RETH_ADDRESS = "0x33894ea0c25295cb48068019d999a9e190540bf7"
+
+RAW_COLUMNS = [
+    'slot', 'proposer_index', 'max_bid', 'max_bid_relay', 'mev_reward', 'mev_reward_relay', 'relay_fee_recipient',
+    'priority_fees', 'last_tx_value', 'last_tx_recipient', 'is_rocketpool', 'node_address', 'distributor_address',
+    'in_smoothing_pool', 'eth_collat_ratio', 'beaconcha_mev_reward', 'beaconcha_mev_reward_relay', 'beaconcha_fee_recipient',
+    'mevmonitor_max_bid', 'mevmonitor_max_bid_relay', 'mevmonitor_mev_reward', 'mevmonitor_mev_reward_relay', 'mevmonitor_fee_recipient'
+]
+
+# Relay names as reported by the data sources (mapped by the classification stage), with relative frequencies
+RELAY_NAMES = {
+    "Flashbots": 20, "boost-relay.flashbots.net": 10,
+    "Ultra Sound": 15, "relay.ultrasound.money": 10,
+    "bloXroute Max Profit": 8, "bloxroute.max-profit.blxrbdn.com": 5,
+    "bloXroute Regulated": 4, "bloxroute.regulated.blxrbdn.com": 3,
+    "Titan Global": 5, "Titan Regional": 2, "agnostic-relay.net": 6,
+    "Aestus": 3, "aestus.live": 2,
+    "Blocknative": 1, "mainnet-relay.securerpc.com": 2,
+    "Eden Network": 1, "relay.edennetwork.io": 1,
+    "Manifold": 1,
+}
+
+# Share of slots in each cohort
+MISSED_SLOT_RATE = 0.01
+VANILLA_RATE = 0.08
+ROCKETPOOL_RATE = 0.03
+SMOOTHING_POOL_RATE = 0.45  # of Rocket Pool slots
+THEFT_RATE = 0.01  # of Rocket Pool MEV-boost slots
+RETH_RATE = 0.002  # of non-Rocket Pool slots paying the rETH contract
+REWARD_IS_MAX_BID_RATE = 0.7
+
+# Share of missing values per column on proposed, non-vanilla slots (missed and vanilla slots blank their own columns)
+NULL_RATES = {
+    'max_bid': 0.15, 'mev_reward': 0.05, 'beaconcha_mev_reward': 0.10,
+    'mevmonitor_max_bid': 0.20, 'mevmonitor_mev_reward': 0.15,
+    'priority_fees': 0.01, 'last_tx_value': 0.03,
+}
+
+# Share of relay lists naming two relays (the same block delivered by several relays)
+MULTI_RELAY_RATE = 0.15
+
+# Number of distinct addresses in each pool
+NODE_COUNT = 3000
+FEE_RECIPIENT_COUNT = 20000
+BUILDER_COUNT = 100
+
+DEFAULT_START_SLOT = 5203000
+DEFAULT_SLOTS_PER_FILE = 100000
+GZIP_LEVEL = 6
+
+# Random Ethereum addresses with mixed-case hex digits, like checksummed addresses
+def random_addresses(rng, count):
+    digits = np.array(list("0123456789abcdef"))
+    chars = digits[rng.integers(0, 16, size=(count, 40))]
+    upper = rng.random((count, 40)) < 0.5
+    chars = np.where(upper, np.char.upper(chars), chars)
+    return np.array(["0x" + "".join(row) for row in chars], dtype=object)
+
+# Wei amounts as integer strings from a log-normal distribution of ETH values (median in ETH)
+def random_wei(rng, count, median_eth, sigma):
+    eth = rng.lognormal(np.log(median_eth), sigma, count)
+    gwei = np.floor(eth * 10**9).astype('int64')
+    fraction = pd.Series(rng.integers(0, 10**9, count)).astype(str)
+    whole = pd.Series(gwei).astype(str)
+    return np.where(gwei > 0, whole + fraction.str.zfill(9), fraction).astype(object)
+
+# Relay name lists, sometimes naming two relays
+def random_relays(rng, count):
+    names = np.array(list(RELAY_NAMES), dtype=object)
+    weights = np.array(list(RELAY_NAMES.values()), dtype=float)
+    weights /= weights.sum()
+    first = pd.Series(names[rng.choice(len(names), count, p=weights)])
+    second = pd.Series(names[rng.choice(len(names), count, p=weights)])
+    multi = (rng.random(count) < MULTI_RELAY_RATE) & (first != second)
+    return np.where(multi, first + ";" + second, first).astype(object)
+
+# Generate the raw rows of one slot range; `pools` holds the shared address pools
+def generate_slot_frame(first_slot, last_slot, seed, pools):
+    rng = np.random.default_rng([seed, first_slot])
+    count = last_slot - first_slot + 1
+    df = pd.DataFrame({'slot': np.arange(first_slot, last_slot + 1)})
+
+    missed = rng.random(count) < MISSED_SLOT_RATE
+    rocketpool = ~missed & (rng.random(count) < ROCKETPOOL_RATE)
+    smoothing_pool = rocketpool & (rng.random(count) < SMOOTHING_POOL_RATE)
+    vanilla = ~missed & (rng.random(count) < VANILLA_RATE)
+    mev_boost = ~missed & ~vanilla
+
+    node = rng.integers(0, NODE_COUNT, count)
+    df['proposer_index'] = pd.array(rng.integers(0, 1_000_000, count), dtype='Int64')
+    df.loc[missed, 'proposer_index'] = pd.NA
+
+    # Fee recipient of the proposer: the smoothing pool, the node's distributor, or a solo / pool staker address
+    fee_recipient = pools['fee_recipients'][rng.integers(0, FEE_RECIPIENT_COUNT, count)]
+    fee_recipient = np.where(rng.random(count) < RETH_RATE, RETH_ADDRESS, fee_recipient)
+    fee_recipient = np.where(rocketpool, pools['distributors'][node], fee_recipient)
+    fee_recipient = np.where(smoothing_pool, SP_ADDRESS, fee_recipient)
+    # High-confidence theft: a Rocket Pool MEV-boost block paying a builder instead
+    theft = rocketpool & mev_boost & (rng.random(count) < THEFT_RATE)
+    fee_recipient = np.where(theft, pools['builders'][rng.integers(0, BUILDER_COUNT, count)], fee_recipient)
+
+    # The winning bid is usually the highest bid seen; otherwise the delivered reward differs from it
+    max_bid = random_wei(rng, count, 0.05, 1.2)
+    reward = np.where(rng.random(count) < REWARD_IS_MAX_BID_RATE, max_bid, random_wei(rng, count, 0.04, 1.2))
+    df['max_bid'] = max_bid
+    df['max_bid_relay'] = random_relays(rng, count)
+    df['mev_reward'] = reward
+    df['mev_reward_relay'] = random_relays(rng, count)
+    df['relay_fee_recipient'] = fee_recipient
+    df['priority_fees'] = random_wei(rng, count, 0.02, 1.0)
+    df['last_tx_value'] = random_wei(rng, count, 0.04, 1.2)
+    df['last_tx_recipient'] = fee_recipient
+    df['is_rocketpool'] = np.where(rocketpool, "True", "False").astype(object)
+    df['node_address'] = np.where(rocketpool, pools['nodes'][node], None)
+    df['distributor_address'] = np.where(rocketpool, pools['distributors'][node], None)
+    df['in_smoothing_pool'] = np.where(smoothing_pool, "True", np.where(rocketpool, "False", None))
+    df['eth_collat_ratio'] = np.where(rocketpool, random_wei(rng, count, 0.5, 0.5), None)
+    df['beaconcha_mev_reward'] = reward
+    df['beaconcha_mev_reward_relay'] = df['mev_reward_relay']
+    df['beaconcha_fee_recipient'] = fee_recipient
+    df['mevmonitor_max_bid'] = random_wei(rng, count, 0.05, 1.2)
+    df['mevmonitor_max_bid_relay'] = random_relays(rng, count)
+    df['mevmonitor_mev_reward'] = reward
+    df['mevmonitor_mev_reward_relay'] = df['mev_reward_relay']
+    df['mevmonitor_fee_recipient'] = fee_recipient
+
+    for col, rate in NULL_RATES.items():
+        df.loc[rng.random(count) < rate, col] = None
+    # Relay and recipient columns of a source are missing together with its reward
+    for reward_col, relay_col, recipient_col in [
+        ('mev_reward', 'mev_reward_relay', 'relay_fee_recipient'),
+        ('beaconcha_mev_reward', 'beaconcha_mev_reward_relay', 'beaconcha_fee_recipient'),
+        ('mevmonitor_mev_reward', 'mevmonitor_mev_reward_relay', 'mevmonitor_fee_recipient'),
+    ]:
+        df.loc[df[reward_col].isna(), [relay_col, recipient_col]] = None
+    df.loc[df['max_bid'].isna(), 'max_bid_relay'] = None
+    df.loc[df['mevmonitor_max_bid'].isna(), 'mevmonitor_max_bid_relay'] = None
+
+    # Vanilla blocks carry no MEV reward, relay or relay fee recipient; the last transaction is not a builder payment
+    df.loc[vanilla, [
+        'mev_reward', 'mev_reward_relay', 'relay_fee_recipient',
+        'beaconcha_mev_reward', 'beaconcha_mev_reward_relay', 'beaconcha_fee_recipient',
+        'mevmonitor_mev_reward', 'mevmonitor_mev_reward_relay', 'mevmonitor_fee_recipient'
+    ]] = None
+    df.loc[vanilla, 'last_tx_recipient'] = pools['fee_recipients'][rng.integers(0, FEE_RECIPIENT_COUNT, int(vanilla.sum()))]
+
+    # Missed slots only have their slot number
+    df.loc[missed, RAW_COLUMNS[2:]] = None
+    return df[RAW_COLUMNS]
+
+# Address pools shared by all files of a seed
+def address_pools(seed):
+    rng = np.random.default_rng([seed, 0])
+    return {
+        'nodes': random_addresses(rng, NODE_COUNT),
+        'distributors': random_addresses(rng, NODE_COUNT),
+        'fee_recipients': random_addresses(rng, FEE_RECIPIENT_COUNT),
+        'builders': random_addresses(rng, BUILDER_COUNT),
+    }
+
+# Write synthetic slot files covering `slots` slots from start_slot; formats is a subset of ("csv", "gz"). Returns the written paths.
+def generate_slot_files(output_folder, slots, start_slot=DEFAULT_START_SLOT, slots_per_file=DEFAULT_SLOTS_PER_FILE, seed=1, formats=("gz",)):
+    os.makedirs(output_folder, exist_ok=True)
+    pools = address_pools(seed)
+    written = []
+    for first_slot in range(start_slot, start_slot + slots, slots_per_file):
+        last_slot = min(first_slot + slots_per_file, start_slot + slots) - 1
+        df = generate_slot_frame(first_slot, last_slot, seed, pools)
+        base_path = os.path.join(output_folder, f"rt2_slot-{first_slot}-to-{last_slot}.csv")
+        # Render the CSV once for both formats
+        content = df.to_csv(index=False).encode()
+        if "csv" in formats:
+            with open(base_path, 'wb') as f:
+                f.write(content)
+            written.append(base_path)
+        if "gz" in formats:
+            with gzip.open(f"{base_path}.gz", 'wb', compresslevel=GZIP_LEVEL) as f:
+                f.write(content)
+            written.append(f"{base_path}.gz")
+        print(f"✅ Generated {os.path.basename(base_path)} ({len(df):,} slots)")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic raw slot files matching the mined dataset schema.")
+    parser.add_argument("output_folder")
+    parser.add_argument("--slots", type=int, default=100000, help="Number of slots to generate")
+    parser.add_argument("--start-slot", type=int, default=DEFAULT_START_SLOT)
+    parser.add_argument("--slots-per-file", type=int, default=DEFAULT_SLOTS_PER_FILE)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--format", choices=["gz", "csv", "both"], default="gz", help="Write .csv.gz archives (like the downloads), extracted .csv files, or both")
+    args = parser.parse_args()
+
+    formats = ("csv", "gz") if args.format == "both" else (args.format,)
+    written = generate_slot_files(args.output_folder, args.slots, args.start_slot, args.slots_per_file, args.seed, formats)
+    print(f"\n🎯 {len(written)} synthetic slot files written to: {args.output_folder}")
+
+if __name__ == "__main__":
+    main()
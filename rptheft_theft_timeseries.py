@@ -1,6 +1,7 @@
 """
 What the script does: Plots in a scater chart the cases (split by SP and Opt-out Operators) where theft happened.
 Generates summary table with all theft cases (i.e. misusage of protocol-defined fee recipients), split by those which did receive an MEV reward (outright theft) and those where the MEV Rward = 0 (no theft, but incurred in fee distributor misusage).
+Tabulates and plots the monthly smoothing pool and regular theft events and stolen ETH, from the time-bucketed rollup cube.
 Plots 2 tables listing 1) all of the SP-related theft slots and rewards stolen and 2) all of the Opt-out Operators theft slots and rewards stolen.
 Lists all the node operator addresses which incurred in MEV theft, the number of events where it happened, and the ETH amount stolen as well as the % of the total ETH theft.
 Counts the number of slots where MEV rewards were sent to the rETH contract, and the ETH amounts related to those events.
@@ -10,50 +11,73 @@ import os
 import pandas as pd
 from dotenv import load_dotenv
 from tabulate import tabulate
-import matplotlib.pyplot as plt
+from rptheft_slotstore import gwei_to_eth
+from rptheft_reportengine import derive_report_columns, select_tables, compute_partials, compute_tables, render_tables, no_slot_rows
+from rptheft_rollup import load_node_rollup, node_totals
+from rptheft_timecube import load_time_cube, time_series, plot_time_series
+from rptheft_addressindex import address_summary, RECIPIENT_COLUMNS
+from rptheft_plotting import plots_enabled, pyplot, finish_plot, scatter_series
+from rptheft_slotrange import slot_range_setting, slot_range_argument
+from rptheft_perf import run_report
 
 # === CONFIG ===
 load_dotenv(dotenv_path='local_paths.env')
 folder_path = os.getenv("PROCESSED_PATH")
 print(f"Loaded folder path: {folder_path}")
 
+# Columns read from the processed store (amounts come with their exact <column>_gwei counterpart)
+REQUIRED_COLUMNS = {
+    'slot': 'int32',
+    'sp_high-confidence_theft': 'bool',
+    'reg_high-confidence_theft': 'bool',
+    'mev_reward': 'float64',
+    'beaconcha_mev_reward': 'float64',
+    'mevmonitor_mev_reward': 'float64',
+    'max_bid': 'float64',
+    'mevmonitor_max_bid': 'float64',
+}
+
+# Theft flags and their table labels
+THEFT_TYPES = [('sp_high-confidence_theft', 'Smoothing Pool Theft'),
+               ('reg_high-confidence_theft', 'Regular Theft')]
+
+# Time cube metric of each theft flag
+THEFT_METRICS = [('sp_high-confidence_theft', 'sp_theft'),
+                 ('reg_high-confidence_theft', 'reg_theft')]
+
+# Columns derived once per frame (see rptheft_reportengine.py)
+DERIVED_COLUMNS = ['mev_reward_total_gwei', 'max_bid_total_gwei', 'average_mev_reward']
+
 # === FUNCTIONS ===
 
-def combine_processed_files(folder_path):
-    all_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.startswith("processed_")]
-    if not all_files:
-        raise FileNotFoundError(f"No files found in {folder_path}")
-    return pd.concat((pd.read_csv(file) for file in all_files), ignore_index=True)
-
-def preprocess_columns(df):
-    for col in ['mev_reward', 'beaconcha_mev_reward', 'mevmonitor_mev_reward', 'max_bid', 'mevmonitor_max_bid']:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-    for col in ['sp_high-confidence_theft', 'reg_high-confidence_theft']:
-        df[col] = df[col].astype(str).str.lower()
-    return df
-
-def calculate_metrics(df):
-    df['average_mev_reward'] = df[['mev_reward', 'beaconcha_mev_reward', 'mevmonitor_mev_reward']].mean(axis=1)
-    df['average_max_bid'] = df[['max_bid', 'mevmonitor_max_bid']].mean(axis=1)
-    return df
-
-def theft_summary(df):
+# Flagged slot counts and exact gwei totals per theft type, split by MEV reward = 0 and > 0
+def theft_counts(df):
+    counts = {}
+    for theft_col, _ in THEFT_TYPES:
+        flagged = df[df[theft_col]]
+        reward_zero = flagged[flagged['mev_reward_total_gwei'] == 0]
+        reward_nonzero = flagged[flagged['mev_reward_total_gwei'] > 0]
+        counts[theft_col] = {
+            "flagged": flagged.shape[0],
+            "reward_zero": reward_zero.shape[0],
+            "reward_nonzero": reward_nonzero.shape[0],
+            "mev_reward_gwei": int(reward_nonzero['mev_reward_total_gwei'].sum()),
+            "missed_max_bid_gwei": int(reward_zero['max_bid_total_gwei'].sum()),
+        }
+    return counts
+
+def theft_summary(counts):
     summary_rows = []
 
-    for theft_col, label in [('sp_high-confidence_theft', 'Smoothing Pool Theft'),
-                             ('reg_high-confidence_theft', 'Regular Theft')]:
-        flagged = df[df[theft_col] == "true"]
-        reward_zero = flagged[flagged['average_mev_reward'] == 0]
-        reward_nonzero = flagged[flagged['average_mev_reward'] > 0]
-
-        total_flagged = flagged.shape[0]
-        reward_zero_count = reward_zero.shape[0]
-        reward_nonzero_count = reward_nonzero.shape[0]
+    for theft_col, label in THEFT_TYPES:
+        total_flagged = counts[theft_col]["flagged"]
+        reward_zero_count = counts[theft_col]["reward_zero"]
+        reward_nonzero_count = counts[theft_col]["reward_nonzero"]
         reward_zero_pct = (reward_zero_count / total_flagged) * 100 if total_flagged > 0 else 0
         reward_nonzero_pct = (reward_nonzero_count / total_flagged) * 100 if total_flagged > 0 else 0
 
-        sum_mev_reward = reward_nonzero['average_mev_reward'].sum()
-        sum_estimated_missed = reward_zero['average_max_bid'].sum()
+        sum_mev_reward = gwei_to_eth(counts[theft_col]["mev_reward_gwei"], 3)
+        sum_estimated_missed = gwei_to_eth(counts[theft_col]["missed_max_bid_gwei"], 2)
 
         summary_rows.append({
             "Theft Type": label,
@@ -67,28 +91,40 @@ def theft_summary(df):
     print("\n📄 **Theft Summary:**\n")
     print(tabulate(summary_rows, headers="keys", tablefmt="github"))
 
-def display_full_theft_tables(df):
+# Theft events with MEV reward > 0 per theft type: slot and average_mev_reward, in slot order
+def theft_event_rows(df):
+    return {theft_col: df.loc[df[theft_col] & (df['average_mev_reward'] > 0), ['slot', 'average_mev_reward']]
+            for theft_col, _ in THEFT_TYPES}
+
+def display_full_theft_tables(events):
     print("\n🔍 FULL Theft Tables (Only rows with MEV Reward > 0):\n")
 
-    for theft_col, label in [('sp_high-confidence_theft', 'Smoothing Pool Theft'),
-                             ('reg_high-confidence_theft', 'Regular Theft')]:
-        filtered = df[(df[theft_col] == "true") & (df['average_mev_reward'] > 0)]
-        filtered = filtered[['slot', 'average_mev_reward']].reset_index(drop=True)
+    for theft_col, label in THEFT_TYPES:
+        filtered = events[theft_col].reset_index(drop=True)
         filtered['slot'] = filtered['slot'].astype(int)
         filtered['average_mev_reward'] = filtered['average_mev_reward'].map(lambda x: f"{x:.4f}")
 
         print(f"\n🧾 {label} Events (Count: {filtered.shape[0]}):")
         print(tabulate(filtered, headers='keys', tablefmt='github'))
 
-def plot_mev_theft(df):
-    smoothing_pool = df[(df['sp_high-confidence_theft'] == "true") & (df['average_mev_reward'] > 0)]
-    regular_theft = df[(df['reg_high-confidence_theft'] == "true") & (df['average_mev_reward'] > 0)]
+# Theft events drawn in the scatter plot (nothing when plots are disabled)
+def theft_plot_rows(df):
+    if not plots_enabled():
+        return None
+    return theft_event_rows(df)
+
+def plot_mev_theft(events):
+    if not plots_enabled() or events is None:
+        return
+    plt = pyplot()
+    smoothing_pool = events['sp_high-confidence_theft']
+    regular_theft = events['reg_high-confidence_theft']
 
     plt.figure(figsize=(12, 8))
-    plt.scatter(smoothing_pool['slot'], smoothing_pool['average_mev_reward'],
-                label="In Smoothing Pool: TRUE", color="orange", alpha=0.8)
-    plt.scatter(regular_theft['slot'], regular_theft['average_mev_reward'],
-                label="In Smoothing Pool: FALSE", color="blue", alpha=0.8)
+    scatter_series(plt, smoothing_pool['slot'], smoothing_pool['average_mev_reward'],
+                   label="In Smoothing Pool: TRUE", color="orange", alpha=0.8)
+    scatter_series(plt, regular_theft['slot'], regular_theft['average_mev_reward'],
+                   label="In Smoothing Pool: FALSE", color="blue", alpha=0.8)
 
     plt.title("Stolen MEV Reward per Slot by Smoothing Pool Status")
     plt.xlabel("Slot")
@@ -96,30 +132,41 @@ def plot_mev_theft(df):
     plt.legend()
     plt.grid(alpha=0.3)
     plt.tight_layout()
-    plt.show()
+    finish_plot(plt, "mev_theft")
+
+# Monthly theft events with MEV reward > 0 and stolen ETH per theft type (the flagged slots of the theft summary), read from the time cube written during slot classification (see rptheft_timecube.py)
+def monthly_theft(cube):
+    return {theft_col: time_series(cube, metric, 'month') for theft_col, metric in THEFT_METRICS}
+
+def theft_trend(series):
+    print("\n📄 **Monthly Theft (MEV Reward > 0):**\n")
 
-def node_address_summary(df):
+    months = pd.concat([series[theft_col]['month'] for theft_col, _ in THEFT_TYPES]).drop_duplicates().sort_values()
+    trend = pd.DataFrame({'Month': months.dt.strftime('%Y-%m')})
+    for theft_col, label in THEFT_TYPES:
+        monthly = series[theft_col].set_index('month').reindex(months)
+        trend[f"{label} Events"] = monthly['events'].fillna(0).astype('int64').map('{:,}'.format).to_numpy()
+        trend[f"{label} (ETH)"] = monthly['eth'].fillna(0.0).map('{:,.4f}'.format).to_numpy()
+
+    print(tabulate(trend, headers='keys', tablefmt='github', showindex=False, disable_numparse=True))
+
+def plot_theft_trend(series):
+    plot_time_series({label: series[theft_col] for theft_col, label in THEFT_TYPES}, 'month',
+                     "Monthly MEV Theft (MEV Reward > 0)", "mev_theft_monthly")
+
+# Read from the per-node rollup written during slot classification (see rptheft_rollup.py)
+def node_address_summary(rollup):
     print("\n📄 **Node Address Summary (MEV Reward > 0, RocketPool Slots, All Theft Types):**\n")
 
-    # Filter only Rocketpool slots with theft flagged and MEV reward > 0
-    theft_rows = df[
-        (df['is_rocketpool'].astype(str).str.lower() == "true") &
-        (
-            (df['sp_high-confidence_theft'] == "true") |
-            (df['reg_high-confidence_theft'] == "true")
-        ) &
-        (df['average_mev_reward'] > 0)
-    ]
-
-    if theft_rows.empty:
+    # Rocketpool slots with theft flagged and MEV reward > 0, per node
+    node_summary = node_totals(rollup, "theft").rename(columns={'events': 'theft_events', 'total_gwei': 'total_mev_reward'})
+
+    if node_summary.empty:
         print("⚠️ No theft events with MEV reward > 0 detected in RocketPool slots.\n")
         return
 
-    # Group by node_address and calculate summary
-    node_summary = theft_rows.groupby('node_address').agg(
-        theft_events=('slot', 'count'),
-        total_mev_reward=('average_mev_reward', 'sum')
-    ).reset_index()
+    node_summary = node_summary.reset_index()
+    node_summary['total_mev_reward'] = gwei_to_eth(node_summary['total_mev_reward'], 3)
 
     # Calculate percentage
     total_events = node_summary['theft_events'].sum()
@@ -136,25 +183,11 @@ def node_address_summary(df):
     # Display
     print(tabulate(node_summary, headers='keys', tablefmt='github'))
 
-def reth_contract_summary(df):
+def reth_contract_summary():
     reth_address = "0x33894ea0c25295cb48068019d999a9e190540bf7"  # lowercase
 
-    recipient_columns = [
-        'relay_fee_recipient',
-        'mevmonitor_fee_recipient',
-        'beaconcha_fee_recipient',
-        'last_tx_recipient'
-    ]
-
-    # Create a boolean mask across all recipient columns
-    mask = pd.Series(False, index=df.index)
-    for col in recipient_columns:
-        if col in df.columns:
-            mask = mask | df[col].fillna("").str.lower().str.contains(reth_address)
-
-    # Get count & sum of MEV reward
-    count = mask.sum()
-    total_mev = df.loc[mask, 'average_mev_reward'].sum()
+    # Slots where the address appears in any recipient column, with their MEV reward, from the address index (see rptheft_addressindex.py)
+    count, total_mev = address_summary(folder_path, reth_address, RECIPIENT_COLUMNS, slot_range_setting())
 
     print(f"\n🚀 **rETH Contract Summary:**")
     print(f"🔸 Slots where MEV sent to rETH contract: {count:,}")
@@ -163,15 +196,35 @@ def reth_contract_summary(df):
 
 # === MAIN ===
 
+# Report tables in output order: (name, compute, render). compute(df) returns the partial result of a block of prepared slot rows,
+# render(result) prints the table from the combined result (see rptheft_reportengine.py).
+# Each table can be run and cached on its own by the pipeline driver (rptheft_pipeline.py).
+REPORTS = [
+    ("theft_summary", theft_counts, theft_summary),
+    ("display_full_theft_tables", theft_event_rows, display_full_theft_tables),
+    ("plot_mev_theft", theft_plot_rows, plot_mev_theft),
+    ("theft_trend", no_slot_rows, lambda result: theft_trend(monthly_theft(load_time_cube(folder_path, slot_range_setting())))),
+    ("plot_theft_trend", no_slot_rows, lambda result: plot_theft_trend(monthly_theft(load_time_cube(folder_path, slot_range_setting())))),
+    ("node_address_summary", no_slot_rows, lambda result: node_address_summary(load_node_rollup(folder_path, slot_range_setting()))),
+    ("reth_contract_summary", no_slot_rows, lambda result: reth_contract_summary()),
+]
+
+# Derive the columns used by the report tables; no preparation statistics
+def prepare_frame(df):
+    return derive_report_columns(df, DERIVED_COLUMNS), None
+
+# Prepare a frame of slot rows and compute the given report tables (all by default) on it
+def compute_report_frame(df, names=None):
+    return compute_partials(df, prepare_frame, select_tables(REPORTS, names))
+
+# Compute the given report tables over the processed slots, in memory or in chunks (REPORT_CHUNK_ROWS)
+def compute_report_tables(names=None):
+    return compute_tables(folder_path, REQUIRED_COLUMNS, lambda df: compute_report_frame(df, names))
+
 def main():
-    df = combine_processed_files(folder_path)
-    df = preprocess_columns(df)
-    df = calculate_metrics(df)
-    theft_summary(df)
-    display_full_theft_tables(df)
-    plot_mev_theft(df)
-    node_address_summary(df)
-    reth_contract_summary(df)
+    render_tables(REPORTS, compute_report_tables())
 
 if __name__ == "__main__":
-    main()
+    slot_range_argument()
+    with run_report("rptheft_theft_timeseries"):
+        main()
@@ -0,0 +1,216 @@
+"""
+What the script does: Materialized time-bucketed rollup cube of the processed slot dataset, with trend queries (per day, week or month) over it.
+Slot classification (rptheft_data2_slotclassification.py) derives the UTC day of every slot from its slot number (slot N starts at GENESIS_TIME + 12 * N)
+and aggregates every slot file into a small cube part (PROCESSED_PATH/.rptheft_time_cube/), rebuilt together with its processed partition.
+A cube row holds, per UTC day, Rocket Pool status, smoothing pool status and max bid relay: the slot count, the slots with a max bid and their max bids,
+vanilla blocks and their neglected max bids, blocks accepting less than the max bid and the bid gap, smoothing pool theft and regular theft events and their MEV rewards.
+Trend questions (monthly smoothing pool theft, daily ETH lost to vanilla blocks, ...) are answered from a few thousand cube rows instead of millions of slot rows.
+Epoch-level questions go through the slot_metrics view of rptheft_sql.py, which has the epoch of every slot.
+
+Usage: python rptheft_timecube.py max_bid|vanilla|bid_gap|sp_theft|reg_theft|theft [--bucket day|week|month] [--rocketpool true|false] [--smoothing-pool true|false] [--relay NAME] [--plot] [--slot-range START:END]
+"""
+
+import os
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+from tabulate import tabulate
+from rptheft_slotstore import read_store_file, apply_store_schema, gwei_to_eth, is_true, is_false, sidecar_path, slot_day
+from rptheft_manifest import atomic_output
+from rptheft_slotrange import processed_files_in_range, SLOT_RANGE_HELP, set_slot_range, slot_range_setting
+from rptheft_rollup import relay_matches
+from rptheft_plotting import plots_enabled, pyplot, finish_plot
+from rptheft_perf import stage, add_file_read, run_report
+
+TIME_CUBE_FOLDER_NAME = ".rptheft_time_cube"
+
+KEY_COLUMNS = ['day', 'is_rocketpool', 'in_smoothing_pool', 'relay']
+
+# Processed columns a cube is built from
+SOURCE_COLUMNS = [
+    'slot', 'is_rocketpool', 'in_smoothing_pool', 'max_bid_relay', 'vanilla_block',
+    'sp_high-confidence_theft', 'reg_high-confidence_theft',
+    'max_bid_gwei', 'mevmonitor_max_bid_gwei', 'mev_reward_gwei', 'beaconcha_mev_reward_gwei', 'mevmonitor_mev_reward_gwei'
+]
+
+# Metrics: name -> (event count columns, gwei sum columns, divisor turning the gwei sum into ETH), scaled as in the per-node rollup (see rptheft_rollup.py)
+METRICS = {
+    "max_bid": (['max_bid_slots'], ['max_bid_total_gwei'], 2),
+    "vanilla": (['vanilla_blocks'], ['vanilla_max_bid_total_gwei'], 2),
+    "bid_gap": (['bid_gap_blocks'], ['bid_gap_x6_gwei'], 6),
+    "sp_theft": (['sp_theft_events'], ['sp_theft_mev_reward_total_gwei'], 3),
+    "reg_theft": (['reg_theft_events'], ['reg_theft_mev_reward_total_gwei'], 3),
+    "theft": (['sp_theft_events', 'reg_theft_events'], ['sp_theft_mev_reward_total_gwei', 'reg_theft_mev_reward_total_gwei'], 3),
+}
+MEASURE_COLUMNS = ['slots'] + list(dict.fromkeys(col for counts, sums, _ in METRICS.values() for col in counts + sums))
+
+BUCKETS = ['day', 'week', 'month']
+
+# === BUILDING ===
+
+# Aggregate a block of classified slot rows into cube rows (every slot, missed slots included)
+def build_time_cube(df):
+    df = apply_store_schema(df[[col for col in SOURCE_COLUMNS if col in df.columns]])
+
+    max_bid_total = df[['max_bid_gwei', 'mevmonitor_max_bid_gwei']].fillna(0).astype('int64').sum(axis=1)
+    mev_reward_total = df[['mev_reward_gwei', 'beaconcha_mev_reward_gwei', 'mevmonitor_mev_reward_gwei']].fillna(0).astype('int64').sum(axis=1)
+    gap_x6 = 3 * max_bid_total - 2 * mev_reward_total
+
+    # Same selections as the report scripts and the per-node rollup
+    has_bid = max_bid_total > 0
+    vanilla = has_bid & df['vanilla_block']
+    bid_gap = has_bid & (mev_reward_total > 0) & (gap_x6 > 0)
+    sp_theft = df['sp_high-confidence_theft'] & (mev_reward_total > 0)
+    reg_theft = df['reg_high-confidence_theft'] & (mev_reward_total > 0)
+
+    rows = pd.DataFrame({
+        'day': slot_day(df['slot']),
+        'is_rocketpool': df['is_rocketpool'],
+        'in_smoothing_pool': df['in_smoothing_pool'],
+        'relay': df['max_bid_relay'].astype('string'),
+        'slots': 1,
+        'max_bid_slots': has_bid.astype('int64'),
+        'max_bid_total_gwei': max_bid_total,
+        'vanilla_blocks': vanilla.astype('int64'),
+        'vanilla_max_bid_total_gwei': max_bid_total.where(vanilla, 0),
+        'bid_gap_blocks': bid_gap.astype('int64'),
+        'bid_gap_x6_gwei': gap_x6.where(bid_gap, 0),
+        'sp_theft_events': sp_theft.astype('int64'),
+        'sp_theft_mev_reward_total_gwei': mev_reward_total.where(sp_theft, 0),
+        'reg_theft_events': reg_theft.astype('int64'),
+        'reg_theft_mev_reward_total_gwei': mev_reward_total.where(reg_theft, 0),
+    })
+    return combine_time_cubes([rows])
+
+# Combine cube rows (e.g. of several chunks or files, which can share a day) into one row per key
+def combine_time_cubes(frames):
+    if not frames:
+        return pd.DataFrame(columns=KEY_COLUMNS + MEASURE_COLUMNS)
+    rows = pd.concat(frames, ignore_index=True)
+    return rows.groupby(KEY_COLUMNS, dropna=False, sort=True)[MEASURE_COLUMNS].sum().reset_index()
+
+# Cube part of a processed partition
+def time_cube_path(processed_file_path):
+    return sidecar_path(processed_file_path, TIME_CUBE_FOLDER_NAME, "timecube")
+
+def write_time_cube(cube, processed_file_path):
+    path = time_cube_path(processed_file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_output(path) as tmp_path:
+        cube.to_parquet(tmp_path, index=False)
+    return path
+
+# === QUERIES ===
+
+# Load the cube of a processed folder. Parts missing or older than their partition (e.g. processed folders from before the cube)
+# are rebuilt from the partition's columns and saved.
+# slot_range (start, end) restricts the cube to the slots in the range (see rptheft_slotrange.py).
+def load_time_cube(folder_path, slot_range=None):
+    parts = []
+    with stage("load_time_cube") as record:
+        for processed_file, row_groups, whole in processed_files_in_range(folder_path, slot_range):
+            path = time_cube_path(processed_file)
+            if not whole:
+                # Partition partly inside the slot range: aggregate its slots in the range (not saved)
+                add_file_read(processed_file)
+                parts.append(build_time_cube(read_store_file(processed_file, SOURCE_COLUMNS, slot_range, row_groups)))
+                continue
+            if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(processed_file):
+                add_file_read(path)
+                parts.append(pd.read_parquet(path))
+            else:
+                add_file_read(processed_file)
+                part = build_time_cube(read_store_file(processed_file, SOURCE_COLUMNS))
+                write_time_cube(part, processed_file)
+                parts.append(part)
+        cube = combine_time_cubes(parts)
+        record["rows"] = len(cube)
+    return cube
+
+# Cube rows of a cohort: rocketpool and smoothing_pool True/False, relay name
+def slice_time_cube(cube, rocketpool=None, smoothing_pool=None, relay=None):
+    keep = pd.Series(True, index=cube.index)
+    if rocketpool is not None:
+        keep &= is_true(cube['is_rocketpool']) if rocketpool else is_false(cube['is_rocketpool'])
+    if smoothing_pool is not None:
+        keep &= is_true(cube['in_smoothing_pool']) if smoothing_pool else is_false(cube['in_smoothing_pool'])
+    if relay is not None:
+        keep &= relay_matches(cube['relay'], relay)
+    return cube[keep]
+
+# First day of the day, week (Monday) or month bucket of each day
+def bucket_start(days, bucket):
+    if bucket == 'day':
+        return days
+    if bucket == 'week':
+        return days - pd.to_timedelta(days.dt.weekday, unit='D')
+    if bucket == 'month':
+        return days.dt.to_period('M').dt.start_time
+    raise ValueError(f"Unknown time bucket: {bucket} (expected one of {', '.join(BUCKETS)})")
+
+# Time series of a metric over a cohort: one row per bucket with slots, events, total_gwei and eth (buckets without slots are left out)
+def time_series(cube, metric, bucket='month', **slice_options):
+    counts, sums, divisor = METRICS[metric]
+    rows = slice_time_cube(cube, **slice_options)
+    series = pd.DataFrame({
+        bucket: bucket_start(rows['day'], bucket),
+        'slots': rows['slots'],
+        'events': rows[counts].sum(axis=1),
+        'total_gwei': rows[sums].sum(axis=1),
+    })
+    series = series.groupby(bucket, sort=True)[['slots', 'events', 'total_gwei']].sum().reset_index()
+    series['eth'] = gwei_to_eth(series['total_gwei'], divisor)
+    return series
+
+# Line charts of the events and the ETH total of one or more time series ({label: series})
+def plot_time_series(series_by_label, bucket, title, name):
+    if not plots_enabled():
+        return
+    plt = pyplot()
+    fig, (events_axis, eth_axis) = plt.subplots(2, 1, figsize=(14, 8), sharex=True)
+    for label, series in series_by_label.items():
+        events_axis.plot(series[bucket], series['events'], marker='o', label=label)
+        eth_axis.plot(series[bucket], series['eth'], marker='o', label=label)
+    events_axis.set_title(title)
+    events_axis.set_ylabel(f"Events per {bucket}")
+    eth_axis.set_ylabel(f"ETH per {bucket}")
+    eth_axis.set_xlabel(bucket.capitalize())
+    for axis in (events_axis, eth_axis):
+        axis.legend()
+        axis.grid(alpha=0.3)
+    plt.tight_layout()
+    finish_plot(plt, name)
+
+# === CLI ===
+
+def parse_flag(text):
+    return None if text is None else text == "true"
+
+def main():
+    parser = argparse.ArgumentParser(description="Time series of a metric from the time-bucketed rollup cube.")
+    parser.add_argument("metric", choices=list(METRICS))
+    parser.add_argument("--bucket", choices=BUCKETS, default="month")
+    parser.add_argument("--rocketpool", choices=["true", "false"])
+    parser.add_argument("--smoothing-pool", choices=["true", "false"])
+    parser.add_argument("--relay", help="Standardized relay name offering the max bid, e.g. ultrasound-relay")
+    parser.add_argument("--plot", action="store_true", help="Plot the series (see PLOT_OUTPUT)")
+    parser.add_argument("--slot-range", help=SLOT_RANGE_HELP)
+    args = parser.parse_args()
+
+    if args.slot_range:
+        set_slot_range(args.slot_range)
+    load_dotenv(dotenv_path='local_paths.env')
+    cube = load_time_cube(os.getenv("PROCESSED_PATH"), slot_range_setting())
+    series = time_series(cube, args.metric, args.bucket, rocketpool=parse_flag(args.rocketpool),
+                         smoothing_pool=parse_flag(args.smoothing_pool), relay=args.relay)
+
+    print(f"\n📄 **{args.metric} per {args.bucket}:**\n")
+    table = series.drop(columns=['total_gwei'])
+    table[args.bucket] = table[args.bucket].dt.strftime('%Y-%m-%d')
+    print(tabulate(table, headers='keys', tablefmt='github', floatfmt=".4f", showindex=False))
+    if args.plot:
+        plot_time_series({args.metric: series}, args.bucket, f"{args.metric} per {args.bucket}", f"timecube_{args.metric}_{args.bucket}")
+
+if __name__ == "__main__":
+    with run_report("rptheft_timecube"):
+        main()
@@ -0,0 +1,37 @@
+import gzip
+import shutil
+import rptheft_data3_datacompletenesscheck as check
+
+COLUMNS = "slot,max_bid,mevmonitor_max_bid,distributor_address\n"
+
+def write_slot_file(path, slots):
+    with open(path, 'w') as f:
+        f.write(COLUMNS + "".join(f"{slot},1000000000,,\n" for slot in slots))
+
+def run_check(folder, monkeypatch, capsys):
+    monkeypatch.delenv("SLOT_RANGE", raising=False)
+    monkeypatch.setattr(check, "DATA_FOLDER", str(folder))
+    monkeypatch.setattr(check, "EXPECTED_SLOT_RANGE", (100, 199))
+    check.main()
+    return capsys.readouterr().out
+
+# An archive next to its extracted CSV holds the same slots: they are checked once, not reported as duplicates
+def test_extracted_archive_counted_once(tmp_path, monkeypatch, capsys):
+    csv_path = tmp_path / "rt2_slot-100-to-199.csv"
+    write_slot_file(csv_path, range(100, 200))
+    with open(csv_path, 'rb') as f_in, gzip.open(f"{csv_path}.gz", 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+
+    out = run_check(tmp_path, monkeypatch, capsys)
+    assert "Total Files Checked: 1" in out
+    assert "Duplicate slots within or across files: 0" in out
+    assert "Missing slots: 0" in out
+
+# Slot files overlapping each other still report the shared slots as duplicates
+def test_overlapping_files_report_duplicates(tmp_path, monkeypatch, capsys):
+    write_slot_file(tmp_path / "rt2_slot-100-to-159.csv", range(100, 160))
+    write_slot_file(tmp_path / "rt2_slot-150-to-199.csv", range(150, 200))
+
+    out = run_check(tmp_path, monkeypatch, capsys)
+    assert "Duplicate slots within or across files: 10" in out
+    assert "Missing slots: 0" in out